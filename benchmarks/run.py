@@ -0,0 +1,335 @@
+"""
+Benchmark suite for the generator, analyzer, crypto, database and key rotation paths.
+
+    python benchmarks/run.py                       # 1k and 10k vaults
+    python benchmarks/run.py --sizes 1000 10000 100000 -o bench.json
+    python benchmarks/run.py --compare old.json -o new.json
+
+Synthetic vaults are built in a temporary directory. Results are written as
+JSON (per-op timings in microseconds) so runs from different versions can be
+compared with --compare.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from elsakr_vault import PasswordGenerator, PasswordAnalyzer, VaultDatabase  # noqa: E402
+from elsakr_vault import analyzer  # noqa: E402
+from elsakr_vault.secret import wipe_entry  # noqa: E402
+from elsakr_vault.rotation import KeyRotationJob  # noqa: E402
+from elsakr_vault.quickopen import QuickOpenIndex  # noqa: E402
+
+MASTER_PASSWORD = "benchmark-master-password"
+
+
+def measure(func, number=1, repeat=5, setup=None):
+    """Time func() `number` times per round; returns per-call stats in microseconds."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "min_us": round(min(samples), 3),
+        "median_us": round(statistics.median(samples), 3),
+        "mean_us": round(statistics.fmean(samples), 3),
+        "calls": number * repeat,
+    }
+
+
+def random_text(rng, length):
+    return "".join(rng.choice(string.ascii_letters) for _ in range(length))
+
+
+def synthetic_entries(count, seed=1):
+    rng = random.Random(seed)
+    categories = ["General", "Work", "Social", "Finance", "Shopping", "Email"]
+    return [{
+        "title": f"{random_text(rng, 8)} {i}",
+        "username": f"{random_text(rng, 6).lower()}@example.com",
+        "password": "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(16)),
+        "url": f"https://{random_text(rng, 10).lower()}.example.com",
+        "category": rng.choice(categories),
+    } for i in range(count)]
+
+
+def build_vault(directory, count):
+    vault = VaultDatabase(os.path.join(directory, f"vault_{count}.db"))
+    vault.initialize(MASTER_PASSWORD)
+    vault.add_passwords(synthetic_entries(count))
+    return vault
+
+
+def bench_generator(results):
+    for length in (16, 32, 64):
+        results[f"generate/len={length}"] = measure(
+            lambda: PasswordGenerator.generate(length=length), number=2000)
+    results["generate/exclude_chars"] = measure(
+        lambda: PasswordGenerator.generate(length=16, exclude_ambiguous=True,
+                                           exclude_chars="{}[]()<>"), number=2000)
+    results["generate_passphrase/words=4"] = measure(
+        lambda: PasswordGenerator.generate_passphrase(words=4), number=2000)
+
+
+FIRST_CALL_SCRIPT = """
+import sys, time
+sys.path.insert(0, {root!r})
+from elsakr_vault import PasswordAnalyzer
+if {warm}:
+    PasswordAnalyzer.warm_up(background=False)
+start = time.perf_counter()
+PasswordAnalyzer.analyze("Tr0ub4dor&3")
+print((time.perf_counter() - start) * 1e6)
+"""
+
+
+def first_call(warm, repeat=3):
+    """Latency of the first analyze() in a fresh interpreter, optionally after warm_up()."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = FIRST_CALL_SCRIPT.format(root=root, warm=warm)
+    samples = [float(subprocess.run([sys.executable, "-c", script], capture_output=True,
+                                    text=True, check=True).stdout)
+               for _ in range(repeat)]
+    return {"min_us": round(min(samples), 3), "median_us": round(statistics.median(samples), 3),
+            "mean_us": round(statistics.fmean(samples), 3), "calls": repeat}
+
+
+def bench_analyzer(results):
+    rng = random.Random(2)
+    passwords = {n: "".join(rng.choice(string.printable[:94]) for _ in range(n))
+                 for n in (8, 16, 32, 64, 128)}
+
+    backends = [("fallback", False)]
+    if analyzer.ZXCVBN_AVAILABLE:
+        backends.insert(0, ("zxcvbn", True))
+        results["analyze/zxcvbn/first_call"] = first_call(warm=False)
+        results["analyze/zxcvbn/first_call_after_warmup"] = first_call(warm=True)
+        PasswordAnalyzer.warm_up(background=False)
+
+    saved = analyzer.ZXCVBN_AVAILABLE
+    try:
+        for name, enabled in backends:
+            analyzer.ZXCVBN_AVAILABLE = enabled
+            for length, password in passwords.items():
+                if enabled and not reaches_zxcvbn(password):
+                    # analyze() answers these from the built-in estimator; name
+                    # them for that so they don't read as zxcvbn timings
+                    key, number, repeat = f"analyze/zxcvbn-prefiltered/len={length}", 2000, 5
+                elif enabled:
+                    key, number, repeat = f"analyze/{name}/len={length}", 10, 3
+                else:
+                    key, number, repeat = f"analyze/{name}/len={length}", 2000, 5
+                results[key] = measure(
+                    lambda: PasswordAnalyzer.analyze(password), number=number, repeat=repeat)
+    finally:
+        analyzer.ZXCVBN_AVAILABLE = saved
+
+
+def reaches_zxcvbn(password):
+    """Whether analyze() hands password to zxcvbn rather than the estimator prefilter."""
+    if len(password) <= analyzer.PREFILTER_LENGTH:
+        return True
+    return analyzer.estimate(password, [])["guesses"] >= analyzer.PREFILTER_MAX_GUESSES
+
+
+def bench_crypto(results, vault):
+    token = vault.fernet.encrypt(b"correct horse battery staple")
+    results["fernet/encrypt_row"] = measure(
+        lambda: vault.fernet.encrypt(b"correct horse battery staple"), number=2000)
+    results["fernet/decrypt_row"] = measure(lambda: vault.fernet.decrypt(token), number=2000)
+
+
+def bench_unlock(results, directory):
+    path = os.path.join(directory, "unlock.db")
+
+    def unlock():
+        vault = VaultDatabase(path)
+        vault.initialize(MASTER_PASSWORD)
+        vault.close()
+
+    results["unlock/kdf"] = measure(unlock, number=1, repeat=3)
+
+
+def bench_database(results, vault, size):
+    repeat = 3 if size >= 100000 else 5
+    results[f"db/{size}/iter_passwords"] = measure(
+        lambda: [wipe_entry(entry) for entry in vault.iter_passwords()], repeat=repeat)
+    results[f"db/{size}/list_entries"] = measure(vault.list_entries, repeat=repeat)
+    for sort in ("title", "category"):
+        results[f"db/{size}/list_page/{sort}"] = measure(
+            lambda: vault.list_page(sort, descending=True), repeat=repeat)
+        _, middle = vault.list_page(sort, limit=max(size // 2, 1))
+        results[f"db/{size}/list_page/{sort}/middle"] = measure(
+            lambda: vault.list_page(sort, after=middle), repeat=repeat)
+    results[f"db/{size}/search_entries"] = measure(lambda: vault.search_entries("abc"),
+                                                   repeat=repeat)
+
+    index = QuickOpenIndex.from_vault(vault)
+    results[f"quickopen/{size}/build"] = measure(lambda: QuickOpenIndex.from_vault(vault), repeat=1)
+    for query in ("abc", "example", "xq", "zzzz", "e 9999", "xmpl", "eeee"):
+        results[f"quickopen/{size}/search/{query}"] = measure(lambda: index.search(query), number=20)
+    edited = next(iter(index.entries), None)
+    if edited is not None:
+        results[f"quickopen/{size}/edit"] = measure(
+            lambda: index.add(edited, *index.entries[edited]), number=200)
+    results[f"quickopen/{size}/recall"] = quickopen_recall(index)
+
+    added = []
+    results[f"db/{size}/add_password"] = measure(
+        lambda: added.append(vault.add_password("bench", "user", "pw", url="u")), number=50)
+    results[f"db/{size}/delete_password"] = measure(
+        lambda: vault.delete_password(added.pop()), number=50)
+
+
+def quickopen_recall(index, queries=100, seed=3):
+    """Share of queries whose best hit scores as well as a scan of the whole index.
+
+    Half the queries are abbreviations of random titles, half random strings.
+    """
+    rng = random.Random(seed)
+    ids = list(index.entries)
+    agree = 0
+    for n in range(queries):
+        if n % 2:
+            query = "".join(rng.choice(string.ascii_lowercase + string.digits)
+                            for _ in range(rng.randint(1, 5)))
+        else:
+            title = index.entries[rng.choice(ids)][0].lower()
+            picked = sorted(rng.sample(range(len(title)), min(len(title), rng.randint(2, 5))))
+            query = "".join(title[i] for i in picked).strip() or "a"
+        found = index.search(query, limit=1)
+        compact = "".join(query.split())
+        scores = (index._score(compact, id) for id in ids)
+        best = max((score for score in scores if score is not None), default=None)
+        agree += (found[0][0] if found else None) == best
+    return {"top1": round(agree / queries, 3), "queries": queries}
+
+
+def bench_rotation(results, directory, size):
+    """Full key rotation per worker count (threads only pay off with several cores)."""
+    base = build_vault(directory, size)
+    base.begin_key_rotation(MASTER_PASSWORD)
+    base.close()
+    path = os.path.join(directory, f"rotate_{size}.db")
+    opened = []
+
+    def setup():
+        shutil.copyfile(base.db_path, path)
+        opened.append(VaultDatabase(path))
+        opened[-1].initialize(MASTER_PASSWORD)
+
+    for workers in (1, 2, 4):
+        results[f"rotation/{size}/workers_{workers}"] = measure(
+            lambda: KeyRotationJob(opened[-1], workers=workers).run(), repeat=3, setup=setup)
+    for vault in opened:
+        vault.close()
+
+
+def cpu_model():
+    """CPU name for the results, so timings can be compared on like hardware."""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Print median ratios (new / old) for benchmarks present in both runs."""
+    print(f"{'benchmark':45} {'old us':>12} {'new us':>12} {'ratio':>7}")
+    for name, stats in new["results"].items():
+        before = old["results"].get(name)
+        if not before or not before.get("median_us"):
+            continue
+        ratio = stats["median_us"] / before["median_us"]
+        flag = "  <-- slower" if ratio > 1.1 else ""
+        print(f"{name:45} {before['median_us']:12.1f} {stats['median_us']:12.1f} "
+              f"{ratio:7.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--only", choices=["generator", "analyzer", "crypto", "database", "rotation"],
+                        nargs="+", help="run a subset of the groups")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+    groups = set(args.only or ["generator", "analyzer", "crypto", "database", "rotation"])
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        if "generator" in groups:
+            bench_generator(results)
+        if "analyzer" in groups:
+            bench_analyzer(results)
+        if "crypto" in groups:
+            bench_unlock(results, directory)
+            vault = build_vault(directory, 0)
+            bench_crypto(results, vault)
+            vault.close()
+        if "database" in groups:
+            for size in args.sizes:
+                vault = build_vault(directory, size)
+                bench_database(results, vault, size)
+                vault.close()
+        if "rotation" in groups:
+            for size in args.sizes:
+                bench_rotation(results, directory, size)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu": cpu_model(),
+            "cpu_count": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "zxcvbn": analyzer.ZXCVBN_AVAILABLE,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
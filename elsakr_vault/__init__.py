@@ -0,0 +1,27 @@
+"""
+Elsakr Password Vault core - headless generator, analyzer and encrypted storage.
+Used by the Tk GUI (main.py) and the command line (python -m elsakr_vault).
+"""
+
+from .generator import PasswordGenerator, GenerationPolicy, compile_policy
+from .analyzer import PasswordAnalyzer, ZXCVBN_AVAILABLE
+from .database import VaultDatabase, CRYPTO_AVAILABLE
+from .attachments import AttachmentStore, AttachmentError
+from .secret import Secret
+from .tracing import tracer, span, traced
+
+__all__ = [
+    "PasswordGenerator",
+    "GenerationPolicy",
+    "compile_policy",
+    "PasswordAnalyzer",
+    "VaultDatabase",
+    "AttachmentStore",
+    "AttachmentError",
+    "Secret",
+    "CRYPTO_AVAILABLE",
+    "ZXCVBN_AVAILABLE",
+    "tracer",
+    "span",
+    "traced",
+]
@@ -0,0 +1,294 @@
+"""
+Background agent that keeps an unlocked vault in memory, like ssh-agent.
+
+Clients talk to it over a unix domain socket that only the owner can open.
+Every message is a 4-byte big-endian length followed by a UTF-8 JSON object:
+
+    request:  {"op": "get", "entry": "GitHub"}
+    response: {"ok": true, "result": {...}}  or  {"ok": false, "error": "..."}
+
+Supported ops are ping, get, search, generate and lock. The agent locks
+itself (dropping the key and removing the socket) after idle_timeout seconds
+without a request. Each request is appended to a JSON-lines audit log with
+the op and target only, never a password.
+"""
+
+import os
+import json
+import stat
+import time
+import socket
+import struct
+import asyncio
+
+from .generator import PasswordGenerator
+from .secret import revealed, wipe_entry
+
+MAX_FRAME = 1 << 20
+MAX_ERROR = 1000
+HEADER = struct.Struct(">I")
+
+
+def default_socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(
+        os.path.expanduser("~"), ".elsakr_vault")
+    return os.path.join(runtime_dir, "elsakr-vault", "agent.sock")
+
+
+def encode_frame(message):
+    payload = json.dumps(message, ensure_ascii=False).encode()
+    if len(payload) > MAX_FRAME:
+        raise ValueError("message too large")
+    return HEADER.pack(len(payload)) + payload
+
+
+def decode_payload(payload):
+    message = json.loads(payload.decode())
+    if not isinstance(message, dict):
+        raise ValueError("message must be a JSON object")
+    return message
+
+
+def error_message(error):
+    """Text for an error reply; some exceptions (InvalidToken) have no message of their own."""
+    if str(error):
+        return str(error)
+    if type(error).__name__ == "InvalidToken":
+        return "cannot decrypt entry"
+    return type(error).__name__
+
+
+class VaultAgent:
+    """Serves get/search/generate requests for an unlocked VaultDatabase."""
+
+    def __init__(self, vault, socket_path=None, idle_timeout=900, audit_log=None):
+        self.vault = vault
+        # Only the default directory is the agent's own to create and chmod
+        self.private_directory = socket_path is None
+        self.socket_path = os.path.abspath(socket_path or default_socket_path())
+        self.idle_timeout = idle_timeout
+        self.audit_log = audit_log
+        self.last_request = time.monotonic()
+        self.server = None
+        self._stopped = None
+
+    def run(self):
+        """Serve until locked or idle; blocks the calling thread."""
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.vault.lock()
+
+    def prepare_directory(self):
+        """Make sure only this user can reach the socket's directory.
+
+        The default directory is created (or tightened) to 0700. A directory
+        given with socket_path is never changed; the agent refuses to start
+        in one that isn't this user's or that group or others can access.
+        """
+        directory = os.path.dirname(self.socket_path)
+        if self.private_directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            os.chmod(directory, 0o700)
+            return
+        info = os.stat(directory)
+        if info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise PermissionError(f"socket directory {directory} must be private to this user "
+                                  f"(mode 0700); it is left unchanged")
+
+    def remove_stale_socket(self):
+        """Remove a socket left behind by an agent that died; refuse if one still answers."""
+        try:
+            info = os.lstat(self.socket_path)
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(info.st_mode):
+            raise FileExistsError(f"{self.socket_path} exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+        else:
+            raise FileExistsError(f"an agent is already running on {self.socket_path}")
+        finally:
+            probe.close()
+        os.unlink(self.socket_path)
+
+    async def serve(self):
+        if not hasattr(asyncio, "start_unix_server"):
+            raise OSError("the agent needs unix domain socket support")
+        self.prepare_directory()
+        self.remove_stale_socket()
+
+        self._stopped = asyncio.Event()
+        old_umask = os.umask(0o177)
+        try:
+            self.server = await asyncio.start_unix_server(self.handle_client,
+                                                          path=self.socket_path)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+
+        watchdog = asyncio.create_task(self.idle_watchdog())
+        try:
+            await self._stopped.wait()
+        finally:
+            watchdog.cancel()
+            self.server.close()
+            await self.server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def stop(self):
+        if self._stopped:
+            self._stopped.set()
+
+    async def idle_watchdog(self):
+        while True:
+            remaining = self.idle_timeout - (time.monotonic() - self.last_request)
+            if remaining <= 0:
+                self.audit({"op": "idle-lock"})
+                self.stop()
+                return
+            await asyncio.sleep(min(remaining, 5))
+
+    async def handle_client(self, reader, writer):
+        peer_uid = self.peer_uid(writer)
+        if peer_uid is not None and peer_uid != os.getuid():
+            writer.close()
+            return
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                (size,) = HEADER.unpack(header)
+                if size > MAX_FRAME:
+                    break
+                payload = await reader.readexactly(size)
+                writer.write(self.dispatch(payload, peer_uid))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def peer_uid(self, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is None or not hasattr(socket, "SO_PEERCRED"):
+            return None
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                struct.calcsize("3i"))
+        return struct.unpack("3i", creds)[1]
+
+    def dispatch(self, payload, peer_uid=None):
+        """Answer one request payload with an encoded response frame."""
+        self.last_request = time.monotonic()
+        started = time.perf_counter()
+        request, op, ok = {}, None, False
+        try:
+            request = decode_payload(payload)
+            op = request.get("op")
+            handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+            if handler is None:
+                raise ValueError(f"unknown op: {op}")
+            result = handler(request)
+            try:
+                frame = encode_frame({"ok": True, "result": result})
+            except ValueError:
+                raise ValueError("result too large, narrow the query") from None
+            ok = True
+        except Exception as e:
+            # Capped so that echoing a huge request back can't overflow the frame
+            frame = encode_frame({"ok": False, "error": error_message(e)[:MAX_ERROR]})
+        self.audit({
+            "op": op,
+            "target": request.get("entry") or request.get("query"),
+            "uid": peer_uid,
+            "ok": ok,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+        })
+        return frame
+
+    def audit(self, record):
+        if not self.audit_log:
+            return
+        record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), **record}
+        # The log names entries, so it is created readable by this user only
+        fd = os.open(self.audit_log, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        with open(fd, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def op_ping(self, request):
+        return "pong"
+
+    def op_get(self, request):
+        key = str(request.get("entry", ""))
+        if key.isdigit():
+            entry = self.vault.get_entry(int(key))
+        else:
+            matches = [e for e in self.vault.search_entries(key)
+                       if e['title'].lower() == key.lower()]
+            entry = self.vault.get_entry(matches[0]['id']) if matches else None
+        if entry is None:
+            raise LookupError(f"entry not found: {key}")
+        try:
+            return revealed(entry)
+        finally:
+            wipe_entry(entry)
+
+    def op_search(self, request):
+        return self.vault.search_entries(str(request.get("query", "")))
+
+    def op_generate(self, request):
+        options = request.get("options") or {}
+        if request.get("passphrase"):
+            return PasswordGenerator.generate_passphrase(**options)
+        return PasswordGenerator.generate(**options)
+
+    def op_lock(self, request):
+        self.stop()
+        return "locked"
+
+
+class AgentClient:
+    """Blocking client for VaultAgent."""
+
+    def __init__(self, socket_path=None, timeout=5.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(self.socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def request(self, op, **params):
+        self.sock.sendall(encode_frame({"op": op, **params}))
+        (size,) = HEADER.unpack(self._recv_exact(HEADER.size))
+        response = decode_payload(self._recv_exact(size))
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "agent error"))
+        return response["result"]
+
+    def _recv_exact(self, size):
+        chunks = []
+        while size:
+            chunk = self.sock.recv(size)
+            if not chunk:
+                raise ConnectionError("agent closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,121 @@
+"""
+Password strength analysis (zxcvbn when installed, the built-in estimator otherwise).
+"""
+
+import threading
+import importlib.util
+
+from .estimator import estimate, normalize
+from .dictionary import CustomDictionary, find_entry_words
+from .tracing import traced
+
+ZXCVBN_AVAILABLE = importlib.util.find_spec("zxcvbn") is not None
+
+# Long passwords are estimated first: the estimator knows far fewer words
+# than zxcvbn, so its guess count is only an upper bound - it can settle that
+# a password is weak (zxcvbn would only rate it lower), never that it is
+# strong. zxcvbn's cost grows quickly with length while its score tops out
+# at 1e10 guesses, so it only ever sees the first ZXCVBN_MAX_INPUT
+# characters. Appending characters never makes a password easier to guess,
+# so that prefix's rating is a floor for the whole: a prefix rated Strong
+# settles the password, and anything less is reported as the floor.
+ZXCVBN_MAX_INPUT = 32
+PREFILTER_LENGTH = 24
+PREFILTER_MAX_GUESSES = 1e6
+
+_zxcvbn = None
+_warmup_thread = None
+_custom_dictionary = CustomDictionary()
+
+
+def get_zxcvbn():
+    """Import zxcvbn on first use (it builds its dictionaries at import time)."""
+    global _zxcvbn
+    if _zxcvbn is None:
+        from zxcvbn import zxcvbn
+        _zxcvbn = zxcvbn
+    return _zxcvbn
+
+
+def _warm_up():
+    # Importing builds the ranked dictionaries; one call compiles the rest
+    get_zxcvbn()("warm-up Xk9#mQ2!")
+
+
+def warm_up(background=True):
+    """Pay zxcvbn's first-call cost ahead of time, by default on a daemon thread.
+    
+    Returns the thread (or None when run inline or zxcvbn is missing).
+    """
+    global _warmup_thread
+    if not ZXCVBN_AVAILABLE or _zxcvbn is not None:
+        return None
+    if not background:
+        _warm_up()
+        return None
+    if _warmup_thread is None:
+        _warmup_thread = threading.Thread(target=_warm_up, name="zxcvbn-warmup", daemon=True)
+        _warmup_thread.start()
+    return _warmup_thread
+
+
+def set_dictionary(words):
+    """Compile the organization's words once; used by every later analyze()."""
+    global _custom_dictionary
+    _custom_dictionary = CustomDictionary(words)
+    return len(_custom_dictionary)
+
+
+class PasswordAnalyzer:
+    """Password strength analysis."""
+    
+    @staticmethod
+    @traced("analyzer.analyze")
+    def analyze(password, user_inputs=()):
+        """Analyze password; user_inputs are entry words (see dictionary.entry_words)."""
+        if not password:
+            return {"score": 0, "strength": "None", "feedback": [], "crack_time": "instant"}
+            
+        # Only the words actually present are handed on, so the cost does not
+        # grow with the size of the custom dictionary.
+        normalized = normalize(password)
+        hits = _custom_dictionary.find(normalized) + find_entry_words(normalized, user_inputs)
+            
+        if ZXCVBN_AVAILABLE:
+            if len(password) > PREFILTER_LENGTH:
+                fast = estimate(password, hits)
+                if fast["guesses"] < PREFILTER_MAX_GUESSES:
+                    return PasswordAnalyzer._from_estimate(fast)
+                    
+            result = get_zxcvbn()(password[:ZXCVBN_MAX_INPUT],
+                                  user_inputs=list({hit[3] for hit in hits}))
+            score = result['score']
+            crack_time = result['crack_times_display']['offline_slow_hashing_1e4_per_second']
+            feedback = result['feedback']['suggestions']
+            
+            strength_map = {0: "Very Weak", 1: "Weak", 2: "Fair", 3: "Good", 4: "Strong"}
+            return {
+                "score": score,
+                "strength": strength_map[score],
+                "feedback": feedback,
+                "crack_time": crack_time
+            }
+        else:
+            return PasswordAnalyzer._from_estimate(estimate(password, hits))
+            
+    @staticmethod
+    def warm_up(background=True):
+        return warm_up(background)
+        
+    @staticmethod
+    def set_dictionary(words):
+        return set_dictionary(words)
+        
+    @staticmethod
+    def _from_estimate(result):
+        return {
+            "score": result['score'],
+            "strength": result['strength'],
+            "feedback": result['feedback'],
+            "crack_time": result['crack_time']
+        }
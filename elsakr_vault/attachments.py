@@ -0,0 +1,300 @@
+"""
+Encrypted file attachments (SSH keys, certificates, documents) for entries.
+
+Each body is encrypted in fixed-size chunks with AES-GCM and streamed into a
+single preallocated blob through SQLite incremental blob I/O
+(Connection.blobopen, Python 3.11+), so storing or extracting a file never
+holds more than one chunk in memory. A chunk's nonce is a random
+per-attachment prefix plus the chunk index, and its associated data binds
+the attachment id, chunk index and a last-chunk flag, so chunks cannot be
+reordered, moved between attachments or truncated without detection.
+
+Names are Fernet-encrypted like notes, under the attachment's key version.
+Listing only reads the attachments table; bodies live in attachment_data.
+
+A large file takes a while to encrypt or decrypt, so the GUI runs add() and
+extract() through AttachmentJob, on a background thread with its own
+SQLite connection, the way MaintenanceJob does. A job reads the vault's
+keys, so cancel it and wait for `done` before locking the vault; it stops
+at the next chunk, and an unfinished add leaves nothing behind.
+"""
+
+import os
+import struct
+import sqlite3
+import secrets
+import threading
+from datetime import datetime
+
+from .tracing import span
+
+CHUNK_SIZE = 64 * 1024
+TAG_SIZE = 16
+NONCE_PREFIX_SIZE = 8
+KEY_INFO = b"elsakr-vault attachments v1"
+
+
+class AttachmentError(Exception):
+    pass
+
+
+class AttachmentStore:
+    """Stores and streams encrypted attachments for an unlocked VaultDatabase."""
+
+    def __init__(self, vault, conn=None, cancel=None):
+        self.vault = vault
+        # A background job passes its own connection (sqlite3 connections are per thread)
+        self.conn = conn or vault.conn
+        self.cancel = cancel    # threading.Event checked between chunks
+
+    def _check_cancel(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise AttachmentError("cancelled")
+
+    def _cipher(self, version=None):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        raw_key = self.vault._keys.get(self.vault.key_version if version is None else version)
+        if raw_key is None:
+            raise AttachmentError("vault is locked")
+        key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                   info=KEY_INFO).derive(raw_key)
+        return AESGCM(key)
+
+    def _blob(self, attachment_id, readonly):
+        if not hasattr(self.conn, "blobopen"):
+            raise AttachmentError("attachments need Python 3.11 or newer")
+        return self.conn.blobopen("attachment_data", "data", attachment_id, readonly=readonly)
+
+    @staticmethod
+    def _nonce(prefix, index):
+        return prefix + struct.pack(">I", index)
+
+    @staticmethod
+    def _aad(attachment_id, index, last):
+        return struct.pack(">QI?", attachment_id, index, last)
+
+    @staticmethod
+    def _chunk_count(size, chunk_size):
+        return max(1, -(-size // chunk_size))
+
+    def add(self, entry_id, name, source, size=None, chunk_size=CHUNK_SIZE):
+        """Encrypt source (a path or binary file object) and attach it to entry_id.
+
+        size is required for file objects without a real file descriptor.
+        Returns the new attachment id.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                return self.add(entry_id, name, f, size, chunk_size)
+        if size is None:
+            size = os.fstat(source.fileno()).st_size - source.tell()
+
+        cipher = self._cipher()
+        name_token = self.vault.encrypt_text(name)
+        chunks = self._chunk_count(size, chunk_size)
+        prefix = secrets.token_bytes(NONCE_PREFIX_SIZE)
+        conn = self.conn
+
+        with span("attachments.add") as trace, conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO attachments (entry_id, name, size, chunk_size, nonce_prefix, created_at,
+                                         key_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (entry_id, name_token, size, chunk_size, prefix, datetime.now().isoformat(),
+                  self.vault.key_version))
+            attachment_id = cursor.lastrowid
+            cursor.execute('INSERT INTO attachment_data (attachment_id, data) VALUES (?, zeroblob(?))',
+                           (attachment_id, size + chunks * TAG_SIZE))
+
+            with self._blob(attachment_id, readonly=False) as blob:
+                for index in range(chunks):
+                    self._check_cancel()
+                    want = min(chunk_size, size - index * chunk_size)
+                    plain = _read_exactly(source, want)
+                    last = index == chunks - 1
+                    blob.write(cipher.encrypt(self._nonce(prefix, index), plain,
+                                              self._aad(attachment_id, index, last)))
+            trace["bytes"] = size
+            trace["chunks"] = chunks
+        return attachment_id
+
+    def iter_chunks(self, attachment_id):
+        """Yield the decrypted body one chunk at a time."""
+        from cryptography.exceptions import InvalidTag
+        meta = self.get(attachment_id)
+        if meta is None:
+            raise AttachmentError(f"attachment not found: {attachment_id}")
+        cipher = self._cipher(meta['key_version'])
+        size, chunk_size, prefix = meta['size'], meta['chunk_size'], meta['nonce_prefix']
+        chunks = self._chunk_count(size, chunk_size)
+
+        with self._blob(attachment_id, readonly=True) as blob:
+            for index in range(chunks):
+                self._check_cancel()
+                length = min(chunk_size, size - index * chunk_size) + TAG_SIZE
+                data = blob.read(length)
+                try:
+                    yield cipher.decrypt(self._nonce(prefix, index), data,
+                                         self._aad(attachment_id, index, index == chunks - 1))
+                except InvalidTag:
+                    raise AttachmentError(f"attachment {attachment_id} is corrupted") from None
+
+    def extract(self, attachment_id, dest):
+        """Decrypt an attachment into dest (a path or binary file object). Returns bytes written."""
+        if isinstance(dest, (str, os.PathLike)):
+            try:
+                with open(dest, "wb") as f:
+                    return self.extract(attachment_id, f)
+            except AttachmentError:
+                # Don't leave half a file that looks like the real one
+                os.remove(dest)
+                raise
+        written = 0
+        with span("attachments.extract") as trace:
+            for chunk in self.iter_chunks(attachment_id):
+                dest.write(chunk)
+                written += len(chunk)
+            trace["bytes"] = written
+        return written
+
+    def get(self, attachment_id):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT id, entry_id, name, size, chunk_size, nonce_prefix, created_at, key_version
+            FROM attachments WHERE id = ?
+        ''', (attachment_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'entry_id': row[1], 'name': self._name(row[0], row[2], row[7]),
+                'size': row[3], 'chunk_size': row[4], 'nonce_prefix': row[5],
+                'created_at': row[6], 'key_version': row[7]}
+
+    def list(self, entry_id):
+        """Attachment names and sizes for an entry (bodies are never read)."""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT id, name, size, created_at, key_version FROM attachments WHERE entry_id = ?
+        ''', (entry_id,))
+        attachments = [{'id': r[0], 'name': self._name(r[0], r[1], r[4]), 'size': r[2],
+                        'created_at': r[3]} for r in cursor.fetchall()]
+        # Names are encrypted, so SQLite can't order them
+        attachments.sort(key=lambda a: a['name'])
+        return attachments
+
+    def _name(self, attachment_id, token, version):
+        from cryptography.fernet import InvalidToken
+        try:
+            return self.vault.decrypt_text(token, version)
+        except (InvalidToken, ValueError):
+            # One damaged name shouldn't hide the entry's other attachments
+            return f"attachment-{attachment_id}"
+
+    def reencrypt(self, attachment_id):
+        """Rewrite an attachment's chunks in place under the current key.
+
+        Ciphertext size doesn't change, so this is done through the same blob
+        in one transaction: a crash, or a chunk that fails to decrypt
+        (AttachmentError), leaves the attachment wholly on its old key.
+        """
+        from cryptography.exceptions import InvalidTag
+        from cryptography.fernet import InvalidToken
+        row = self.conn.execute('SELECT name, key_version FROM attachments WHERE id = ?',
+                                (attachment_id,)).fetchone()
+        version = self.vault.key_version
+        if row is None or row[1] == version:
+            return False
+        try:
+            name_token = self.vault.encrypt_text(self.vault.decrypt_text(row[0], row[1]))
+        except (InvalidToken, ValueError):
+            raise AttachmentError(f"attachment {attachment_id} is corrupted") from None
+        meta = self.get(attachment_id)
+        old, new = self._cipher(meta['key_version']), self._cipher(version)
+        size, chunk_size, prefix = meta['size'], meta['chunk_size'], meta['nonce_prefix']
+        chunks = self._chunk_count(size, chunk_size)
+        with self.conn:
+            # Blob writes don't start a transaction of their own; without this
+            # every chunk would be committed as soon as it is written
+            if not self.conn.in_transaction:
+                self.conn.execute('BEGIN')
+            with self._blob(attachment_id, readonly=False) as blob:
+                for index in range(chunks):
+                    length = min(chunk_size, size - index * chunk_size) + TAG_SIZE
+                    offset = blob.tell()
+                    nonce = self._nonce(prefix, index)
+                    aad = self._aad(attachment_id, index, index == chunks - 1)
+                    try:
+                        plain = old.decrypt(nonce, blob.read(length), aad)
+                    except InvalidTag:
+                        raise AttachmentError(f"attachment {attachment_id} is corrupted") from None
+                    blob.seek(offset)
+                    blob.write(new.encrypt(nonce, plain, aad))
+            self.conn.execute('UPDATE attachments SET name = ?, key_version = ? WHERE id = ?',
+                              (name_token, version, attachment_id))
+        return True
+
+    def delete(self, attachment_id):
+        with self.conn:
+            self.conn.execute('DELETE FROM attachment_data WHERE attachment_id = ?', (attachment_id,))
+            self.conn.execute('DELETE FROM attachments WHERE id = ?', (attachment_id,))
+
+
+class AttachmentJob:
+    """One AttachmentStore call ("add" or "extract") on a background thread.
+
+    Poll `done`, then read `result` or `error`. cancel() stops it at the
+    next chunk with an AttachmentError.
+    """
+
+    def __init__(self, vault, method, *args, busy_timeout=30):
+        self.vault = vault
+        self.method = method
+        self.args = args
+        self.busy_timeout = busy_timeout
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Run in a daemon thread; returns immediately."""
+        self._thread = threading.Thread(target=self._run_safely, name=f"vault-attachment-{self.method}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run_safely(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.error = e
+            self.done.set()
+
+    def run(self):
+        conn = sqlite3.connect(self.vault.db_path, timeout=self.busy_timeout)
+        try:
+            conn.execute('PRAGMA secure_delete = ON')
+            store = AttachmentStore(self.vault, conn, cancel=self._cancel)
+            self.result = getattr(store, self.method)(*self.args)
+        finally:
+            conn.close()
+        self.done.set()
+        return self.result
+
+
+def _read_exactly(source, size):
+    parts = []
+    while size:
+        data = source.read(size)
+        if not data:
+            raise AttachmentError("source ended before the expected size")
+        parts.append(data)
+        size -= len(data)
+    return b"".join(parts)
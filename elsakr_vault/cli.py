@@ -0,0 +1,586 @@
+"""
+Command line interface with JSON output.
+
+    python -m elsakr_vault generate --length 24
+    python -m elsakr_vault analyze "hunter2"
+    python -m elsakr_vault list
+
+Vault commands read the master password from ELSAKR_MASTER_PASSWORD, from
+stdin with --password-stdin, or prompt for it. When ELSAKR_AGENT_SOCK is set
+(see the agent command), get and search are answered by the running agent
+instead and need no password.
+"""
+
+import os
+import sys
+import json
+import getpass
+import argparse
+
+from .generator import PasswordGenerator, compile_policy, profile_for_url
+from .analyzer import PasswordAnalyzer
+from .database import VaultDatabase
+from .dictionary import entry_words
+from .attachments import AttachmentStore, AttachmentError
+from .secret import revealed
+from .maintenance import MaintenanceJob
+from .rotation import KeyRotationJob
+from .sync import VaultSync, SyncError, sync_vaults, read_log, write_log
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "vault.db")
+
+
+class CLIError(Exception):
+    pass
+
+
+def emit(data, pretty=False):
+    print(json.dumps(data, indent=2 if pretty else None, ensure_ascii=False))
+
+
+def read_master_password(args):
+    if args.password_stdin:
+        return sys.stdin.readline().rstrip("\n")
+    password = os.environ.get("ELSAKR_MASTER_PASSWORD")
+    if password:
+        return password
+    return getpass.getpass("Master password: ")
+
+
+def open_vault(args, path=None, password=None):
+    path = path or args.db
+    if not os.path.exists(path) and args.command not in ("add", "import"):
+        raise CLIError(f"vault not found: {path}")
+    vault = VaultDatabase(path)
+    vault.initialize(password if password is not None else read_master_password(args))
+    # Listing needs no key, so without this a wrong password would only show
+    # up later - or never, with add writing rows the real key can't read
+    if not vault.check_key():
+        vault.lock()
+        if path != args.db:
+            raise CLIError(f"{path} uses a different master password")
+        raise CLIError("incorrect master password")
+    return vault
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+    return number
+
+
+def decrypt_or_fail(func, *args):
+    from cryptography.fernet import InvalidToken
+    try:
+        return func(*args)
+    except InvalidToken:
+        # open_vault has already checked the password, so the data itself is bad
+        raise CLIError("stored data does not decrypt with this vault's key (damaged or written under another key)")
+
+
+def find_profile(vault, name=None, url=None):
+    """A stored generator profile by name, else the one matching url (None if neither is given)."""
+    profiles = vault.get_generator_profiles()
+    if name:
+        for profile in profiles:
+            if profile['name'].lower() == name.lower():
+                return profile
+        raise CLIError(f"generator profile not found: {name}")
+    return profile_for_url(profiles, url) if url else None
+
+
+def cmd_generate(args):
+    results = []
+    profile = None
+    if (args.profile or args.url) and not args.passphrase:
+        vault = open_vault(args)
+        try:
+            profile = find_profile(vault, args.profile, args.url)
+        finally:
+            vault.close()
+    for _ in range(args.count):
+        if profile:
+            results.append(compile_policy(**profile['options']).generate(args.length))
+        elif args.passphrase:
+            results.append(PasswordGenerator.generate_passphrase(words=args.words,
+                                                                 separator=args.separator))
+        else:
+            results.append(PasswordGenerator.generate(
+                length=args.length or 16,
+                uppercase=not args.no_uppercase,
+                lowercase=not args.no_lowercase,
+                digits=not args.no_digits,
+                symbols=not args.no_symbols,
+                exclude_ambiguous=args.exclude_ambiguous,
+                exclude_chars=args.exclude,
+            ))
+    if not results[0]:
+        raise CLIError("no characters left to generate from")
+    if profile:
+        return {"passwords": results, "profile": profile['name']}
+    return {"passwords": results}
+
+
+def cmd_analyze(args):
+    password = sys.stdin.readline().rstrip("\n") if args.password == "-" else args.password
+    if args.dictionary_file:
+        with open(args.dictionary_file, encoding="utf-8") as f:
+            PasswordAnalyzer.set_dictionary(f.read().splitlines())
+    return PasswordAnalyzer.analyze(password, user_inputs=entry_words(*args.user_input))
+
+
+def agent_request(op, **params):
+    """Send a request to the agent named by ELSAKR_AGENT_SOCK, or return None.
+
+    None also when that agent isn't running (a stale variable after it
+    exited or timed out), so the caller falls back to the master password.
+    """
+    socket_path = os.environ.get("ELSAKR_AGENT_SOCK")
+    if not socket_path:
+        return None
+    from .agent import AgentClient
+    try:
+        client = AgentClient(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"agent not running at {socket_path}; using the master password", file=sys.stderr)
+        return None
+    except OSError as e:
+        raise CLIError(f"can't reach the agent at {socket_path}: {e}")
+    try:
+        with client:
+            return {"result": client.request(op, **params)}
+    except RuntimeError as e:
+        raise CLIError(str(e))
+    except OSError as e:
+        raise CLIError(f"agent at {socket_path} stopped answering: {e}")
+
+
+def cmd_get(args):
+    reply = agent_request("get", entry=args.entry)
+    if reply is not None:
+        return reply["result"]
+    vault = open_vault(args)
+    try:
+        if args.entry.isdigit():
+            entry = decrypt_or_fail(vault.get_entry, int(args.entry))
+        else:
+            matches = [e for e in vault.search_entries(args.entry)
+                       if e['title'].lower() == args.entry.lower()]
+            entry = decrypt_or_fail(vault.get_entry, matches[0]['id']) if matches else None
+        if entry is None:
+            raise CLIError(f"entry not found: {args.entry}")
+        return revealed(entry)
+    finally:
+        vault.lock()
+
+
+def cmd_add(args):
+    password = args.password
+    vault = open_vault(args)
+    try:
+        if password is None:
+            # Sites with their own rules get a password from their profile
+            profile = find_profile(vault, args.profile, args.url)
+            policy = compile_policy(**profile['options']) if profile else compile_policy()
+            password = policy.generate(args.length)
+        entry_id = vault.add_password(args.title, args.username, password,
+                                      url=args.url, notes=args.notes, category=args.category)
+        return {"id": entry_id, "title": args.title, "password": password}
+    finally:
+        vault.close()
+
+
+def cmd_list(args):
+    vault = open_vault(args)
+    try:
+        return vault.list_entries()
+    finally:
+        vault.close()
+
+
+def cmd_search(args):
+    reply = agent_request("search", query=args.query)
+    if reply is not None:
+        return reply["result"]
+    vault = open_vault(args)
+    try:
+        return vault.search_entries(args.query)
+    finally:
+        vault.close()
+
+
+def cmd_import(args):
+    with open(args.file, encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+        raise CLIError("import file must be a JSON list of entry objects")
+    for e in entries:
+        if not e.get('title') or not e.get('password'):
+            raise CLIError("every entry needs a title and a password")
+    vault = open_vault(args)
+    try:
+        return {"imported": vault.add_passwords(entries)}
+    finally:
+        vault.close()
+
+
+def cmd_export(args):
+    from cryptography.fernet import InvalidToken
+    vault = open_vault(args)
+    entries, damaged = [], []
+    try:
+        for e in vault.list_entries():
+            try:
+                entries.append(revealed(vault.get_entry(e['id'])))
+            except InvalidToken:
+                # The password was checked on open, so only this row is bad; export the rest
+                damaged.append(e['id'])
+    finally:
+        vault.lock()
+    if damaged:
+        print(json.dumps({"warning": "skipped entries that do not decrypt", "ids": damaged}), file=sys.stderr)
+    if args.file == "-":
+        return entries
+    with open(args.file, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2, ensure_ascii=False)
+    result = {"exported": len(entries), "file": args.file}
+    if damaged:
+        result["skipped"] = damaged
+    return result
+
+
+def resolve_entry_id(vault, key):
+    if key.isdigit():
+        return int(key)
+    matches = [e for e in vault.search_entries(key) if e['title'].lower() == key.lower()]
+    if not matches:
+        raise CLIError(f"entry not found: {key}")
+    return matches[0]['id']
+
+
+def cmd_attach(args):
+    vault = open_vault(args)
+    try:
+        entry_id = resolve_entry_id(vault, args.entry)
+        # Decrypting the entry first proves the key, so nothing is stored under a wrong one
+        if decrypt_or_fail(vault.get_entry, entry_id) is None:
+            raise CLIError(f"entry not found: {args.entry}")
+        name = args.name or os.path.basename(args.file)
+        attachment_id = AttachmentStore(vault).add(entry_id, name, args.file)
+        return {"id": attachment_id, "entry_id": entry_id, "name": name,
+                "size": os.path.getsize(args.file)}
+    except AttachmentError as e:
+        raise CLIError(str(e))
+    finally:
+        vault.close()
+
+
+def cmd_attachments(args):
+    vault = open_vault(args)
+    try:
+        return AttachmentStore(vault).list(resolve_entry_id(vault, args.entry))
+    finally:
+        vault.close()
+
+
+def cmd_extract(args):
+    vault = open_vault(args)
+    try:
+        if args.dest == "-":
+            AttachmentStore(vault).extract(args.attachment_id, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+            return None
+        written = AttachmentStore(vault).extract(args.attachment_id, args.dest)
+        return {"extracted": written, "file": args.dest}
+    except AttachmentError as e:
+        raise CLIError(str(e))
+    finally:
+        vault.close()
+
+
+def cmd_dictionary(args):
+    vault = open_vault(args)
+    try:
+        words = vault.get_dictionary_words()
+        if args.add or args.remove:
+            removed = {w.lower() for w in args.remove}
+            words = [w for w in words if w.lower() not in removed] + args.add
+            vault.set_dictionary_words(words)
+        return vault.get_dictionary_words()
+    finally:
+        vault.close()
+
+
+def cmd_profiles(args):
+    vault = open_vault(args)
+    try:
+        if args.profiles_command == "save":
+            try:
+                options = json.loads(args.options)
+                vault.save_generator_profile(args.name, options, args.domain)
+            except (TypeError, ValueError, AttributeError) as e:
+                raise CLIError(f"invalid profile options: {e}")
+        elif args.profiles_command == "delete":
+            if not vault.delete_generator_profile(args.name):
+                raise CLIError(f"generator profile not found: {args.name}")
+        return vault.get_generator_profiles()
+    finally:
+        vault.close()
+
+
+def cmd_maintenance(args):
+    vault = open_vault(args)
+    try:
+        job = MaintenanceJob(vault, compact=not args.no_compact, convert=True).start()
+        while not job.done.wait(0.5):
+            if sys.stderr.isatty():
+                stage, done, total = job.progress
+                print(f"\r{stage}: {done}/{total}", end="", file=sys.stderr, flush=True)
+        if sys.stderr.isatty():
+            print(file=sys.stderr)
+        if job.error:
+            raise CLIError(f"maintenance failed: {job.error}")
+        return job.result
+    finally:
+        vault.close()
+
+
+def read_new_master_password():
+    password = os.environ.get("ELSAKR_NEW_MASTER_PASSWORD")
+    if password:
+        return password
+    password = getpass.getpass("New master password: ")
+    if password != getpass.getpass("Repeat new master password: "):
+        raise CLIError("passwords do not match")
+    return password
+
+
+def cmd_rotate_key(args):
+    vault = open_vault(args)
+    try:
+        # An interrupted rotation is resumed with the key it already switched to
+        resumed = vault.rotation_pending()
+        if not resumed:
+            new_password = read_new_master_password()
+            if len(new_password) < 8:
+                raise CLIError("new master password must be at least 8 characters")
+            vault.begin_key_rotation(new_password)
+        job = KeyRotationJob(vault, workers=args.workers).start()
+        while not job.done.wait(0.5):
+            if sys.stderr.isatty():
+                stage, done, total = job.progress
+                print(f"\r{stage}: {done}/{total}", end="", file=sys.stderr, flush=True)
+        if sys.stderr.isatty():
+            print(file=sys.stderr)
+        if job.error:
+            raise CLIError(f"key rotation failed: {job.error}; run rotate-key again to resume")
+        job.finish()
+        return dict(job.result, resumed=resumed)
+    finally:
+        vault.close()
+
+
+def peer_state(path, replica):
+    """(replica id, highest seq of `replica` merged) for the vault file at path (no key needed)."""
+    import sqlite3
+    if not os.path.exists(path):
+        raise CLIError(f"vault not found: {path}")
+    conn = sqlite3.connect(path)
+    try:
+        peer = conn.execute("SELECT value FROM sync_meta WHERE key = 'replica'").fetchone()
+        row = conn.execute('SELECT seq FROM sync_vector WHERE replica = ?', (replica,)).fetchone()
+    except sqlite3.OperationalError:
+        peer = row = None
+    finally:
+        conn.close()
+    return (peer[0] if peer else None), (row[0] if row else 0)
+
+
+def cmd_sync(args):
+    password = read_master_password(args)
+    vault = open_vault(args, password=password)
+    try:
+        sync = VaultSync(vault)
+        if args.sync_command == "status":
+            return {"replica": sync.replica_id, "seq": sync.current_seq(), "vector": sync.vector()}
+        if args.sync_command == "new-replica-id":
+            return {"replica": sync.new_replica_id()}
+        if args.sync_command == "export":
+            since, peer = args.since, None
+            if args.peer:
+                peer, since = peer_state(args.peer, sync.replica_id)
+            log = sync.export_changes(since=since, peer=peer)
+            write_log(log, args.file)
+            return {"file": args.file, "from_seq": log['from_seq'], "to_seq": log['to_seq']}
+        if args.sync_command == "apply":
+            return decrypt_or_fail(sync.apply_changes, read_log(args.file))
+        other = open_vault(args, path=args.other, password=password)
+        try:
+            return sync_vaults(vault, other)
+        finally:
+            other.close()
+    except SyncError as e:
+        raise CLIError(str(e))
+    finally:
+        vault.close()
+
+
+def cmd_agent(args):
+    from .agent import VaultAgent
+    vault = open_vault(args)
+    agent = VaultAgent(vault, socket_path=args.socket, idle_timeout=args.idle_timeout,
+                       audit_log=args.audit_log)
+    try:
+        # Checked before the socket path is announced
+        agent.prepare_directory()
+        agent.remove_stale_socket()
+    except OSError:
+        vault.lock()
+        raise
+    print(f"ELSAKR_AGENT_SOCK={agent.socket_path}; export ELSAKR_AGENT_SOCK;", flush=True)
+    agent.run()
+    return {"stopped": True}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="elsakr_vault",
+                                     description="Elsakr Password Vault command line")
+    parser.add_argument("--db", default=os.environ.get("ELSAKR_VAULT_DB", DEFAULT_DB_PATH),
+                        help="path to vault.db")
+    parser.add_argument("--password-stdin", action="store_true",
+                        help="read the master password from the first line of stdin")
+    parser.add_argument("--pretty", action="store_true", help="indent JSON output")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("generate", help="generate passwords or passphrases")
+    p.add_argument("--length", type=positive_int, help="default: the profile's, or 16")
+    p.add_argument("--count", type=positive_int, default=1)
+    p.add_argument("--no-uppercase", action="store_true")
+    p.add_argument("--no-lowercase", action="store_true")
+    p.add_argument("--no-digits", action="store_true")
+    p.add_argument("--no-symbols", action="store_true")
+    p.add_argument("--exclude-ambiguous", action="store_true")
+    p.add_argument("--exclude", default="", help="characters to leave out")
+    p.add_argument("--passphrase", action="store_true")
+    p.add_argument("--words", type=positive_int, default=4)
+    p.add_argument("--separator", default="-")
+    p.add_argument("--profile", help="use a generator profile stored in the vault")
+    p.add_argument("--url", help="use the profile stored for this site, if any")
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("analyze", help="analyze password strength ('-' reads stdin)")
+    p.add_argument("password")
+    p.add_argument("--user-input", action="append", default=[],
+                   help="username, site or other entry text to treat as known (repeatable)")
+    p.add_argument("--dictionary-file", help="custom words, one per line")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("get", help="get an entry by id or exact title")
+    p.add_argument("entry")
+    p.set_defaults(func=cmd_get)
+
+    p = sub.add_parser("add", help="add an entry (generates a password if none given)")
+    p.add_argument("--title", required=True)
+    p.add_argument("--username", default="")
+    p.add_argument("--password")
+    p.add_argument("--length", type=positive_int,
+                   help="length when generating (default: the profile's, or 16)")
+    p.add_argument("--profile", help="generator profile (default: the one matching --url)")
+    p.add_argument("--url", default="")
+    p.add_argument("--notes", default="")
+    p.add_argument("--category", default="General")
+    p.set_defaults(func=cmd_add)
+
+    p = sub.add_parser("list", help="list entries (no passwords)")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("search", help="search titles, usernames and URLs")
+    p.add_argument("query")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("import", help="import entries from a JSON file")
+    p.add_argument("file")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="export decrypted entries as JSON ('-' for stdout)")
+    p.add_argument("file")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("attach", help="encrypt a file and attach it to an entry")
+    p.add_argument("entry", help="entry id or exact title")
+    p.add_argument("file")
+    p.add_argument("--name", help="stored file name (default: the file's name)")
+    p.set_defaults(func=cmd_attach)
+
+    p = sub.add_parser("attachments", help="list an entry's attachments")
+    p.add_argument("entry", help="entry id or exact title")
+    p.set_defaults(func=cmd_attachments)
+
+    p = sub.add_parser("extract", help="decrypt an attachment to a file ('-' for stdout)")
+    p.add_argument("attachment_id", type=int)
+    p.add_argument("dest")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("profiles", help="list or edit the vault's generator profiles")
+    actions = p.add_subparsers(dest="profiles_command")
+    a = actions.add_parser("save", help="add or replace a profile")
+    a.add_argument("name")
+    a.add_argument("--options", default="{}",
+                   help='JSON, e.g. \'{"length": 12, "symbols": false, "max_length": 12}\'')
+    a.add_argument("--domain", action="append", default=[], help="site the profile is for (repeatable)")
+    a = actions.add_parser("delete", help="remove a profile")
+    a.add_argument("name")
+    p.set_defaults(func=cmd_profiles)
+
+    p = sub.add_parser("maintenance",
+                       help="integrity check, decrypt-verify every row and compact the file")
+    p.add_argument("--no-compact", action="store_true", help="skip the vacuum stage")
+    p.set_defaults(func=cmd_maintenance)
+
+    p = sub.add_parser("rotate-key",
+                       help="change the master password and re-encrypt everything (resumes if interrupted)")
+    p.add_argument("--workers", type=int, help="re-encryption threads (default: up to 4)")
+    p.set_defaults(func=cmd_rotate_key)
+
+    p = sub.add_parser("sync", help="sync with another copy of the vault through change logs")
+    actions = p.add_subparsers(dest="sync_command", required=True)
+    a = actions.add_parser("status", help="replica id, change sequence and version vector")
+    a = actions.add_parser("export", help="write the changes another copy hasn't merged yet")
+    a.add_argument("file")
+    since = a.add_mutually_exclusive_group()
+    since.add_argument("--since", type=int, default=0, help="local change seq to start after")
+    since.add_argument("--for", dest="peer", metavar="OTHER_DB",
+                       help="start where the vault file OTHER_DB last merged from this one")
+    a = actions.add_parser("apply", help="merge a change log written by another copy")
+    a.add_argument("file")
+    a = actions.add_parser("with", help="two-way sync with another vault file (same master password)")
+    a.add_argument("other")
+    actions.add_parser("new-replica-id", help="run once on a vault file copied from another machine")
+    p.set_defaults(func=cmd_sync)
+
+    p = sub.add_parser("dictionary", help="show or edit the vault's custom analyzer words")
+    p.add_argument("--add", nargs="+", default=[], metavar="WORD")
+    p.add_argument("--remove", nargs="+", default=[], metavar="WORD")
+    p.set_defaults(func=cmd_dictionary)
+
+    p = sub.add_parser("agent", help="keep the vault unlocked and serve it on a unix socket")
+    p.add_argument("--socket", help="socket path in a private (0700) directory "
+                                    "(default: $XDG_RUNTIME_DIR/elsakr-vault/agent.sock)")
+    p.add_argument("--idle-timeout", type=int, default=900, help="seconds before auto-lock")
+    p.add_argument("--audit-log", help="append one JSON line per request to this file")
+    p.set_defaults(func=cmd_agent)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        result = args.func(args)
+        if result is not None:
+            emit(result, args.pretty)
+    except (CLIError, OSError, ValueError) as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,192 @@
+"""
+Clipboard service for secrets.
+
+Every copy gets its own expiry. When it expires the clipboard is cleared
+only if it still holds the value we put there (compared by SHA-256 digest),
+so text the user copied in the meantime is left alone.
+
+pyperclip shells out to xclip/xsel/pbcopy on Linux and macOS, so all of its
+calls run on one worker thread; copy() and clear() only queue work and
+never block the caller (the Tk event loop).
+
+With a Tk root on X11 a copy can also be one-shot: instead of handing the
+value to a clipboard tool, Tk owns the CLIPBOARD selection and serves the
+value itself, then gives the selection up right after the first paste.
+Other platforms keep the value until it expires.
+"""
+
+import time
+import heapq
+import hashlib
+import threading
+
+try:
+    import pyperclip
+    PYPERCLIP_AVAILABLE = True
+except ImportError:
+    PYPERCLIP_AVAILABLE = False
+
+DEFAULT_EXPIRY = 30
+# Paste targets often ask for the value more than once (TARGETS, then
+# UTF8_STRING, sometimes STRING), so the selection is released shortly
+# after the first complete transfer rather than inside it.
+ONE_SHOT_RELEASE_MS = 500
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class ClipboardService:
+    """Copies secrets and clears them again, off the caller's thread."""
+
+    def __init__(self, root=None):
+        self.root = root
+        self.available = PYPERCLIP_AVAILABLE
+        self._pending = []          # heap of (deadline, sequence, digest)
+        self._sequence = 0
+        self._tasks = []
+        self._wake = threading.Condition()
+        self._closed = False
+        self._worker = None
+        self._one_shot_value = None
+        self._one_shot_timer = None
+        self._one_shot_served = False
+
+    @property
+    def supports_one_shot(self):
+        if self.root is None:
+            return False
+        try:
+            return self.root.tk.call("tk", "windowingsystem") == "x11"
+        except Exception:
+            return False
+
+    def copy(self, text, expires=DEFAULT_EXPIRY, one_shot=False):
+        """Put text on the clipboard and clear it after `expires` seconds.
+
+        With one_shot (X11 only) the value is also withdrawn after the first
+        paste. Returns False when no clipboard is available.
+        """
+        if not text:
+            return False
+        if one_shot and self.supports_one_shot:
+            self._release_selection()
+            with self._wake:
+                # Owning the selection replaces whatever pyperclip put there;
+                # checking it later would itself count as the one paste.
+                self._pending.clear()
+            self._own_selection(text)
+            self._schedule(_digest(text), expires, one_shot=True)
+            return True
+        if not self.available:
+            return False
+        self._release_selection()
+        self._submit(("copy", text))
+        self._schedule(_digest(text), expires)
+        return True
+
+    def clear(self):
+        """Clear every pending value now (if the clipboard still holds it)."""
+        self._release_selection()
+        with self._wake:
+            digests = [digest for _, _, digest in self._pending]
+            self._pending.clear()
+            for digest in digests:
+                self._tasks.append(("clear", digest))
+            self._wake.notify()
+
+    def shutdown(self, timeout=2.0):
+        """Clear pending values and stop the worker, waiting up to timeout seconds."""
+        self.clear()
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        if self._worker:
+            self._worker.join(timeout)
+
+    # -- worker thread (pyperclip) ------------------------------------------
+
+    def _submit(self, task):
+        with self._wake:
+            self._tasks.append(task)
+            self._ensure_worker()
+            self._wake.notify()
+
+    def _schedule(self, digest, expires, one_shot=False):
+        if one_shot:
+            # Tk owns the selection; expiry has to run on the Tk thread.
+            self._one_shot_timer = self.root.after(int(expires * 1000), self._release_selection)
+            return
+        with self._wake:
+            self._sequence += 1
+            heapq.heappush(self._pending, (time.monotonic() + expires, self._sequence, digest))
+            self._ensure_worker()
+            self._wake.notify()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="clipboard", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._tasks:
+                    if self._pending and self._pending[0][0] <= time.monotonic():
+                        _, _, digest = heapq.heappop(self._pending)
+                        self._tasks.append(("clear", digest))
+                        break
+                    if self._closed:
+                        return
+                    timeout = self._pending[0][0] - time.monotonic() if self._pending else None
+                    self._wake.wait(timeout)
+                tasks, self._tasks = self._tasks, []
+            for task in tasks:
+                self._perform(*task)
+
+    def _perform(self, action, value):
+        try:
+            if action == "copy":
+                pyperclip.copy(value)
+            elif _digest(pyperclip.paste() or "") == value:
+                pyperclip.copy("")
+        except Exception:
+            pass
+
+    # -- one-shot copies via the Tk CLIPBOARD selection (X11) ---------------
+
+    def _own_selection(self, text):
+        self._one_shot_value = text
+        self._one_shot_served = False
+        self.root.selection_handle(self._serve, selection="CLIPBOARD")
+        self.root.selection_handle(self._serve, selection="CLIPBOARD", type="UTF8_STRING")
+        self.root.selection_own(selection="CLIPBOARD", command=self._selection_lost)
+
+    def _serve(self, offset, length):
+        value = self._one_shot_value
+        if value is None:
+            return ""
+        offset, length = int(offset), int(length)
+        if offset + length >= len(value) and not self._one_shot_served:
+            self._one_shot_served = True
+            if self._one_shot_timer is not None:
+                self.root.after_cancel(self._one_shot_timer)
+            self._one_shot_timer = self.root.after(ONE_SHOT_RELEASE_MS, self._release_selection)
+        return value[offset:offset + length]
+
+    def _selection_lost(self):
+        # Someone else copied something: nothing of ours is left to clear.
+        self._one_shot_value = None
+        if self._one_shot_timer is not None:
+            self.root.after_cancel(self._one_shot_timer)
+            self._one_shot_timer = None
+
+    def _release_selection(self):
+        if self._one_shot_value is None:
+            return
+        self._selection_lost()
+        try:
+            self.root.clipboard_clear()
+        except Exception:
+            pass
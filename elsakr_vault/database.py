@@ -0,0 +1,712 @@
+"""
+Encrypted SQLite password storage.
+"""
+
+import json
+import time
+import base64
+import hashlib
+import sqlite3
+import secrets
+import weakref
+import importlib.util
+from datetime import datetime
+
+from .generator import PROFILE_PRESETS, compile_policy, url_host
+from .secret import Secret
+from .tracing import span, traced
+
+# cryptography is imported in initialize() so read-only tools start quickly
+CRYPTO_AVAILABLE = importlib.util.find_spec("cryptography") is not None
+
+# Sortable list columns -> ORDER BY expression (each has a matching index)
+SORT_COLUMNS = {
+    'title': 'title COLLATE NOCASE',
+    'username': "IFNULL(username, '') COLLATE NOCASE",
+    'category': "IFNULL(category, '') COLLATE NOCASE",
+    'created': "IFNULL(created_at, '')",
+}
+PAGE_SIZE = 200
+
+KDF_ITERATIONS = 480000
+# check_key() tries this many rows before deciding the key is wrong
+KEY_CHECK_ROWS = 5
+LEGACY_SALT = b'elsakr_password_vault_salt_2024'  # In production, use random salt stored separately
+
+
+def derive_key(master_password, version=1):
+    """PBKDF2 key for a key version, as a bytearray the caller can wipe.
+    
+    Version 1 is the original key. Later versions (after a rotation) mix the
+    version into the salt, so rotating with an unchanged password still
+    yields a new key, and copies rotated the same way can keep syncing.
+    cryptography releases without derive_into return the key as bytes
+    first; that copy can only be released, not zeroed.
+    """
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    salt = LEGACY_SALT if version == 1 else LEGACY_SALT + b"/v%d" % version
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=KDF_ITERATIONS,
+    )
+    key = bytearray(32)
+    if hasattr(kdf, 'derive_into'):
+        kdf.derive_into(master_password.encode(), key)
+    else:
+        key[:] = kdf.derive(master_password.encode())
+    return key
+
+
+def legacy_uuid(id, created_at, title):
+    """Sync uuid for a row written before entries had one.
+    
+    Every copy of one vault derives the same uuid for the same row, so the
+    first sync between copies merges their entries instead of duplicating
+    them. Only plaintext columns go in, so it needs no key and doesn't
+    change with a key rotation.
+    """
+    source = f"elsakr-vault legacy entry|{id}|{created_at or ''}|{title}"
+    return hashlib.sha256(source.encode()).hexdigest()[:32]
+
+
+# Entry fields merged last-writer-wins by sync.py; each carries a
+# [clock, replica] stamp in the row's `stamps` JSON
+SYNC_FIELDS = ('title', 'username', 'password_encrypted', 'url', 'notes', 'category')
+
+
+class VaultDatabase:
+    """Encrypted password storage."""
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.fernet = None
+        self.conn = None
+        self._key = None
+        self.replica_id = None
+        # Key material by key version; more than one only mid-rotation
+        self.key_version = None
+        self.fernets = {}
+        self._keys = {}
+        # Every decrypted Secret handed out, so lock() can wipe them
+        self._secrets = weakref.WeakSet()
+        
+    @traced("vault.initialize")
+    def initialize(self, master_password):
+        """Initialize database with master password."""
+        if not CRYPTO_AVAILABLE:
+            raise Exception("cryptography library not installed")
+        from cryptography.fernet import InvalidToken
+        
+        # Connect to database
+        self.conn = sqlite3.connect(self.db_path)
+        # Overwrite deleted rows instead of leaving old ciphertext in free pages
+        self.conn.execute('PRAGMA secure_delete = ON')
+        self._create_tables()
+        
+        # Derive key from master password
+        self.key_version = self.get_meta('key_version', 1)
+        self._set_key(self.key_version, derive_key(master_password, self.key_version))
+        # While a key rotation is unfinished the previous key is kept,
+        # wrapped under the new one, so rows not yet re-encrypted stay readable
+        wrapped = self.get_meta('previous_key')
+        if wrapped:
+            try:
+                self._set_key(self.key_version - 1, self.fernet.decrypt(wrapped.encode()))
+            except InvalidToken:
+                pass
+        self._encrypt_legacy_notes()
+        self._encrypt_legacy_attachment_names()
+        
+    def _set_key(self, version, raw_key):
+        from cryptography.fernet import Fernet
+        # Keep the raw key in a mutable buffer so lock() can zero it. Fernet
+        # keeps its own immutable copies, which lock() can only drop.
+        if not isinstance(raw_key, bytearray):
+            raw_key = bytearray(raw_key)
+        self._keys[version] = raw_key
+        self.fernets[version] = Fernet(base64.urlsafe_b64encode(raw_key))
+        if version == self.key_version:
+            self._key = self._keys[version]
+            self.fernet = self.fernets[version]
+            
+    def get_meta(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM vault_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+        
+    def _create_tables(self):
+        cursor = self.conn.cursor()
+        new_vault = not cursor.execute("SELECT 1 FROM sqlite_master "
+                                       "WHERE type = 'table' AND name = 'passwords'").fetchone()
+        # Only takes effect on a new, empty file; maintenance converts old vaults
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS passwords (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                username TEXT,
+                password_encrypted TEXT NOT NULL,
+                url TEXT,
+                notes TEXT,
+                category TEXT DEFAULT 'General',
+                created_at TEXT,
+                updated_at TEXT
+            )
+        ''')
+        # Sync bookkeeping: a stable id per entry, per-field stamps, the
+        # local change sequence the entry was last written at and the replica
+        # whose change log it was last merged from as-is (see sync.py)
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(passwords)')}
+        for column in ('uuid TEXT', 'stamps TEXT', 'seq INTEGER', 'key_version INTEGER NOT NULL DEFAULT 1',
+                       'merged_from TEXT'):
+            if column.split()[0] not in columns:
+                cursor.execute(f'ALTER TABLE passwords ADD COLUMN {column}')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_passwords_uuid ON passwords (uuid)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_passwords_seq ON passwords (seq)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_passwords_key_version ON passwords (key_version)')
+        cursor.execute('CREATE TABLE IF NOT EXISTS vault_meta (key TEXT PRIMARY KEY, value)')
+        if new_vault:
+            # Nothing to convert: notes and attachment names in a new vault
+            # are encrypted from the start
+            cursor.execute("INSERT OR IGNORE INTO vault_meta VALUES ('notes_encrypted', 1)")
+            cursor.execute("INSERT OR IGNORE INTO vault_meta VALUES ('attachment_names_encrypted', 1)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tombstones (
+                uuid TEXT PRIMARY KEY,
+                stamp INTEGER NOT NULL,
+                replica TEXT NOT NULL,
+                seq INTEGER NOT NULL
+            )
+        ''')
+        if 'merged_from' not in {row[1] for row in cursor.execute('PRAGMA table_info(tombstones)')}:
+            cursor.execute('ALTER TABLE tombstones ADD COLUMN merged_from TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tombstones_seq ON tombstones (seq)')
+        cursor.execute('CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_vector (
+                replica TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO sync_meta VALUES ('replica', ?)", (secrets.token_hex(8),))
+        cursor.execute("INSERT OR IGNORE INTO sync_meta VALUES ('seq', 0)")
+        cursor.execute("INSERT OR IGNORE INTO sync_meta VALUES ('clock', 0)")
+        self.replica_id = cursor.execute("SELECT value FROM sync_meta WHERE key = 'replica'").fetchone()[0]
+        legacy = cursor.execute('SELECT id, created_at, title FROM passwords WHERE uuid IS NULL').fetchall()
+        if legacy:
+            seq, stamp = self.next_change(cursor)
+            stamps = self.field_stamps(stamp)
+            cursor.executemany('UPDATE passwords SET uuid = ?, stamps = ?, seq = ? WHERE id = ?',
+                               [(legacy_uuid(*row), stamps, seq, row[0]) for row in legacy])
+        # One index per sortable column, ending in id for keyset paging
+        for name, expression in SORT_COLUMNS.items():
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_passwords_{name} '
+                           f'ON passwords ({expression}, id)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS categories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL
+            )
+        ''')
+        # Organization words the analyzer treats as weak (order = rank)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS dictionary_words (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                word TEXT UNIQUE NOT NULL
+            )
+        ''')
+        # Named generator settings, matched to entries by domain (see generator.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS generator_profiles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                options TEXT NOT NULL,
+                domains TEXT NOT NULL DEFAULT '[]'
+            )
+        ''')
+        # Presets are added once, so deleting one makes it stay deleted
+        if cursor.execute("INSERT OR IGNORE INTO vault_meta VALUES ('profiles_seeded', 1)").rowcount:
+            cursor.executemany('INSERT OR IGNORE INTO generator_profiles (name, options, domains) VALUES (?, ?, ?)',
+                               [(name, json.dumps(options), json.dumps(domains))
+                                for name, options, domains in PROFILE_PRESETS])
+        # Attachment metadata; bodies live in attachment_data (see attachments.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attachments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                entry_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                chunk_size INTEGER NOT NULL,
+                nonce_prefix BLOB NOT NULL,
+                created_at TEXT
+            )
+        ''')
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(attachments)')}
+        if 'key_version' not in columns:
+            cursor.execute('ALTER TABLE attachments ADD COLUMN key_version INTEGER NOT NULL DEFAULT 1')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attachments_entry ON attachments (entry_id)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attachment_data (
+                attachment_id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL
+            )
+        ''')
+        # Insert default categories
+        default_cats = ['General', 'Work', 'Social', 'Finance', 'Shopping', 'Email']
+        for cat in default_cats:
+            try:
+                cursor.execute('INSERT OR IGNORE INTO categories (name) VALUES (?)', (cat,))
+            except:
+                pass
+        self.conn.commit()
+        
+    def next_change(self, cursor, count=1):
+        """Reserve `count` change sequence numbers and a clock stamp.
+        
+        Runs inside the caller's write transaction, so two processes on the
+        same file never hand out the same numbers. The clock is wall time in
+        milliseconds, but never goes backwards. Returns (first seq, stamp).
+        """
+        now = int(time.time() * 1000)
+        cursor.execute("UPDATE sync_meta SET value = value + ? WHERE key = 'seq'", (count,))
+        cursor.execute("UPDATE sync_meta SET value = MAX(value + 1, ?) WHERE key = 'clock'", (now,))
+        cursor.execute("SELECT key, value FROM sync_meta WHERE key IN ('seq', 'clock')")
+        values = dict(cursor.fetchall())
+        return values['seq'] - count + 1, values['clock']
+        
+    def field_stamps(self, stamp, fields=SYNC_FIELDS):
+        return json.dumps({field: [stamp, self.replica_id] for field in fields})
+        
+    def check_key(self):
+        """True if the master password opens this vault (or it has no entries yet).
+        
+        Only rows on the current key version are tried, and one that decrypts
+        is enough (a wrong key decrypts none), so a damaged row can't fail the
+        check. Early in a rotation there may be no such row yet; the previous
+        key then only unwrapped if the current one is right.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT password_encrypted FROM passwords WHERE key_version = ? ORDER BY id LIMIT ?',
+                       (self.key_version, KEY_CHECK_ROWS))
+        samples = cursor.fetchall()
+        if not samples:
+            return not self.rotation_pending() or self.key_version - 1 in self.fernets
+        for (token,) in samples:
+            try:
+                self.fernet.decrypt(token.encode())
+                return True
+            except Exception:
+                pass
+        return False
+        
+    def _encrypt_legacy_notes(self):
+        # Older vaults stored notes as plaintext. Convert them once, and only
+        # once the key is known to be right, or a mistyped password would
+        # garble them. Vaults opened by earlier releases that encrypt notes
+        # already hold tokens too, so a note is plaintext when it doesn't
+        # decrypt under its row's key, whatever it looks like.
+        if self.get_meta('notes_encrypted') or not self.check_key():
+            return
+        from cryptography.fernet import InvalidToken
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, key_version, notes FROM passwords WHERE notes IS NOT NULL AND notes != ''")
+        updates = []
+        for id, version, notes in cursor.fetchall():
+            fernet = self.fernets.get(version)
+            if fernet is None:
+                # That key isn't loaded; leave everything for a later unlock
+                return
+            try:
+                fernet.decrypt(notes.encode())
+            except InvalidToken:
+                updates.append((fernet.encrypt(notes.encode()).decode(), id))
+        with self.conn:
+            self.conn.executemany('UPDATE passwords SET notes = ? WHERE id = ?', updates)
+            self.conn.execute("INSERT OR REPLACE INTO vault_meta VALUES ('notes_encrypted', 1)")
+        
+    def _encrypt_legacy_attachment_names(self):
+        # Attachment names were stored as plaintext at first; converted once,
+        # by the same rules as notes above
+        if self.get_meta('attachment_names_encrypted') or not self.check_key():
+            return
+        from cryptography.fernet import InvalidToken
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, key_version, name FROM attachments')
+        updates = []
+        for id, version, name in cursor.fetchall():
+            fernet = self.fernets.get(version)
+            if fernet is None:
+                return
+            try:
+                fernet.decrypt(name.encode())
+            except InvalidToken:
+                updates.append((fernet.encrypt(name.encode()).decode(), id))
+        with self.conn:
+            self.conn.executemany('UPDATE attachments SET name = ? WHERE id = ?', updates)
+            self.conn.execute("INSERT OR REPLACE INTO vault_meta VALUES ('attachment_names_encrypted', 1)")
+        
+    def encrypt_text(self, text):
+        """Encrypt an optional text field; empty stays empty."""
+        return self.fernet.encrypt(text.encode()).decode() if text else ""
+        
+    def decrypt_text(self, token, version=None):
+        if not token:
+            return ""
+        fernet = self.fernet if version is None else self.fernet_for(version)
+        return fernet.decrypt(token.encode()).decode()
+        
+    def decrypt_secret(self, token, version=None):
+        """Decrypt straight into a Secret that lock() will wipe."""
+        fernet = self.fernet if version is None else self.fernet_for(version)
+        secret = Secret(fernet.decrypt(token.encode()) if token else b"")
+        self._secrets.add(secret)
+        return secret
+        
+    def wipe_secrets(self):
+        """Zero every decrypted password and note Secret still alive."""
+        for secret in list(self._secrets):
+            secret.wipe()
+        self._secrets.clear()
+        
+    def fernet_for(self, version):
+        """The Fernet for a row's key version (InvalidToken if that key isn't loaded)."""
+        fernet = self.fernets.get(version)
+        if fernet is None:
+            from cryptography.fernet import InvalidToken
+            raise InvalidToken
+        return fernet
+        
+    def reencrypt_fields(self, version, password_encrypted, notes):
+        """A row's encrypted fields under the current key. Safe to call from worker threads."""
+        if version == self.key_version:
+            return password_encrypted, notes
+        old = self.fernet_for(version)
+        password_encrypted = self.fernet.encrypt(old.decrypt(password_encrypted.encode())).decode()
+        if notes:
+            notes = self.fernet.encrypt(old.decrypt(notes.encode())).decode()
+        return password_encrypted, notes
+        
+    def rotation_pending(self):
+        """True while rows or attachments are still encrypted under an older key."""
+        return bool(self.get_meta('previous_key'))
+        
+    def begin_key_rotation(self, new_master_password):
+        """Switch to a new key (a new master password, or the same one at the next version).
+        
+        New writes use the new key at once. Existing rows keep working
+        through their key_version tag until KeyRotationJob re-encrypts them.
+        """
+        if self.rotation_pending():
+            raise RuntimeError("a key rotation is already in progress; resume it first")
+        if not self.check_key():
+            # Wrapping a wrong key as the previous one would lose the real one for good
+            raise RuntimeError("the current key does not decrypt this vault")
+        new_version = self.key_version + 1
+        new_key = derive_key(new_master_password, new_version)
+        from cryptography.fernet import Fernet
+        wrapped = Fernet(base64.urlsafe_b64encode(new_key)).encrypt(bytes(self._key)).decode()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO vault_meta VALUES ('previous_key', ?)", (wrapped,))
+            self.conn.execute("INSERT OR REPLACE INTO vault_meta VALUES ('key_version', ?)", (new_version,))
+        self.key_version = new_version
+        self._set_key(new_version, new_key)
+        return new_version
+        
+    def finish_key_rotation(self, conn=None, unreadable=(), unreadable_attachments=()):
+        """Drop the previous key once nothing it can read uses it. Returns True when done.
+        
+        unreadable and unreadable_attachments are the ids a KeyRotationJob
+        could not decrypt with any loaded key. Keeping the key would not help
+        them, so they don't hold the rotation up: they stay as they are,
+        unreadable, and can still be deleted.
+        """
+        conn = conn or self.conn
+        for table, skipped in (('passwords', unreadable), ('attachments', unreadable_attachments)):
+            skipped = set(skipped)
+            left = conn.execute(f'SELECT id FROM {table} WHERE key_version < ?',
+                                (self.key_version,))
+            if any(id not in skipped for id, in left):
+                return False
+        with conn:
+            conn.execute("DELETE FROM vault_meta WHERE key = 'previous_key'")
+        for version in [v for v in self._keys if v != self.key_version]:
+            self._wipe(self._keys.pop(version))
+            self.fernets.pop(version, None)
+        return True
+        
+    @staticmethod
+    def _wipe(buffer):
+        for i in range(len(buffer)):
+            buffer[i] = 0
+            
+    @traced("vault.add_password")
+    def add_password(self, title, username, password, url="", notes="", category="General"):
+        """Add a new password entry."""
+        encrypted = self.fernet.encrypt(password.encode()).decode()
+        now = datetime.now().isoformat()
+        
+        cursor = self.conn.cursor()
+        seq, stamp = self.next_change(cursor)
+        cursor.execute('''
+            INSERT INTO passwords (title, username, password_encrypted, url, notes, category, created_at, updated_at,
+                                   uuid, stamps, seq, key_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title, username, encrypted, url, self.encrypt_text(notes), category, now, now,
+              secrets.token_hex(16), self.field_stamps(stamp), seq, self.key_version))
+        self.conn.commit()
+        return cursor.lastrowid
+        
+    def add_passwords(self, entries):
+        """Add many entries in a single transaction. Returns the count added."""
+        now = datetime.now().isoformat()
+        rows = [
+            (e['title'], e.get('username', ''),
+             self.fernet.encrypt(e['password'].encode()).decode(),
+             e.get('url', ''), self.encrypt_text(e.get('notes', '')), e.get('category') or 'General',
+             e.get('created_at') or now, e.get('updated_at') or now)
+            for e in entries
+        ]
+        with self.conn:
+            cursor = self.conn.cursor()
+            first, stamp = self.next_change(cursor, len(rows))
+            stamps = self.field_stamps(stamp)
+            cursor.executemany('''
+                INSERT INTO passwords (title, username, password_encrypted, url, notes, category, created_at, updated_at,
+                                       uuid, stamps, seq, key_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [row + (secrets.token_hex(16), stamps, first + i, self.key_version)
+                  for i, row in enumerate(rows)])
+        return len(rows)
+        
+    @traced("vault.update_password")
+    def update_password(self, id, **fields):
+        """Change some of an entry's fields (title, username, password, url, notes, category).
+        
+        Only the fields given get a new sync stamp, so edits to different
+        fields on two machines both survive a sync.
+        """
+        values = {}
+        for field, value in fields.items():
+            if field == 'password':
+                values['password_encrypted'] = self.fernet.encrypt(value.encode()).decode()
+            elif field == 'notes':
+                values['notes'] = self.encrypt_text(value)
+            elif field in SYNC_FIELDS and field != 'password_encrypted':
+                values[field] = value
+            else:
+                raise ValueError(f"unknown entry field: {field}")
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT stamps, key_version, password_encrypted, notes FROM passwords WHERE id = ?', (id,))
+        row = cursor.fetchone()
+        if row is None or not values:
+            return False
+        seq, stamp = self.next_change(cursor)
+        stamps = json.loads(row[0])
+        stamps.update({field: [stamp, self.replica_id] for field in values})
+        # The row's key_version covers both encrypted fields, so bring the
+        # untouched one to the current key too (not a change to sync)
+        password_encrypted, notes = self.reencrypt_fields(row[1], row[2], row[3])
+        values = {'password_encrypted': password_encrypted, 'notes': notes} | values
+        assignments = ", ".join(f"{field} = ?" for field in values)
+        cursor.execute(f'UPDATE passwords SET {assignments}, stamps = ?, seq = ?, key_version = ?, updated_at = ?, '
+                       f'merged_from = NULL WHERE id = ?',
+                       tuple(values.values()) + (json.dumps(stamps), seq, self.key_version,
+                                                 datetime.now().isoformat(), id))
+        self.conn.commit()
+        return True
+        
+    def _row_to_entry(self, row, password=None):
+        """Metadata dict for a row; password (and decrypted notes) as Secrets only when given."""
+        entry = {
+            'id': row[0],
+            'title': row[1],
+            'username': row[2],
+            'url': row[4],
+            'category': row[6],
+            'created_at': row[7],
+            'updated_at': row[8]
+        }
+        if password is not None:
+            entry['password'] = password
+            entry['notes'] = self.decrypt_secret(row[5], row[12])
+        return entry
+        
+    def iter_passwords(self, batch_size=500):
+        """Yield every entry decrypted, one at a time, in title order.
+        
+        Rows are streamed in batches, so only what the caller keeps stays in
+        memory; wipe each entry (secret.wipe_entry) once done with it.
+        Rows that don't decrypt are skipped.
+        """
+        with span("vault.iter_passwords") as trace:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT * FROM passwords ORDER BY title')
+            count = failed = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    count += 1
+                    try:
+                        entry = self._row_to_entry(row, self.decrypt_secret(row[3], row[12]))
+                    except Exception:
+                        failed += 1
+                        continue
+                    yield entry
+            trace["count"] = count
+            trace["failed"] = failed
+        
+    @traced("vault.get_entry")
+    def get_entry(self, id):
+        """Get a single entry with its password decrypted, or None."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM passwords WHERE id = ?', (id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return self._row_to_entry(row, self.decrypt_secret(row[3], row[12]))
+        
+    def list_entries(self):
+        """Get all entries without decrypting passwords."""
+        with span("vault.list_entries") as trace:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT * FROM passwords ORDER BY title')
+            entries = [self._row_to_entry(row) for row in cursor.fetchall()]
+            trace["count"] = len(entries)
+        return entries
+        
+    def list_page(self, sort='title', descending=False, after=None, limit=PAGE_SIZE):
+        """One page of entries (no decryption) ordered by a SORT_COLUMNS key.
+        
+        Pass the returned cursor as `after` to get the next page; it is None
+        after the last page. A page is at most two index seeks - the rest of
+        the current sort value's run, then the values after it - so its cost
+        doesn't grow with how deep into the list it starts.
+        """
+        expression = SORT_COLUMNS[sort]
+        direction, compare = ('DESC', '<') if descending else ('ASC', '>')
+        select = f'SELECT *, {expression} FROM passwords'
+        with span("vault.list_page") as trace:
+            cursor = self.conn.cursor()
+            if after is None:
+                cursor.execute(f'{select} ORDER BY {expression} {direction}, id {direction} LIMIT ?',
+                               (limit,))
+                rows = cursor.fetchall()
+            else:
+                value, last_id = after
+                cursor.execute(f'{select} WHERE {expression} = ? AND id {compare} ? '
+                               f'ORDER BY id {direction} LIMIT ?', (value, last_id, limit))
+                rows = cursor.fetchall()
+                if len(rows) < limit:
+                    cursor.execute(f'{select} WHERE {expression} {compare} ? '
+                                   f'ORDER BY {expression} {direction}, id {direction} LIMIT ?',
+                                   (value, limit - len(rows)))
+                    rows += cursor.fetchall()
+            trace["count"] = len(rows)
+        entries = [self._row_to_entry(row) for row in rows]
+        next_after = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+        return entries, next_after
+        
+    def list_search_fields(self):
+        """(id, title, username, url) of every entry, for in-memory search indexes."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, title, username, url FROM passwords')
+        return cursor.fetchall()
+        
+    def search_entries(self, query):
+        """Find entries whose title, username or URL contains query (no decryption)."""
+        pattern = f"%{query}%"
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT * FROM passwords
+            WHERE title LIKE ? OR username LIKE ? OR url LIKE ?
+            ORDER BY title
+        ''', (pattern, pattern, pattern))
+        return [self._row_to_entry(row) for row in cursor.fetchall()]
+        
+    def delete_password(self, id):
+        """Delete a password entry and its attachments, leaving a sync tombstone."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT uuid FROM passwords WHERE id = ?', (id,))
+        row = cursor.fetchone()
+        if row and row[0]:
+            seq, stamp = self.next_change(cursor)
+            cursor.execute('INSERT OR REPLACE INTO tombstones (uuid, stamp, replica, seq) VALUES (?, ?, ?, ?)',
+                           (row[0], stamp, self.replica_id, seq))
+        self.delete_entry_rows(cursor, id)
+        self.conn.commit()
+        
+    def delete_entry_rows(self, cursor, id):
+        """Remove an entry and its attachments (no tombstone, no commit)."""
+        cursor.execute('''DELETE FROM attachment_data WHERE attachment_id IN
+                          (SELECT id FROM attachments WHERE entry_id = ?)''', (id,))
+        cursor.execute('DELETE FROM attachments WHERE entry_id = ?', (id,))
+        cursor.execute('DELETE FROM passwords WHERE id = ?', (id,))
+        
+    def get_categories(self):
+        """Get all categories."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT name FROM categories ORDER BY name')
+        return [row[0] for row in cursor.fetchall()]
+        
+    def get_dictionary_words(self):
+        """Get the vault's custom analyzer words in rank order."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT word FROM dictionary_words ORDER BY id')
+        return [row[0] for row in cursor.fetchall()]
+        
+    def set_dictionary_words(self, words):
+        """Replace the vault's custom analyzer words."""
+        with self.conn:
+            self.conn.execute('DELETE FROM dictionary_words')
+            self.conn.executemany('INSERT OR IGNORE INTO dictionary_words (word) VALUES (?)',
+                                  [(w.strip(),) for w in words if w.strip()])
+        
+    def get_generator_profiles(self):
+        """Generator profiles as {'name', 'options', 'domains'} dicts, oldest first."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT name, options, domains FROM generator_profiles ORDER BY id')
+        return [{'name': name, 'options': json.loads(options), 'domains': tuple(json.loads(domains))}
+                for name, options, domains in cursor.fetchall()]
+        
+    def save_generator_profile(self, name, options, domains=()):
+        """Add or replace a profile; options are compile_policy() arguments."""
+        compile_policy(**options)   # TypeError on an unknown option
+        for option, least in (('length', 1), ('min_length', 0), ('max_length', 0)):
+            value = options.get(option, least)
+            if not isinstance(value, int) or isinstance(value, bool) or value < least:
+                raise ValueError(f"{option} must be a whole number of at least {least}")
+        domains = [url_host(d) for d in domains if url_host(d)]
+        with self.conn:
+            self.conn.execute('''
+                INSERT INTO generator_profiles (name, options, domains) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET options = excluded.options, domains = excluded.domains
+            ''', (name, json.dumps(options), json.dumps(domains)))
+            
+    def delete_generator_profile(self, name):
+        with self.conn:
+            return self.conn.execute('DELETE FROM generator_profiles WHERE name = ?', (name,)).rowcount > 0
+            
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+            
+    def lock(self):
+        """Close the database and drop the keys and decrypted secrets.
+        
+        Best-effort, like secret.py: the raw key buffers and Secrets are
+        zeroed, but the copies Fernet and the attachment cipher hold are
+        immutable bytes, so those are only released.
+        """
+        self.wipe_secrets()
+        for key in self._keys.values():
+            self._wipe(key)
+        self._keys.clear()
+        self.fernets.clear()
+        self._key = None
+        self.fernet = None
+        self.close()
@@ -0,0 +1,116 @@
+"""
+Custom (organization) dictionaries for the strength analyzer.
+
+Words such as company, product and user names are normalized the same way
+as passwords (lowercase, leet undone) and compiled once into an
+Aho-Corasick automaton, so finding every dictionary word inside a password
+costs one pass over the password no matter how many words there are.
+"""
+
+import re
+from collections import deque
+
+from .estimator import normalize
+
+MIN_WORD_LENGTH = 3
+
+# Parts of URLs and e-mail addresses that say nothing about the entry
+IGNORED_TOKENS = frozenset(("http", "https", "www", "com", "net", "org", "login", "mail"))
+_TOKEN_SPLIT = re.compile(r"[^0-9A-Za-zÀ-￿]+")
+
+
+class AhoCorasick:
+    """Multi-pattern matcher; find() yields (start, end, pattern index)."""
+
+    __slots__ = ("goto", "fail", "out")
+
+    def __init__(self, patterns):
+        goto = [{}]
+        out = [()]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                node = nxt
+            out[node] += ((len(pattern), index),)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                out[nxt] += out[fail[nxt]]
+
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+
+    def find(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        hits = []
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, index in out[node]:
+                hits.append((i + 1 - length, i + 1, index))
+        return hits
+
+
+class CustomDictionary:
+    """An immutable, compiled word list. Earlier words rank as more guessable."""
+
+    def __init__(self, words=()):
+        seen = {}
+        for word in words:
+            key = normalize(word.strip())
+            if len(key) >= MIN_WORD_LENGTH and key not in seen:
+                seen[key] = word.strip().lower()
+        self.keys = tuple(seen)
+        self.words = tuple(seen.values())
+        self.automaton = AhoCorasick(self.keys) if self.keys else None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, normalized_password):
+        """Return (start, end, rank, word) for every dictionary word in the password."""
+        if self.automaton is None:
+            return []
+        return [(start, end, index + 1, self.words[index])
+                for start, end, index in self.automaton.find(normalized_password)]
+
+
+def entry_words(*fields):
+    """Split entry fields (title, username, URL...) into words worth checking."""
+    words = []
+    for field in fields:
+        for token in _TOKEN_SPLIT.split(field or ""):
+            token = token.lower()
+            if len(token) >= MIN_WORD_LENGTH and token not in IGNORED_TOKENS and token not in words:
+                words.append(token)
+    return words
+
+
+def find_entry_words(normalized_password, words):
+    """Locate a handful of per-entry words (rank 1: an attacker knows them)."""
+    hits = []
+    for word in words:
+        key = normalize(word)
+        start = normalized_password.find(key)
+        while start != -1:
+            hits.append((start, start + len(key), 1, word))
+            start = normalized_password.find(key, start + 1)
+    return hits
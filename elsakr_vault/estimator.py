@@ -0,0 +1,361 @@
+"""
+Fast zxcvbn-style strength estimator.
+
+Used by PasswordAnalyzer when zxcvbn is not installed, and as a cheap
+pre-filter before zxcvbn on long passwords. A single pass over the password
+collects per-character class entropy, repeated characters, alphabetic/numeric
+sequences, recent years and keyboard walks, and looks up common passwords and words
+(after undoing simple leet substitutions) in a trie built once at import.
+The cheapest way to cover the password with those patterns plus brute-force
+characters gives the guess estimate, which is scored and displayed on the
+same scale as zxcvbn (offline slow hashing, 1e4 guesses per second).
+"""
+
+import math
+import re
+
+from .generator import PASSPHRASE_WORDS
+
+GUESSES_PER_SECOND = 1e4
+MIN_WORD_LENGTH = 3
+
+# Most common first; rank drives the guess estimate for a dictionary match
+COMMON_WORDS = (
+    "password", "qwerty", "dragon", "baseball", "football", "letmein", "monkey",
+    "abc123", "mustang", "michael", "shadow", "master", "jennifer", "jordan",
+    "superman", "harley", "hunter", "trustno1", "ranger", "buster", "thomas",
+    "tigger", "robert", "soccer", "batman", "test", "pass", "killer", "hockey",
+    "george", "charlie", "andrew", "michelle", "love", "sunshine", "jessica",
+    "pepper", "daniel", "access", "joshua", "maggie", "starwars",
+    "silver", "william", "dallas", "yankees", "hello", "amanda", "orange",
+    "freedom", "computer", "thunder", "nicole", "ginger",
+    "heather", "hammer", "summer", "corvette", "taylor", "austin", "merlin",
+    "matthew", "welcome", "admin", "login", "princess", "iloveyou", "secret",
+    "whatever", "qazwsx", "passw0rd", "flower", "cheese", "internet", "google",
+    "winter", "spring", "autumn", "monday", "friday", "january", "august",
+    "october", "december", "london", "paris", "chelsea", "arsenal",
+    "liverpool", "america", "canada", "egypt", "cairo", "china", "india",
+    "family", "friend", "money", "angel", "baby", "cookie", "chocolate",
+    "coffee", "pizza", "music", "guitar", "purple", "yellow", "blue", "green",
+    "black", "white", "apple", "banana", "cherry", "lemon", "tiger",
+    "lion", "eagle", "falcon", "wolf", "bear", "horse", "kitten", "puppy",
+    "phoenix", "matrix", "ninja", "pokemon", "minecraft", "naruto", "zxcvbn",
+    "user", "root", "guest", "default", "changeme", "temp", "office", "server",
+    "database", "vault", "elsakr", "sakr",
+) + PASSPHRASE_WORDS
+
+LEET = {"@": "a", "4": "a", "8": "b", "(": "c", "3": "e", "6": "g", "1": "i",
+        "!": "i", "|": "l", "0": "o", "5": "s", "$": "s", "7": "t", "+": "t", "2": "z"}
+_LEET_TABLE = str.maketrans(LEET)
+
+KEYBOARD_ROWS = ("`1234567890-=", "qwertyuiop[]\\", "asdfghjkl;'", "zxcvbnm,./")
+SHIFTED_ROWS = ("~!@#$%^&*()_+", "QWERTYUIOP{}|", 'ASDFGHJKL:"', "ZXCVBNM<>?")
+KEYBOARD_KEYS = 47
+
+CLASS_POOLS = {"lower": 26, "upper": 26, "digit": 10, "symbol": 33}
+_CLASS_BITS = {name: math.log2(pool) for name, pool in CLASS_POOLS.items()}
+YEAR_BITS = math.log2(200)
+SCORE_THRESHOLDS = (1e3 + 5, 1e6 + 5, 1e8 + 5, 1e10 + 5)
+STRENGTH_LABELS = {0: "Very Weak", 1: "Weak", 2: "Fair", 3: "Good", 4: "Strong"}
+
+_REPEATED_BLOCK = re.compile(r"(.+?)\1+", re.DOTALL)
+_END = None  # trie terminal key (never a character)
+
+
+def _build_trie(words):
+    root = {}
+    for rank, word in enumerate(words, 1):
+        node = root
+        for ch in word.lower():
+            node = node.setdefault(ch, {})
+        node.setdefault(_END, rank)
+    return root
+
+
+def _key_positions():
+    positions = {}
+    for rows in (KEYBOARD_ROWS, SHIFTED_ROWS):
+        for r, row in enumerate(rows):
+            for c, ch in enumerate(row):
+                # rows are staggered by roughly half a key
+                positions[ch] = (r, c + r * 0.5)
+    return positions
+
+
+_TRIE = _build_trie(COMMON_WORDS)
+_MAX_WORD = max(len(w) for w in COMMON_WORDS)
+_KEY_POS = _key_positions()
+
+
+class Match:
+    __slots__ = ("start", "end", "kind", "bits", "detail")
+
+    def __init__(self, start, end, kind, bits, detail=None):
+        self.start = start
+        self.end = end
+        self.kind = kind
+        self.bits = bits
+        self.detail = detail
+
+
+def _key_step(a, b):
+    """Direction between two adjacent keys, or None if they are not adjacent."""
+    pa, pb = _KEY_POS.get(a), _KEY_POS.get(b)
+    if pa is None or pb is None or a == b:
+        return None
+    dr, dc = pb[0] - pa[0], pb[1] - pa[1]
+    if abs(dr) > 1 or abs(dc) > 1:
+        return None
+    return dr, dc
+
+
+def _char_class(ch):
+    if ch.isdigit():
+        return "digit"
+    if ch.isalpha():
+        return "upper" if ch.isupper() else "lower"
+    return "symbol"
+
+
+def _char_pool(ch):
+    return CLASS_POOLS[_char_class(ch)]
+
+
+def _sequence_bits(segment, descending):
+    first = _lower(segment[0])
+    base = 1 if first in "az019" else math.log2(10 if first.isdigit() else 26)
+    return base + math.log2(len(segment)) + (1 if descending else 0)
+
+
+def _word_bits(rank, original, normalized):
+    bits = math.log2(rank) + 1
+    letters = [c for c in original if c.isalpha()]
+    upper = sum(1 for c in letters if c.isupper())
+    if upper:
+        bits += 1 if upper == len(letters) or (upper == 1 and original[0].isupper()) else upper
+    if _lower(original) != normalized:
+        bits += 1
+    return bits
+
+
+def _lower(text):
+    """Lowercase with one output character per input, so indexes still line up.
+    
+    A few characters lowercase to two code points ('İ' -> 'i' + combining
+    dot); those keep only the first.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch.lower()[0] for ch in text)
+
+
+def normalize(text):
+    """Lowercase and undo leet substitutions (one output character per input)."""
+    return _lower(text).translate(_LEET_TABLE)
+
+
+def find_matches(password, custom_hits=()):
+    """Return (matches, brute-force bits per character, character classes seen)
+    for password in one scan.
+    
+    custom_hits are (start, end, rank, word) tuples from a CustomDictionary.
+    """
+    n = len(password)
+    normalized = normalize(password)
+    matches = [Match(start, end, "custom", _word_bits(rank, password[start:end],
+                                                      normalized[start:end]), rank)
+               for start, end, rank, _ in custom_hits]
+    char_bits = []
+    classes = set()
+
+    repeat_start = seq_start = walk_start = 0
+    seq_delta = 0
+    walk_dirs = []
+    prev = None
+
+    for i, ch in enumerate(password):
+        char_class = _char_class(ch)
+        classes.add(char_class)
+        char_bits.append(_CLASS_BITS[char_class])
+
+        # Dictionary words starting here
+        node = _TRIE
+        for j in range(i, min(n, i + _MAX_WORD)):
+            node = node.get(normalized[j])
+            if node is None:
+                break
+            rank = node.get(_END)
+            if rank and j + 1 - i >= MIN_WORD_LENGTH:
+                matches.append(Match(i, j + 1, "dictionary",
+                                     _word_bits(rank, password[i:j + 1], normalized[i:j + 1]),
+                                     rank))
+
+        # Recent years (1900-2099)
+        if (i >= 3 and normalized[i - 3:i - 1] in ("19", "20")
+                and password[i - 3:i + 1].isdigit()):
+            matches.append(Match(i - 3, i + 1, "year", YEAR_BITS))
+
+        if prev is not None:
+            # Repeated characters
+            if ch != prev:
+                if i - repeat_start >= 3:
+                    matches.append(Match(repeat_start, i, "repeat",
+                                         math.log2(_char_pool(prev)) + math.log2(i - repeat_start)))
+                repeat_start = i
+
+            # abc / 321 sequences
+            delta = ord(_lower(ch)) - ord(_lower(prev))
+            same_kind = ch.isdigit() == prev.isdigit() and ch.isalnum() and prev.isalnum()
+            if not (same_kind and delta in (1, -1) and (delta == seq_delta or i - seq_start == 1)):
+                if i - seq_start >= 3:
+                    matches.append(Match(seq_start, i, "sequence",
+                                         _sequence_bits(password[seq_start:i], seq_delta < 0)))
+                seq_start = i - 1 if same_kind and delta in (1, -1) else i
+            seq_delta = delta
+
+            # Keyboard walks (qwerty, asdf, 1qaz...)
+            step = _key_step(prev, ch)
+            if step is None:
+                _close_walk(matches, walk_start, i, walk_dirs)
+                walk_start, walk_dirs = i, []
+            else:
+                walk_dirs.append(step)
+        prev = ch
+
+    if n - repeat_start >= 3:
+        matches.append(Match(repeat_start, n, "repeat",
+                             math.log2(_char_pool(prev)) + math.log2(n - repeat_start)))
+    if n - seq_start >= 3:
+        matches.append(Match(seq_start, n, "sequence",
+                             _sequence_bits(password[seq_start:n], seq_delta < 0)))
+    _close_walk(matches, walk_start, n, walk_dirs)
+
+    return matches, char_bits, classes
+
+
+def _close_walk(matches, start, end, dirs):
+    if end - start < 3:
+        return
+    turns = sum(1 for a, b in zip(dirs, dirs[1:]) if a != b)
+    bits = math.log2(KEYBOARD_KEYS) + math.log2(end - start) + 2 * turns
+    matches.append(Match(start, end, "walk", bits))
+
+
+def _cheapest_cover(n, matches, char_bits):
+    """Minimum bits to cover password[:n]; returns (bits, matches used)."""
+    by_end = {}
+    for m in matches:
+        by_end.setdefault(m.end, []).append(m)
+    best = [0.0] * (n + 1)
+    choice = [None] * (n + 1)
+    for i in range(1, n + 1):
+        best[i] = best[i - 1] + char_bits[i - 1]
+        for m in by_end.get(i, ()):
+            bits = best[m.start] + m.bits
+            if bits < best[i]:
+                best[i], choice[i] = bits, m
+    used = []
+    i = n
+    while i > 0:
+        m = choice[i]
+        if m is None:
+            i -= 1
+        else:
+            used.append(m)
+            i = m.start
+    return best[n], used
+
+
+def _bits(password, custom_hits=()):
+    """Return (bits, matches used, character classes) for password."""
+    matches, char_bits, classes = find_matches(password, custom_hits)
+    bits, used = _cheapest_cover(len(password), matches, char_bits)
+    block = _REPEATED_BLOCK.fullmatch(password)
+    if block and len(block.group(1)) < len(password):
+        unit_bits, unit_used, _ = _bits(block.group(1))
+        repeated = unit_bits + math.log2(len(password) // len(block.group(1)))
+        if repeated < bits:
+            bits, used = repeated, unit_used + [Match(0, len(password), "repeat", repeated)]
+    return bits, used, classes
+
+
+_TIME_UNITS = (
+    ("second", 1, 60),
+    ("minute", 60, 3600),
+    ("hour", 3600, 86400),
+    ("day", 86400, 86400 * 31),
+    ("month", 86400 * 31, 86400 * 365),
+    ("year", 86400 * 365, 86400 * 365 * 100),
+)
+
+
+def display_time(seconds):
+    """Format seconds the way zxcvbn's crack_times_display does."""
+    if seconds < 1:
+        return "less than a second"
+    for unit, size, limit in _TIME_UNITS:
+        if seconds < limit:
+            base = round(seconds / size)
+            return f"{base} {unit}{'s' if base != 1 else ''}"
+    return "centuries"
+
+
+def score_for(guesses):
+    for score, threshold in enumerate(SCORE_THRESHOLDS):
+        if guesses < threshold:
+            return score
+    return 4
+
+
+def _feedback(password, score, used, classes):
+    if score >= 3:
+        return []
+    kinds = {m.kind for m in used}
+    feedback = []
+    if "custom" in kinds:
+        feedback.append("Avoid names tied to you, this account or your organization")
+    if "dictionary" in kinds:
+        feedback.append("Avoid common words and passwords")
+        if any(password[m.start].isupper() for m in used if m.kind == "dictionary"):
+            feedback.append("Capitalization doesn't help very much")
+        if any(_lower(password[m.start:m.end]) != normalize(password[m.start:m.end])
+               for m in used if m.kind == "dictionary"):
+            feedback.append("Predictable substitutions like '@' instead of 'a' don't help very much")
+    if "sequence" in kinds:
+        feedback.append("Avoid sequences like abc or 6543")
+    if "year" in kinds:
+        feedback.append("Avoid years that are associated with you")
+    if "repeat" in kinds:
+        feedback.append("Avoid repeated words and characters")
+    if "walk" in kinds:
+        feedback.append("Avoid keyboard patterns like qwerty or asdf")
+    if len(password) < 12:
+        feedback.append("Use at least 12 characters")
+    if "upper" not in classes:
+        feedback.append("Add uppercase letters")
+    if "digit" not in classes:
+        feedback.append("Add numbers")
+    if "symbol" not in classes:
+        feedback.append("Add symbols")
+    return feedback
+
+
+def estimate(password, custom_hits=()):
+    """Estimate guesses, score (0-4), crack time and feedback for password."""
+    if not password:
+        return {"guesses": 1, "guesses_log10": 0.0, "score": 0, "strength": STRENGTH_LABELS[0],
+                "crack_time_seconds": 0.0, "crack_time": "instant", "feedback": []}
+    bits, used, classes = _bits(password, custom_hits)
+    guesses = 2.0 ** min(bits, 1000)
+    score = score_for(guesses)
+    seconds = guesses / GUESSES_PER_SECOND
+    return {
+        "guesses": guesses,
+        "guesses_log10": round(bits * math.log10(2), 3),
+        "score": score,
+        "strength": STRENGTH_LABELS[score],
+        "crack_time_seconds": seconds,
+        "crack_time": display_time(seconds),
+        "feedback": _feedback(password, score, used, classes),
+    }
@@ -0,0 +1,145 @@
+"""
+Password and passphrase generation.
+
+Options compile into a GenerationPolicy (compile_policy, cached), which holds
+the finished alphabet, so repeated clicks or length changes only draw
+characters. Named profiles - a policy's options plus the sites it is for -
+are stored in the vault; profile_for_url() picks one for an entry's URL.
+"""
+
+import string
+import secrets
+import functools
+from urllib.parse import urlsplit
+
+# Simple word list for passphrases
+PASSPHRASE_WORDS = (
+    "apple", "banana", "cherry", "dragon", "eagle", "forest", "galaxy",
+    "harbor", "island", "jungle", "kingdom", "lemon", "mountain", "nebula",
+    "ocean", "phoenix", "quantum", "rainbow", "sunset", "thunder", "universe",
+    "velvet", "whisper", "xenon", "yellow", "zenith", "aurora", "breeze",
+    "crystal", "diamond", "ember", "flame", "glacier", "horizon", "ivory"
+)
+
+SYMBOLS = "!@#$%^&*()_+-=[]{}|;:,.<>?"
+AMBIGUOUS = "0O1lI"
+
+# Built-in profiles: (name, compile_policy options, domains). Added to a
+# vault once; after that they can be edited or deleted like any other.
+PROFILE_PRESETS = (
+    ("Default", {}, ()),
+    ("AWS IAM", {"length": 24, "symbol_set": "!@#$%^&*()_+-=[]{}|'", "require_each": True,
+                 "max_length": 128}, ("aws.amazon.com", "signin.aws.amazon.com")),
+    ("Legacy banking (max 12)", {"length": 12, "symbols": False, "exclude_ambiguous": True,
+                                 "require_each": True, "max_length": 12}, ()),
+    ("PIN", {"length": 6, "uppercase": False, "lowercase": False, "symbols": False,
+             "min_length": 4, "max_length": 8}, ()),
+)
+
+
+class GenerationPolicy:
+    """Compiled generator options. Immutable, so compile_policy can share instances."""
+
+    __slots__ = ("length", "uppercase", "lowercase", "digits", "symbols", "exclude_ambiguous",
+                 "exclude_chars", "symbol_set", "require_each", "min_length", "max_length",
+                 "alphabet", "classes")
+
+    def __init__(self, length, uppercase, lowercase, digits, symbols, exclude_ambiguous,
+                 exclude_chars, symbol_set, require_each, min_length, max_length):
+        excluded = set(exclude_chars)
+        if exclude_ambiguous:
+            excluded.update(AMBIGUOUS)
+        classes = []
+        for enabled, chars in ((uppercase, string.ascii_uppercase),
+                               (lowercase, string.ascii_lowercase),
+                               (digits, string.digits),
+                               (symbols, symbol_set)):
+            kept = "".join(dict.fromkeys(c for c in chars if c not in excluded)) if enabled else ""
+            if kept:
+                classes.append(kept)
+
+        values = dict(length=length, uppercase=uppercase, lowercase=lowercase, digits=digits,
+                      symbols=symbols, exclude_ambiguous=exclude_ambiguous,
+                      exclude_chars=exclude_chars, symbol_set=symbol_set,
+                      require_each=require_each, min_length=min_length, max_length=max_length,
+                      alphabet="".join(dict.fromkeys("".join(classes))),
+                      classes=tuple(frozenset(c) for c in classes))
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GenerationPolicy is immutable")
+
+    def options(self):
+        """The compile_policy arguments that produce this policy (e.g. to store a profile)."""
+        return {name: getattr(self, name) for name in self.__slots__[:-2]}
+
+    def clamp(self, length):
+        if self.min_length:
+            length = max(length, self.min_length)
+        if self.max_length:
+            length = min(length, self.max_length)
+        return length
+
+    def generate(self, length=None):
+        alphabet = self.alphabet
+        if not alphabet:
+            return ""
+        length = self.clamp(self.length if length is None else length)
+        check = self.require_each and length >= len(self.classes)
+        while True:
+            password = ''.join(secrets.choice(alphabet) for _ in range(length))
+            # Redrawing (not patching in characters) keeps every accepted password equally likely
+            if not check or not any(chars.isdisjoint(password) for chars in self.classes):
+                return password
+
+
+@functools.lru_cache(maxsize=128)
+def compile_policy(length=16, uppercase=True, lowercase=True, digits=True, symbols=True,
+                   exclude_ambiguous=False, exclude_chars="", symbol_set=SYMBOLS,
+                   require_each=False, min_length=0, max_length=0):
+    """Shared GenerationPolicy for these options (0 means no length limit)."""
+    return GenerationPolicy(length, uppercase, lowercase, digits, symbols, exclude_ambiguous,
+                            exclude_chars, symbol_set, require_each, min_length, max_length)
+
+
+def url_host(url):
+    url = (url or "").strip().lower()
+    if "//" not in url:
+        url = "//" + url
+    try:
+        return urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+
+
+def profile_for_url(profiles, url):
+    """The profile whose domain matches url most specifically, or None.
+
+    A domain matches its own host and every subdomain of it.
+    """
+    host = url_host(url)
+    best, best_length = None, 0
+    if not host:
+        return None
+    for profile in profiles:
+        for domain in profile['domains']:
+            if (host == domain or host.endswith("." + domain)) and len(domain) > best_length:
+                best, best_length = profile, len(domain)
+    return best
+
+
+class PasswordGenerator:
+    """Password generation logic."""
+    
+    @staticmethod
+    def generate(length=16, uppercase=True, lowercase=True, digits=True, 
+                 symbols=True, exclude_ambiguous=False, exclude_chars=""):
+        policy = compile_policy(uppercase=uppercase, lowercase=lowercase, digits=digits,
+                                symbols=symbols, exclude_ambiguous=exclude_ambiguous,
+                                exclude_chars=exclude_chars)
+        return policy.generate(length)
+    
+    @staticmethod
+    def generate_passphrase(words=4, separator="-"):
+        return separator.join(secrets.choice(PASSPHRASE_WORDS) for _ in range(words))
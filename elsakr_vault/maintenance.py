@@ -0,0 +1,158 @@
+"""
+Vault maintenance: secure delete, compaction, integrity check and a verify
+pass that reports rows which no longer decrypt.
+
+MaintenanceJob works on its own SQLite connection, so it can run on a
+background thread (start()) while the vault stays open for the UI; poll
+`progress`, `done` and `result`, or call run() directly from a script.
+
+Stages, in order:
+    integrity  PRAGMA integrity_check (compaction is skipped if this fails)
+    verify     decrypt every password and note, streamed in batches
+    compact    switch the file to incremental auto-vacuum (a one-time full
+               VACUUM) and then release free pages in small steps
+With secure_delete on, deleted content is overwritten with zeros.
+
+The full VACUUM holds the write lock for as long as it takes to rewrite the
+file, well past the 5 s a VaultDatabase connection waits, so only a job
+made with convert=True (the CLI's `maintenance`, run while the app is
+closed) does it. Other jobs leave such a file alone and report
+"needs_conversion".
+"""
+
+import os
+import sqlite3
+import threading
+
+from .tracing import span
+
+BATCH_SIZE = 500
+VACUUM_STEP_PAGES = 256
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class MaintenanceJob:
+    """One maintenance run over an unlocked VaultDatabase."""
+
+    def __init__(self, vault, compact=True, convert=False, busy_timeout=30):
+        self.db_path = vault.db_path
+        self.fernets = vault.fernets
+        self.compact = compact
+        self.convert = convert
+        self.busy_timeout = busy_timeout
+        self.progress = ("pending", 0, 0)   # (stage, done, total)
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Run in a daemon thread; returns immediately."""
+        self._thread = threading.Thread(target=self._run_safely, name="vault-maintenance",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run_safely(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.error = e
+            self.done.set()
+
+    def run(self):
+        """Run every stage and return the report dict."""
+        from cryptography.fernet import InvalidToken
+        report = {"size_before": os.path.getsize(self.db_path)}
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+        try:
+            conn.execute('PRAGMA secure_delete = ON')
+
+            with span("maintenance.integrity"):
+                self.progress = ("integrity", 0, 1)
+                problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+                report["integrity"] = "ok" if problems == ["ok"] else problems
+                self.progress = ("integrity", 1, 1)
+
+            with span("maintenance.verify") as trace:
+                report["undecryptable"] = self._verify(conn, InvalidToken)
+                report["checked"] = self.progress[1]
+                trace["count"] = report["checked"]
+                trace["failed"] = len(report["undecryptable"])
+
+            report["cancelled"] = self._cancel.is_set()
+            if self.compact and report["integrity"] == "ok" and not report["cancelled"]:
+                with span("maintenance.compact") as trace:
+                    if self._incremental(conn) or self.convert:
+                        report["freed_pages"] = self._compact(conn)
+                        trace["pages"] = report["freed_pages"]
+                    else:
+                        report["needs_conversion"] = True
+        finally:
+            conn.close()
+
+        report["size_after"] = os.path.getsize(self.db_path)
+        self.result = report
+        self.progress = ("done",) + self.progress[1:]
+        self.done.set()
+        return report
+
+    def _verify(self, conn, invalid_token):
+        total = conn.execute('SELECT COUNT(*) FROM passwords').fetchone()[0]
+        failures = []
+        checked = 0
+        self.progress = ("verify", 0, total)
+        cursor = conn.execute('''SELECT id, title, password_encrypted, notes, key_version
+                                 FROM passwords ORDER BY id''')
+        while not self._cancel.is_set():
+            if not self.fernets:
+                # The vault was locked under us; the rest can't be checked
+                self._cancel.set()
+                break
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            for id, title, password, notes, key_version in rows:
+                for field, token in (("password", password), ("notes", notes)):
+                    if not token:
+                        continue
+                    try:
+                        self.fernets[key_version].decrypt(token.encode())
+                    except (invalid_token, ValueError, AttributeError, KeyError):
+                        failures.append({"id": id, "title": title, "field": field})
+            checked += len(rows)
+            self.progress = ("verify", checked, total)
+        cursor.close()
+        return failures
+
+    @staticmethod
+    def _incremental(conn):
+        return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+
+    def _compact(self, conn):
+        """Return the number of free pages given back to the file system."""
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not self._incremental(conn):
+            # Only a full VACUUM can change the auto-vacuum mode of an existing file
+            self.progress = ("compact", 0, 1)
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            self.progress = ("compact", 1, 1)
+            return free
+
+        released = 0
+        self.progress = ("compact", 0, free)
+        while released < free and not self._cancel.is_set():
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            # Short steps keep the write lock brief so the UI can save in between
+            conn.execute(f'PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})').fetchall()
+            after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if after >= before:
+                break
+            released += before - after
+            self.progress = ("compact", released, free)
+        return released
@@ -0,0 +1,280 @@
+"""
+In-memory fuzzy index over entry titles, usernames and sites for quick-open.
+
+Only plaintext metadata is indexed; passwords stay encrypted until an
+entry is picked. Each entry's fields are lowercased and kept as one
+tab-separated line, and the entry gets a slot (a bit position). For every
+feature of a line there is one Python int with the bits of the entries that
+have it, so combining features is a single & or | over the whole index:
+
+    'e', 'ee', ...   the line holds that character at least that often
+    'ex' + TAB       the pair occurs inside one field
+    TAB + 'e'        a word in some field starts with the character
+    TAB TAB + 'e'    the title starts with it
+
+A query keeps only the entries holding each of its characters as often as
+it does. Those are then ordered by how many of the query's pairs and word
+starts they share (pairs counting double), which is what fuzzy_score
+rewards, and the first MAX_SCAN of them, newest and then shortest first
+within equal overlap, are checked as a subsequence; at most MAX_SCORED
+matches go on to fuzzy_score. So the work is bounded by relevance,
+whatever the size or age of the vault.
+Candidates are ranked by fuzzy_score: contiguous beats scattered, the start
+of a field or word beats the middle of one, title beats username beats site.
+
+add() and remove() keep the index current without a rebuild. A removed
+entry's slot stays empty until there are more empty slots than entries and
+the index is renumbered.
+"""
+
+import re
+import heapq
+import itertools
+from array import array
+from collections import Counter, defaultdict
+
+from .generator import url_host
+from .tracing import span
+
+RESULT_LIMIT = 20
+MAX_SCORED = 300
+MAX_SCAN = 3000
+# Characters count once per occurrence up to this many ('z', 'zz', ...)
+MAX_REPEAT = 4
+# Pairs and word starts counted when ordering candidates (longer queries
+# already narrow them down through their characters)
+MAX_FEATURES = 12
+WORD_SEPARATORS = frozenset(" ._-@/:+")
+FIELD_WEIGHTS = (3, 2, 1)    # title, username, site
+# Joins an entry's fields; queries have no whitespace, so no match spans two.
+# It also marks feature keys, which never clash with text from a field.
+FIELD_SEPARATOR = "\t"
+PAIR = "{}" + FIELD_SEPARATOR
+WORD_START = FIELD_SEPARATOR + "{}"
+TITLE_START = FIELD_SEPARATOR * 2 + "{}"
+
+
+def char_keys(text):
+    """'z', 'zz', 'zzz' for a text with three z's (tabs excluded)."""
+    return {ch * k for ch, n in Counter(text.replace(FIELD_SEPARATOR, "")).items()
+            for k in range(1, min(n, MAX_REPEAT) + 1)}
+
+
+def line_keys(line):
+    """Every feature key of an indexed line."""
+    keys = char_keys(line)
+    fields = line.split(FIELD_SEPARATOR)
+    for field in fields:
+        keys.update(PAIR.format(field[i:i + 2]) for i in range(len(field) - 1))
+        keys.update(WORD_START.format(field[i]) for i in range(len(field))
+                    if i == 0 or field[i - 1] in WORD_SEPARATORS)
+    if fields[0]:
+        keys.add(TITLE_START.format(fields[0][0]))
+    return keys
+
+
+def query_features(query):
+    """(key, weight) pairs whose overlap with a line orders the candidates.
+
+    A pair in order counts double: a line holding all of them most likely
+    holds the query as a substring, which fuzzy_score rates highest.
+    """
+    pairs = dict.fromkeys(PAIR.format(query[i:i + 2]) for i in range(len(query) - 1))
+    starts = dict.fromkeys(WORD_START.format(ch) for ch in query)
+    features = [(TITLE_START.format(query[0]), 1)]
+    features += [(key, 2) for key in pairs]
+    features += [(key, 1) for key in starts]
+    return features[:MAX_FEATURES]
+
+
+def subsequence_pattern(query):
+    """Regex finding query as a subsequence of one field of a line.
+
+    [^c]*c can't backtrack, so it runs in linear time.
+    """
+    stops = re.escape(FIELD_SEPARATOR)
+    parts = [re.escape(query[0])]
+    for ch in query[1:]:
+        ch = re.escape(ch)
+        parts.append(f"[^{ch}{stops}]*{ch}")
+    return re.compile("".join(parts))
+
+
+def fuzzy_score(query, text):
+    """Higher is better; None when query is not a subsequence of text."""
+    position = text.find(query)
+    if position >= 0:
+        score = 100 + 8 * len(query)
+        if position == 0:
+            score += 40
+        elif text[position - 1] in WORD_SEPARATORS:
+            score += 25
+        return score - min(position, 20) - len(text) // 8
+
+    score = 0
+    previous = -2
+    index = -1
+    for ch in query:
+        index = text.find(ch, index + 1)
+        if index < 0:
+            return None
+        if index == previous + 1:
+            score += 6
+        elif index == 0 or text[index - 1] in WORD_SEPARATORS:
+            score += 4
+        else:
+            score -= min(index - previous, 6)
+        previous = index
+    return score - len(text) // 8
+
+
+def _line(title, username, url):
+    fields = ((title or "").lower(), (username or "").lower(), url_host(url))
+    return FIELD_SEPARATOR.join(field.replace(FIELD_SEPARATOR, " ") for field in fields)
+
+
+class QuickOpenIndex:
+    """Bitset index of entry metadata, kept up to date in place."""
+
+    def __init__(self):
+        self.entries = {}       # id -> (title, username, url) as given, for display
+        self._lines = {}        # id -> lowercased "title\tusername\tsite"
+        self._slots = {}        # id -> bit position
+        self._ids = array('q')  # bit position -> id, -1 once removed
+        self._bits = {}         # feature key -> int with a bit set per entry that has it
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (id, title, username, url) rows."""
+        index = cls()
+        with span("quickopen.build") as trace:
+            for id, title, username, url in rows:
+                index.entries[id] = (title, username or "", url or "")
+                index._lines[id] = _line(title, username, url)
+            index._renumber()
+            trace["count"] = len(index.entries)
+        return index
+
+    @classmethod
+    def from_vault(cls, vault):
+        """Build from an open vault; reads metadata only, decrypts nothing."""
+        return cls.from_rows(vault.list_search_fields())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _renumber(self):
+        """Give every entry a fresh slot and build the feature bits in one go.
+
+        Slots are handed out longest line first, so that among equally good
+        candidates the shortest (which fuzzy_score prefers) come first;
+        entries added later go ahead of all of them.
+        """
+        slots = defaultdict(list)
+        self._slots = {}
+        lines = self._lines
+        self._ids = array('q', sorted(lines, key=lambda id: len(lines[id]), reverse=True))
+        for slot, id in enumerate(self._ids):
+            self._slots[id] = slot
+            for key in line_keys(self._lines[id]):
+                slots[key].append(slot)
+        size = (len(self._ids) + 7) // 8
+        self._bits = {}
+        for key, positions in slots.items():
+            buffer = bytearray(size)
+            for slot in positions:
+                buffer[slot >> 3] |= 1 << (slot & 7)
+            self._bits[key] = int.from_bytes(buffer, "little")
+
+    def add(self, id, title, username="", url=""):
+        """Index an entry, replacing what was indexed under its id before."""
+        if id in self.entries:
+            self.remove(id)
+        self.entries[id] = (title, username or "", url or "")
+        line = self._lines[id] = _line(title, username, url)
+        slot = self._slots[id] = len(self._ids)
+        self._ids.append(id)
+        bit = 1 << slot
+        for key in line_keys(line):
+            self._bits[key] = self._bits.get(key, 0) | bit
+
+    def remove(self, id):
+        line = self._lines.pop(id, None)
+        if line is None:
+            return
+        del self.entries[id]
+        slot = self._slots.pop(id)
+        self._ids[slot] = -1
+        mask = ~(1 << slot)
+        for key in line_keys(line):
+            self._bits[key] &= mask
+        if len(self._ids) > 2 * len(self._lines) + 64:
+            self._renumber()
+
+    def _candidates(self, query):
+        """Slots holding every query character, most feature overlap first,
+        then in slot order from the highest."""
+        bits = self._bits
+        required = -1
+        for key, n in Counter(query).items():
+            required &= bits.get(key * min(n, MAX_REPEAT), 0)
+            if not required:
+                return
+        # at_least[j]: entries whose shared features weigh at least j
+        features = query_features(query)
+        total = sum(weight for _, weight in features)
+        at_least = [required] + [0] * (total + 1)
+        reached = 0
+        for key, weight in features:
+            have = bits.get(key, 0) & required
+            reached += weight
+            if have:
+                for j in range(reached, weight - 1, -1):
+                    at_least[j] |= at_least[j - weight] & have
+        taken = 0
+        for j in range(total, -1, -1):
+            for slot in _slots_highest_first(at_least[j] & ~at_least[j + 1]):
+                yield slot
+                taken += 1
+                if taken >= MAX_SCAN:
+                    return
+
+    def _score(self, query, id):
+        best = None
+        for weight, text in zip(FIELD_WEIGHTS, self._lines[id].split(FIELD_SEPARATOR)):
+            score = fuzzy_score(query, text)
+            if score is not None:
+                score = score * weight if score > 0 else score
+                if best is None or score > best:
+                    best = score
+        return best
+
+    def search(self, query, limit=RESULT_LIMIT):
+        """[(score, id)] best first for query (spaces are ignored)."""
+        query = "".join(query.lower().split())
+        if not query:
+            return []
+        with span("quickopen.search") as trace:
+            ids, lines = self._ids, self._lines
+            search = subsequence_pattern(query).search
+            hits = (id for id in map(ids.__getitem__, self._candidates(query))
+                    if search(lines[id]))
+            scored = []
+            for id in itertools.islice(hits, MAX_SCORED):
+                scored.append((self._score(query, id), id))
+            results = heapq.nlargest(limit, scored)
+            trace["candidates"] = len(scored)
+            trace["count"] = len(results)
+        return results
+
+
+def _slots_highest_first(bits):
+    """Set bit positions of bits, highest first."""
+    if bits <= 0:
+        return
+    digits = bin(bits)
+    top = len(digits) - 3
+    position = digits.find("1", 2)
+    while position >= 0:
+        yield top - (position - 2)
+        position = digits.find("1", position + 1)
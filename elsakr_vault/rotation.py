@@ -0,0 +1,184 @@
+"""
+Key rotation: re-encrypt every row and attachment under the vault's new key.
+
+VaultDatabase.begin_key_rotation() switches new writes to the new key at
+once and keeps the previous key, wrapped under the new one, in vault_meta.
+Every row carries the key_version it was encrypted with, so the vault stays
+fully readable while KeyRotationJob works through the old rows.
+
+Rows are streamed from SQLite in id order, re-encrypted in batches on a
+thread pool and written back with one UPDATE per row, committed per batch.
+An UPDATE only applies while the row still has the old key_version, so an
+edit or sync merge that raced the job is never overwritten. Nothing else
+needs saving for a resume: after a crash the next unlock loads the wrapped
+previous key again, and the job just picks up the rows still on it.
+
+Like MaintenanceJob it uses its own SQLite connection, so it can run on a
+background thread (start()) while the UI keeps using the vault. The worker
+never touches the vault's key material: once `done` is set, the thread that
+owns the vault calls finish() to drop the previous key. Rows that no loaded
+key decrypts (damaged, or written under a key that is gone) are reported
+and left as they are, so they can't keep a rotation pending forever.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .attachments import AttachmentStore, AttachmentError
+from .tracing import span
+
+BATCH_SIZE = 256
+MAX_WORKERS = 4
+
+
+class KeyRotationJob:
+    """Finishes a key rotation started with VaultDatabase.begin_key_rotation()."""
+
+    def __init__(self, vault, workers=None, batch_size=BATCH_SIZE, busy_timeout=30):
+        self.vault = vault
+        self.workers = workers or min(MAX_WORKERS, os.cpu_count() or 1)
+        self.batch_size = batch_size
+        self.busy_timeout = busy_timeout
+        self.progress = ("pending", 0, 0)   # (stage, done, total)
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Run in a daemon thread; returns immediately."""
+        self._thread = threading.Thread(target=self._run_safely, name="vault-key-rotation",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stop after the batches already in flight; run again later to resume."""
+        self._cancel.set()
+
+    def _run_safely(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.error = e
+            self.done.set()
+
+    def run(self):
+        """Re-encrypt everything still on an older key and return the report dict."""
+        target = self.vault.key_version
+        report = {"key_version": target, "workers": self.workers}
+        conn = sqlite3.connect(self.vault.db_path, timeout=self.busy_timeout)
+        try:
+            conn.execute('PRAGMA secure_delete = ON')
+
+            with span("rotation.passwords") as trace:
+                report["passwords"], report["unreadable"] = self._rotate_passwords(conn, target)
+                trace["count"] = report["passwords"]
+                trace["failed"] = len(report["unreadable"])
+
+            with span("rotation.attachments") as trace:
+                rotated, failed = self._rotate_attachments(conn, target)
+                report["attachments"], report["unreadable_attachments"] = rotated, failed
+                trace["count"] = report["attachments"]
+                trace["failed"] = len(report["unreadable_attachments"])
+
+            report["cancelled"] = self._cancel.is_set()
+            report["finished"] = False
+        finally:
+            conn.close()
+
+        self.result = report
+        self.progress = ("done",) + self.progress[1:]
+        self.done.set()
+        return report
+
+    def finish(self):
+        """Drop the previous key if the run left nothing readable on it. Returns True when done.
+
+        Rows and attachments the run could not decrypt stay in the report
+        ("unreadable", "unreadable_attachments") but don't keep the old key
+        alive. Call this on the thread that owns the vault, not the worker:
+        it wipes key material the UI may be decrypting with.
+        """
+        if self.result is None or self.result["cancelled"]:
+            return False
+        self.result["finished"] = self.vault.finish_key_rotation(
+            unreadable=self.result["unreadable"],
+            unreadable_attachments=self.result["unreadable_attachments"])
+        return self.result["finished"]
+
+    def _rotate_passwords(self, conn, target):
+        """Returns (rows rewritten, ids of rows no loaded key can decrypt)."""
+        total = conn.execute('SELECT COUNT(*) FROM passwords WHERE key_version < ?',
+                             (target,)).fetchone()[0]
+        rewritten = 0
+        unreadable = []
+        self.progress = ("passwords", 0, total)
+        after = 0
+        exhausted = False
+        in_flight = deque()
+        # A couple of batches per worker keeps the pool busy while the
+        # writer commits, without reading the whole table ahead
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="vault-reencrypt") as pool:
+            while True:
+                while not exhausted and len(in_flight) < self.workers * 2 and not self._cancel.is_set():
+                    rows = conn.execute('''
+                        SELECT id, key_version, password_encrypted, notes FROM passwords
+                        WHERE key_version < ? AND id > ? ORDER BY id LIMIT ?
+                    ''', (target, after, self.batch_size)).fetchall()
+                    if not rows:
+                        exhausted = True
+                        break
+                    after = rows[-1][0]
+                    in_flight.append(pool.submit(self._reencrypt_batch, rows, target))
+                if not in_flight:
+                    break
+                updates, failed = in_flight.popleft().result()
+                with conn:
+                    cursor = conn.executemany('''
+                        UPDATE passwords SET password_encrypted = ?, notes = ?, key_version = ?
+                        WHERE id = ? AND key_version = ?
+                    ''', updates)
+                # Rows an edit or merge moved on in the meantime are skipped by the guard
+                rewritten += max(cursor.rowcount, 0)
+                unreadable.extend(failed)
+                self.progress = ("passwords", rewritten + len(unreadable), total)
+        return rewritten, unreadable
+
+    def _reencrypt_batch(self, rows, target):
+        from cryptography.fernet import InvalidToken
+        updates = []
+        failed = []
+        for id, key_version, password_encrypted, notes in rows:
+            try:
+                password_encrypted, notes = self.vault.reencrypt_fields(
+                    key_version, password_encrypted, notes)
+            except (InvalidToken, ValueError, AttributeError):
+                failed.append(id)
+                continue
+            updates.append((password_encrypted, notes, target, id, key_version))
+        return updates, failed
+
+    def _rotate_attachments(self, conn, target):
+        """Returns (attachments rewritten, ids of those that failed to decrypt)."""
+        ids = [row[0] for row in conn.execute(
+            'SELECT id FROM attachments WHERE key_version < ? ORDER BY id', (target,))]
+        store = AttachmentStore(self.vault, conn)
+        rotated = 0
+        unreadable = []
+        self.progress = ("attachments", 0, len(ids))
+        for attachment_id in ids:
+            if self._cancel.is_set():
+                break
+            # Each attachment is rewritten in its own transaction, so a bad
+            # one is left as it was and the rest still get rotated
+            try:
+                rotated += store.reencrypt(attachment_id)
+            except AttachmentError:
+                unreadable.append(attachment_id)
+            self.progress = ("attachments", rotated + len(unreadable), len(ids))
+        return rotated, unreadable
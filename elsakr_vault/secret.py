@@ -0,0 +1,75 @@
+"""
+Plaintext secrets with a bounded lifetime.
+
+A Secret keeps its value in a bytearray that wipe() overwrites with zeros,
+and never shows the value in repr() or str(), so it can't leak into logs
+or tracebacks. VaultDatabase hands decrypted passwords and notes out as
+Secrets and wipes every one still alive when it locks; dialogs wipe theirs
+when they close.
+
+reveal() has to return a str for Tk, the clipboard and JSON, and Python
+strings can't be wiped - so reveal at the point of use and drop the result.
+The bytes Fernet decrypts into are copied straight into the buffer and
+released at once; they can't be zeroed either.
+"""
+
+
+class Secret:
+    """A wipeable plaintext value."""
+
+    __slots__ = ("_buffer", "__weakref__")
+
+    def __init__(self, value=b""):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self._buffer = bytearray(value)
+
+    def reveal(self):
+        """The value as a str (ValueError once wiped)."""
+        if self._buffer is None:
+            raise ValueError("secret has been wiped")
+        return self._buffer.decode("utf-8")
+
+    def wipe(self):
+        """Zero the buffer in place and release it."""
+        buffer = self._buffer
+        if buffer is not None:
+            buffer[:] = bytes(len(buffer))
+            self._buffer = None
+
+    @property
+    def wiped(self):
+        return self._buffer is None
+
+    def __len__(self):
+        return len(self._buffer) if self._buffer is not None else 0
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __repr__(self):
+        return "Secret(<wiped>)" if self._buffer is None else "Secret(***)"
+
+    __str__ = __repr__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.wipe()
+
+
+def wipe_entry(entry):
+    """Wipe the Secrets in an entry dict (password, notes)."""
+    if entry:
+        for value in entry.values():
+            if isinstance(value, Secret):
+                value.wipe()
+
+
+def revealed(entry):
+    """Copy of an entry dict with its Secrets as plain strings, e.g. for JSON output."""
+    if entry is None:
+        return None
+    return {key: value.reveal() if isinstance(value, Secret) else value
+            for key, value in entry.items()}
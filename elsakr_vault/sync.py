@@ -0,0 +1,255 @@
+"""
+File-based sync between copies of a vault on different machines.
+
+Every write stamps the entry's changed fields with [clock, replica] and the
+entry with the vault's next local change sequence number (seq); deletes
+leave a tombstone stamped the same way. A change log holds the entries
+and tombstones written after a given seq, so only changed rows travel:
+
+    log = VaultSync(laptop).export_changes(since=desktop_sync.vector()[laptop_replica])
+    VaultSync(desktop).apply_changes(log)
+
+Merging is last-writer-wins per field, with ties broken by replica id. A
+delete beats every field stamp older than it, and an edit newer than a
+delete brings the entry back. The version vector records, per replica,
+the highest seq already merged, so the next export can start where the
+last one stopped. sync_vaults() does both directions for two open vaults.
+A log exported for a known peer leaves out rows and tombstones that are
+exactly as that peer sent them, or that came from it alone, so merged
+changes are not echoed back to it.
+
+The log is JSON whose body is compressed and Fernet-encrypted with the
+vault key, so both vaults must share the master password. Attachments,
+categories and custom dictionary words are not synced.
+"""
+
+import json
+import zlib
+import secrets
+
+from .database import SYNC_FIELDS
+from .tracing import span
+
+LOG_FORMAT = 1
+ENTRY_COLUMNS = SYNC_FIELDS + ('created_at', 'updated_at')
+
+
+class SyncError(Exception):
+    pass
+
+
+class VaultSync:
+    """Exports and merges change logs for an unlocked VaultDatabase."""
+
+    def __init__(self, vault):
+        self.vault = vault
+
+    @property
+    def replica_id(self):
+        return self.vault.replica_id
+
+    def current_seq(self):
+        cursor = self.vault.conn.cursor()
+        cursor.execute("SELECT value FROM sync_meta WHERE key = 'seq'")
+        return cursor.fetchone()[0]
+
+    def vector(self):
+        """{replica id: highest seq of that replica merged here}, including this one."""
+        cursor = self.vault.conn.cursor()
+        cursor.execute('SELECT replica, seq FROM sync_vector')
+        vector = dict(cursor.fetchall())
+        vector[self.replica_id] = self.current_seq()
+        return vector
+
+    def export_changes(self, since=0, peer=None):
+        """Change log of everything written after local seq `since`.
+
+        With `peer` (its replica id) the log is only for that vault: rows
+        and tombstones last merged unchanged from the peer's log
+        (merged_from), rows whose every field stamp is the peer's, and the
+        peer's own tombstones are left out, since the peer has them or
+        something newer.
+        """
+        with span("sync.export") as trace:
+            cursor = self.vault.conn.cursor()
+            to_seq = self.current_seq()
+            columns = ", ".join(ENTRY_COLUMNS)
+            cursor.execute(f'''
+                SELECT uuid, stamps, key_version, merged_from, {columns} FROM passwords
+                WHERE seq > ? AND seq <= ? ORDER BY seq
+            ''', (since, to_seq))
+            entries = []
+            for row in cursor.fetchall():
+                entry = dict(zip(('uuid', 'stamps', 'key_version', 'merged_from') + ENTRY_COLUMNS, row))
+                entry['stamps'] = json.loads(entry['stamps'])
+                merged_from = entry.pop('merged_from')
+                if peer and (merged_from == peer or
+                             all(replica == peer for _, replica in entry['stamps'].values())):
+                    continue
+                # Logs always carry the current key, even mid-rotation
+                entry['password_encrypted'], entry['notes'] = self.vault.reencrypt_fields(
+                    entry.pop('key_version'), entry['password_encrypted'], entry['notes'])
+                entries.append(entry)
+            cursor.execute('''
+                SELECT uuid, stamp, replica, merged_from FROM tombstones
+                WHERE seq > ? AND seq <= ? ORDER BY seq
+            ''', (since, to_seq))
+            tombstones = [{'uuid': u, 'stamp': [stamp, replica]}
+                          for u, stamp, replica, merged_from in cursor.fetchall()
+                          if not peer or peer not in (replica, merged_from)]
+            trace["entries"] = len(entries)
+            trace["tombstones"] = len(tombstones)
+
+        body = json.dumps({'entries': entries, 'tombstones': tombstones})
+        return {
+            'format': LOG_FORMAT,
+            'replica': self.replica_id,
+            'peer': peer,
+            'from_seq': since,
+            'to_seq': to_seq,
+            'vector': self.vector(),
+            'payload': self.vault.fernet.encrypt(zlib.compress(body.encode())).decode(),
+        }
+
+    def apply_changes(self, log):
+        """Merge a change log. Returns counts of applied, unchanged and deleted rows."""
+        from cryptography.fernet import InvalidToken
+        if log.get('format') != LOG_FORMAT:
+            raise SyncError(f"unsupported change log format: {log.get('format')}")
+        sender = log['replica']
+        if sender == self.replica_id:
+            raise SyncError("change log comes from this same vault (or a file copy of it); "
+                            "give the copy its own replica id first (new_replica_id, or the CLI's "
+                            "`sync new-replica-id`)")
+        if log.get('peer') not in (None, self.replica_id):
+            # It skips rows that vault already had, so they would never arrive here
+            raise SyncError(f"change log was exported for replica {log['peer']}, not this vault")
+        known = self.vector().get(sender, 0)
+        if log['from_seq'] > known:
+            raise SyncError(f"change log starts after seq {log['from_seq']} but only "
+                            f"{known} was merged from {sender}; export again with since={known}")
+        try:
+            body = json.loads(zlib.decompress(self.vault.fernet.decrypt(log['payload'].encode())))
+        except InvalidToken:
+            raise SyncError("change log was written by a vault with a different master password")
+
+        stats = {'applied': 0, 'unchanged': 0, 'deleted': 0}
+        newest = 0
+        with span("sync.apply") as trace, self.vault.conn:
+            cursor = self.vault.conn.cursor()
+            # One block of seq numbers for the whole log; unused ones just leave gaps
+            first, _ = self.vault.next_change(cursor, len(body['entries']) + len(body['tombstones']))
+            seqs = iter(range(first, first + len(body['entries']) + len(body['tombstones'])))
+            for entry in body['entries']:
+                stats[self._merge_entry(cursor, entry, seqs, sender)] += 1
+                newest = max([newest] + [stamp for stamp, _ in entry['stamps'].values()])
+            for tombstone in body['tombstones']:
+                stats[self._merge_tombstone(cursor, tombstone, seqs, sender)] += 1
+                newest = max(newest, tombstone['stamp'][0])
+
+            # Keep our clock ahead of everything we've seen so later local
+            # edits win over the ones just merged
+            cursor.execute("UPDATE sync_meta SET value = MAX(value, ?) WHERE key = 'clock'", (newest,))
+            # Everything the sender had merged up to to_seq is now here too
+            for replica, seq in log['vector'].items():
+                if replica != self.replica_id:
+                    cursor.execute('''
+                        INSERT INTO sync_vector (replica, seq) VALUES (?, ?)
+                        ON CONFLICT (replica) DO UPDATE SET seq = MAX(seq, excluded.seq)
+                    ''', (replica, seq))
+            trace.update(stats)
+        return stats
+
+    def new_replica_id(self):
+        """Give a file copy of a vault its own identity before its first sync."""
+        with self.vault.conn:
+            self.vault.conn.execute("UPDATE sync_meta SET value = ? WHERE key = 'replica'",
+                                    (secrets.token_hex(8),))
+            self.vault.conn.execute('DELETE FROM sync_vector')
+        self.vault.replica_id = self.vault.conn.execute(
+            "SELECT value FROM sync_meta WHERE key = 'replica'").fetchone()[0]
+        return self.vault.replica_id
+
+    def _merge_entry(self, cursor, entry, seqs, sender):
+        incoming = {field: tuple(stamp) for field, stamp in entry['stamps'].items()}
+        cursor.execute('''
+            SELECT id, stamps, updated_at, key_version, password_encrypted, notes
+            FROM passwords WHERE uuid = ?
+        ''', (entry['uuid'],))
+        row = cursor.fetchone()
+
+        if row is None:
+            cursor.execute('SELECT stamp, replica FROM tombstones WHERE uuid = ?', (entry['uuid'],))
+            tombstone = cursor.fetchone()
+            if tombstone and max(incoming.values()) <= tuple(tombstone):
+                return 'unchanged'
+            cursor.execute('DELETE FROM tombstones WHERE uuid = ?', (entry['uuid'],))
+            seq = next(seqs)
+            columns = ENTRY_COLUMNS + ('uuid', 'stamps', 'seq', 'key_version', 'merged_from')
+            cursor.execute(f'''
+                INSERT INTO passwords ({", ".join(columns)})
+                VALUES ({", ".join("?" * len(columns))})
+            ''', tuple(entry[c] for c in ENTRY_COLUMNS) +
+                (entry['uuid'], json.dumps(entry['stamps']), seq, self.vault.key_version, sender))
+            return 'applied'
+
+        id, local_json, updated_at, key_version, password_encrypted, notes = row
+        local = {field: tuple(stamp) for field, stamp in json.loads(local_json).items()}
+        newer = [f for f in SYNC_FIELDS if incoming.get(f, (0, '')) > local.get(f, (0, ''))]
+        if not newer:
+            return 'unchanged'
+        for field in newer:
+            local[field] = incoming[field]
+        # Only a row that now matches the sender's exactly has nothing to send back
+        merged_from = sender if local == incoming else None
+        seq = next(seqs)
+        # Incoming tokens use the current key; bring the row's own ones along
+        password_encrypted, notes = self.vault.reencrypt_fields(key_version, password_encrypted, notes)
+        values = {'password_encrypted': password_encrypted, 'notes': notes}
+        values.update((f, entry[f]) for f in newer)
+        assignments = ", ".join(f"{field} = ?" for field in values)
+        cursor.execute(f'UPDATE passwords SET {assignments}, stamps = ?, seq = ?, key_version = ?, '
+                       f'updated_at = ?, merged_from = ? WHERE id = ?',
+                       tuple(values.values()) +
+                       (json.dumps({f: list(s) for f, s in local.items()}), seq, self.vault.key_version,
+                        max(updated_at or '', entry['updated_at'] or ''), merged_from, id))
+        return 'applied'
+
+    def _merge_tombstone(self, cursor, tombstone, seqs, sender):
+        stamp = tuple(tombstone['stamp'])
+        cursor.execute('SELECT id, stamps FROM passwords WHERE uuid = ?', (tombstone['uuid'],))
+        row = cursor.fetchone()
+        if row is not None:
+            newest_edit = max(tuple(s) for s in json.loads(row[1]).values())
+            if stamp < newest_edit:
+                return 'unchanged'      # edited after it was deleted elsewhere: keep it
+            self.vault.delete_entry_rows(cursor, row[0])
+        else:
+            cursor.execute('SELECT stamp, replica FROM tombstones WHERE uuid = ?', (tombstone['uuid'],))
+            existing = cursor.fetchone()
+            if existing and tuple(existing) >= stamp:
+                return 'unchanged'
+        seq = next(seqs)
+        cursor.execute('INSERT OR REPLACE INTO tombstones (uuid, stamp, replica, seq, merged_from) '
+                       'VALUES (?, ?, ?, ?, ?)', (tombstone['uuid'], stamp[0], stamp[1], seq, sender))
+        return 'deleted' if row is not None else 'unchanged'
+
+
+def write_log(log, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(log, f)
+
+
+def read_log(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sync_vaults(a, b):
+    """Two-way sync of two unlocked vaults, e.g. two local files. Returns both merge stats."""
+    sync_a, sync_b = VaultSync(a), VaultSync(b)
+    to_b = sync_b.apply_changes(sync_a.export_changes(since=sync_b.vector().get(a.replica_id, 0),
+                                                      peer=b.replica_id))
+    to_a = sync_a.apply_changes(sync_b.export_changes(since=sync_a.vector().get(b.replica_id, 0),
+                                                      peer=a.replica_id))
+    return {'a_to_b': to_b, 'b_to_a': to_a}
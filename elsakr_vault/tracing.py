@@ -0,0 +1,100 @@
+"""
+Lightweight timing spans kept in an in-memory ring buffer.
+
+    with span("vault.refresh") as record:
+        ...
+        record["count"] = len(rows)
+
+    @traced("vault.initialize")
+    def initialize(...): ...
+
+Only the span name, start time, duration and numeric attributes (counts,
+sizes) are stored; anything else is dropped so secrets can never end up in
+a trace. Set ELSAKR_TRACE_FILE to also append every span as a JSON line.
+"""
+
+import os
+import json
+import time
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Records finished spans into a bounded deque."""
+
+    def __init__(self, capacity=1000, path=None):
+        self.spans = deque(maxlen=capacity)
+        self.path = path
+        self.enabled = True
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        record = dict(attrs)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            if self.enabled:
+                self.record(name, (time.perf_counter() - start) * 1000, record)
+
+    def record(self, name, duration_ms, attrs=None):
+        entry = {"name": name, "time": time.time(), "ms": round(duration_ms, 3)}
+        for key, value in (attrs or {}).items():
+            if isinstance(value, (int, float)):
+                entry[key] = value
+        self.spans.append(entry)
+        if self.path:
+            self._write(self.path, [entry])
+
+    def recent(self, limit=None):
+        spans = list(self.spans)
+        return spans[-limit:] if limit else spans
+
+    def summary(self):
+        """Per-span-name calls, total, mean and max duration in milliseconds."""
+        stats = {}
+        for entry in list(self.spans):
+            s = stats.setdefault(entry["name"], {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["calls"] += 1
+            s["total_ms"] += entry["ms"]
+            s["max_ms"] = max(s["max_ms"], entry["ms"])
+        for s in stats.values():
+            s["mean_ms"] = round(s["total_ms"] / s["calls"], 3)
+            s["total_ms"] = round(s["total_ms"], 3)
+        return stats
+
+    def dump(self, path):
+        """Write the buffered spans to path as JSON lines. Returns the count."""
+        spans = list(self.spans)
+        self._write(path, spans, mode="w")
+        return len(spans)
+
+    def clear(self):
+        self.spans.clear()
+
+    def _write(self, path, entries, mode="a"):
+        with self._lock, open(path, mode, encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+
+tracer = Tracer(path=os.environ.get("ELSAKR_TRACE_FILE") or None)
+
+
+def span(name, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
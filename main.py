@@ -4,40 +4,38 @@ Complete password management: generate, analyze, store, and organize passwords.
 Modern Dark Theme with Premium UI - Security First
 """
 
+import time
+STARTUP_TIME = time.perf_counter()
+
 import os
 import sys
 import json
-import string
+import hmac
 import secrets
 import hashlib
-import sqlite3
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from datetime import datetime
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import threading
-import base64
 
-try:
-    from cryptography.fernet import Fernet
-    from cryptography.hazmat.primitives import hashes
-    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-    CRYPTO_AVAILABLE = True
-except ImportError:
-    CRYPTO_AVAILABLE = False
+from elsakr_vault import (PasswordGenerator, PasswordAnalyzer, VaultDatabase,
+                          CRYPTO_AVAILABLE, tracer, span)
+from elsakr_vault.dictionary import entry_words
+from elsakr_vault.generator import compile_policy, profile_for_url
+from elsakr_vault.attachments import AttachmentStore, AttachmentJob
+from elsakr_vault.clipboard import ClipboardService
+from elsakr_vault.maintenance import MaintenanceJob
+from elsakr_vault.rotation import KeyRotationJob
+from elsakr_vault.quickopen import QuickOpenIndex
+from elsakr_vault.secret import wipe_entry
 
-try:
-    import pyperclip
-    CLIPBOARD_AVAILABLE = True
-except ImportError:
-    CLIPBOARD_AVAILABLE = False
+# Set ELSAKR_TIMING=1 to print startup timings to stderr
+TIMING_ENABLED = bool(os.environ.get("ELSAKR_TIMING"))
 
-try:
-    from zxcvbn import zxcvbn
-    ZXCVBN_AVAILABLE = True
-except ImportError:
-    ZXCVBN_AVAILABLE = False
 
-from PIL import Image, ImageTk
+def report_timing(label, since):
+    if TIMING_ENABLED:
+        elapsed = (time.perf_counter() - since) * 1000
+        print(f"[timing] {label}: {elapsed:.1f} ms", file=sys.stderr)
 
 
 class Colors:
@@ -71,7 +69,14 @@ class Colors:
 
 
 class PremiumButton(tk.Canvas):
-    """Custom premium button."""
+    """Custom premium button.
+    
+    The rounded background and label are created once; hover and
+    enable/disable only recolor them with itemconfig.
+    """
+    
+    RADIUS = 10
+    _outline_cache = {}
     
     def __init__(self, parent, text, command=None, width=200, height=45, 
                  primary=True, color=None, **kwargs):
@@ -86,16 +91,34 @@ class PremiumButton(tk.Canvas):
         self.custom_color = color
         self.hovered = False
         self.enabled = True
+        self.drawn_colors = None
         
+        self.bg_item = self.create_polygon(self.rounded_outline(width, height), 
+                                           smooth=True, outline="")
+        self.text_item = self.create_text(width//2, height//2, text=text,
+                                          font=("Segoe UI Semibold", 11))
         self.draw_button()
         
         self.bind("<Enter>", self.on_enter)
         self.bind("<Leave>", self.on_leave)
         self.bind("<Button-1>", self.on_click)
         
-    def draw_button(self):
-        self.delete("all")
+    @classmethod
+    def rounded_outline(cls, width, height):
+        """Polygon points for a button size, shared by all buttons of that size."""
+        key = (width, height)
+        points = cls._outline_cache.get(key)
+        if points is None:
+            x1, y1, x2, y2, r = 2, 2, width-2, height-2, cls.RADIUS
+            points = (
+                x1+r, y1, x2-r, y1, x2, y1, x2, y1+r,
+                x2, y2-r, x2, y2, x2-r, y2, x1+r, y2,
+                x1, y2, x1, y2-r, x1, y1+r, x1, y1,
+            )
+            cls._outline_cache[key] = points
+        return points
         
+    def draw_button(self):
         if not self.enabled:
             bg_color = Colors.BG_INPUT
             text_color = Colors.TEXT_MUTED
@@ -109,20 +132,12 @@ class PremiumButton(tk.Canvas):
             bg_color = Colors.BG_CARD_HOVER if self.hovered else Colors.BG_INPUT
             text_color = Colors.TEXT_SECONDARY
         
-        radius = 10
-        self.create_rounded_rect(2, 2, self.width-2, self.height-2, 
-                                  radius, fill=bg_color, outline="")
-        self.create_text(self.width//2, self.height//2, 
-                        text=self.text, fill=text_color,
-                        font=("Segoe UI Semibold", 11))
-        
-    def create_rounded_rect(self, x1, y1, x2, y2, radius, **kwargs):
-        points = [
-            x1+radius, y1, x2-radius, y1, x2, y1, x2, y1+radius,
-            x2, y2-radius, x2, y2, x2-radius, y2, x1+radius, y2,
-            x1, y2, x1, y2-radius, x1, y1+radius, x1, y1,
-        ]
-        return self.create_polygon(points, smooth=True, **kwargs)
+        # Custom-colored buttons look the same hovered or not: nothing to send
+        if (bg_color, text_color) == self.drawn_colors:
+            return
+        self.itemconfig(self.bg_item, fill=bg_color)
+        self.itemconfig(self.text_item, fill=text_color)
+        self.drawn_colors = (bg_color, text_color)
         
     def on_enter(self, event):
         if self.enabled:
@@ -143,225 +158,41 @@ class PremiumButton(tk.Canvas):
         self.draw_button()
 
 
-class PremiumCard(tk.Frame):
-    def __init__(self, parent, **kwargs):
-        super().__init__(parent, bg=Colors.BG_CARD, **kwargs)
-        self.config(highlightbackground=Colors.BORDER, highlightthickness=1)
-
-
-class PasswordGenerator:
-    """Password generation logic."""
-    
-    @staticmethod
-    def generate(length=16, uppercase=True, lowercase=True, digits=True, 
-                 symbols=True, exclude_ambiguous=False, exclude_chars=""):
-        chars = ""
-        
-        if uppercase:
-            chars += string.ascii_uppercase
-        if lowercase:
-            chars += string.ascii_lowercase
-        if digits:
-            chars += string.digits
-        if symbols:
-            chars += "!@#$%^&*()_+-=[]{}|;:,.<>?"
-            
-        if exclude_ambiguous:
-            ambiguous = "0O1lI"
-            chars = ''.join(c for c in chars if c not in ambiguous)
-            
-        for c in exclude_chars:
-            chars = chars.replace(c, "")
-            
-        if not chars:
-            return ""
-            
-        return ''.join(secrets.choice(chars) for _ in range(length))
-    
-    @staticmethod
-    def generate_passphrase(words=4, separator="-"):
-        # Simple word list for passphrases
-        word_list = [
-            "apple", "banana", "cherry", "dragon", "eagle", "forest", "galaxy",
-            "harbor", "island", "jungle", "kingdom", "lemon", "mountain", "nebula",
-            "ocean", "phoenix", "quantum", "rainbow", "sunset", "thunder", "universe",
-            "velvet", "whisper", "xenon", "yellow", "zenith", "aurora", "breeze",
-            "crystal", "diamond", "ember", "flame", "glacier", "horizon", "ivory"
-        ]
-        return separator.join(secrets.choice(word_list) for _ in range(words))
-
-
-class PasswordAnalyzer:
-    """Password strength analysis."""
+class StrengthBar(tk.Canvas):
+    """Horizontal strength meter: one rectangle moved and recolored in place."""
     
-    @staticmethod
-    def analyze(password):
-        if not password:
-            return {"score": 0, "strength": "None", "feedback": [], "crack_time": "instant"}
-            
-        if ZXCVBN_AVAILABLE:
-            result = zxcvbn(password)
-            score = result['score']
-            crack_time = result['crack_times_display']['offline_slow_hashing_1e4_per_second']
-            feedback = result['feedback']['suggestions']
-            
-            strength_map = {0: "Very Weak", 1: "Weak", 2: "Fair", 3: "Good", 4: "Strong"}
-            return {
-                "score": score,
-                "strength": strength_map[score],
-                "feedback": feedback,
-                "crack_time": crack_time
-            }
-        else:
-            # Basic analysis fallback
-            score = 0
-            feedback = []
-            
-            if len(password) >= 8: score += 1
-            else: feedback.append("Use at least 8 characters")
-            
-            if len(password) >= 12: score += 1
+    def __init__(self, parent, height, **kwargs):
+        super().__init__(parent, height=height, bg=Colors.BG_INPUT, 
+                        highlightthickness=0, **kwargs)
+        self.bar_height = height
+        self.fraction = 0.0
+        self.color = ""
+        self.bar_item = self.create_rectangle(0, 0, 0, height, fill="", outline="")
+        # Width is unknown until the canvas is laid out, and changes on resize
+        self.bind("<Configure>", lambda e: self.place_bar())
+        
+    def set(self, fraction, color):
+        if color != self.color:
+            self.itemconfig(self.bar_item, fill=color)
+            self.color = color
+        if fraction != self.fraction:
+            self.fraction = fraction
+            self.place_bar()
             
-            if any(c.isupper() for c in password): score += 0.5
-            else: feedback.append("Add uppercase letters")
-            
-            if any(c.islower() for c in password): score += 0.5
-            else: feedback.append("Add lowercase letters")
-            
-            if any(c.isdigit() for c in password): score += 0.5
-            else: feedback.append("Add numbers")
-            
-            if any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password): score += 0.5
-            else: feedback.append("Add symbols")
-            
-            score = min(int(score), 4)
-            strength_map = {0: "Very Weak", 1: "Weak", 2: "Fair", 3: "Good", 4: "Strong"}
-            
-            return {
-                "score": score,
-                "strength": strength_map[score],
-                "feedback": feedback,
-                "crack_time": "Unknown"
-            }
+    def place_bar(self):
+        self.coords(self.bar_item, 0, 0, self.winfo_width() * self.fraction, self.bar_height)
 
 
-class VaultDatabase:
-    """Encrypted password storage."""
-    
-    def __init__(self, db_path):
-        self.db_path = db_path
-        self.fernet = None
-        self.conn = None
-        
-    def initialize(self, master_password):
-        """Initialize database with master password."""
-        if not CRYPTO_AVAILABLE:
-            raise Exception("cryptography library not installed")
-            
-        # Derive key from master password
-        salt = b'elsakr_password_vault_salt_2024'  # In production, use random salt stored separately
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=480000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
-        self.fernet = Fernet(key)
-        
-        # Connect to database
-        self.conn = sqlite3.connect(self.db_path)
-        self._create_tables()
-        
-    def _create_tables(self):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS passwords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                username TEXT,
-                password_encrypted TEXT NOT NULL,
-                url TEXT,
-                notes TEXT,
-                category TEXT DEFAULT 'General',
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL
-            )
-        ''')
-        # Insert default categories
-        default_cats = ['General', 'Work', 'Social', 'Finance', 'Shopping', 'Email']
-        for cat in default_cats:
-            try:
-                cursor.execute('INSERT OR IGNORE INTO categories (name) VALUES (?)', (cat,))
-            except:
-                pass
-        self.conn.commit()
-        
-    def add_password(self, title, username, password, url="", notes="", category="General"):
-        """Add a new password entry."""
-        encrypted = self.fernet.encrypt(password.encode()).decode()
-        now = datetime.now().isoformat()
-        
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO passwords (title, username, password_encrypted, url, notes, category, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (title, username, encrypted, url, notes, category, now, now))
-        self.conn.commit()
-        return cursor.lastrowid
-        
-    def get_all_passwords(self):
-        """Get all password entries (decrypted)."""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM passwords ORDER BY title')
-        rows = cursor.fetchall()
-        
-        result = []
-        for row in rows:
-            try:
-                decrypted = self.fernet.decrypt(row[3].encode()).decode()
-                result.append({
-                    'id': row[0],
-                    'title': row[1],
-                    'username': row[2],
-                    'password': decrypted,
-                    'url': row[4],
-                    'notes': row[5],
-                    'category': row[6],
-                    'created_at': row[7],
-                    'updated_at': row[8]
-                })
-            except:
-                pass
-        return result
-        
-    def delete_password(self, id):
-        """Delete a password entry."""
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM passwords WHERE id = ?', (id,))
-        self.conn.commit()
-        
-    def get_categories(self):
-        """Get all categories."""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT name FROM categories ORDER BY name')
-        return [row[0] for row in cursor.fetchall()]
-        
-    def close(self):
-        if self.conn:
-            self.conn.close()
+class PremiumCard(tk.Frame):
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, bg=Colors.BG_CARD, **kwargs)
+        self.config(highlightbackground=Colors.BORDER, highlightthickness=1)
 
 
 class PasswordVault:
     """Main application class."""
     
-    def __init__(self, root):
+    def __init__(self, root, auto_lock_seconds=300, grace_seconds=120):
         self.root = root
         self.root.title("Elsakr Password Vault")
         self.root.geometry("1100x750")
@@ -374,10 +205,40 @@ class PasswordVault:
         # State
         self.vault = None
         self.is_locked = True
-        self.clipboard_timer = None
+        self.clipboard = ClipboardService(root)
+        self.rotation_job = None
+        self.maintenance_job = None
+        self.attachment_jobs = set()
+        self.quick_index = None
+        self.quick_index_stale = False
+        self.main_frame = None
+        self.unlock_frame = None
+        
+        # Session: idle auto-lock and quick re-unlock grace period (0 disables)
+        self.auto_lock_seconds = auto_lock_seconds
+        self.grace_seconds = grace_seconds
+        self.session_verifier = None
+        self.grace_timer = None
+        self.last_activity = time.monotonic()
+        for sequence in ("<Key>", "<Button>", "<Motion>", "<MouseWheel>"):
+            self.root.bind_all(sequence, self.note_activity, add="+")
+        self.root.after(1000, self.check_idle)
+        self.root.bind_all("<Control-Shift-D>", self.show_diagnostics)
+        for sequence in ("<Control-k>", "<Control-K>"):
+            self.root.bind_all(sequence, self.show_quick_open)
+            # Entry and Text bind Ctrl+K to "delete to end of line", and class
+            # bindings fire before "all"; replace them so the palette opens
+            # without eating text from the focused field
+            for widget_class in ("Entry", "Text"):
+                self.root.bind_class(widget_class, sequence, self.show_quick_open)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Show unlock screen first
         self.show_unlock_screen()
+        self.root.after_idle(report_timing, "time-to-unlock-screen", STARTUP_TIME)
+        # Load zxcvbn while the user types the master password so the first
+        # strength update in the Generator tab isn't charged to unlock.
+        self.root.after_idle(PasswordAnalyzer.warm_up)
         
     def resource_path(self, relative_path):
         try:
@@ -395,8 +256,10 @@ class PasswordVault:
             pass
             
     def load_logo(self):
+        """Load and scale the logo once; every screen reuses self.logo_photo."""
         self.logo_photo = None
         try:
+            from PIL import Image, ImageTk
             logo_path = self.resource_path(os.path.join("assets", "Sakr-logo.png"))
             if os.path.exists(logo_path):
                 logo = Image.open(logo_path)
@@ -405,13 +268,25 @@ class PasswordVault:
         except:
             pass
             
+    def note_activity(self, event=None):
+        self.last_activity = time.monotonic()
+        
+    def check_idle(self):
+        """Lock the vault after the configured period without input."""
+        if (not self.is_locked and self.auto_lock_seconds
+                and time.monotonic() - self.last_activity >= self.auto_lock_seconds):
+            self.lock_vault()
+        self.root.after(1000, self.check_idle)
+        
     def show_unlock_screen(self):
         """Show the master password unlock screen."""
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        if self.unlock_frame:
+            self.unlock_frame.destroy()
+        self.unlock_frame = tk.Frame(self.root, bg=Colors.BG_DARK)
+        self.unlock_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
             
         # Center frame
-        center_frame = tk.Frame(self.root, bg=Colors.BG_DARK)
+        center_frame = tk.Frame(self.unlock_frame, bg=Colors.BG_DARK)
         center_frame.place(relx=0.5, rely=0.5, anchor="center")
         
         # Logo
@@ -467,15 +342,91 @@ class PasswordVault:
             messagebox.showwarning("Error", "Please enter your master password")
             return
             
+        # Within the grace period the session is still open: check the cached
+        # verifier and bring back the existing UI without re-deriving the key.
+        if self.vault and self.session_verifier:
+            if not self.verify_session(password):
+                messagebox.showerror("Error", "Incorrect master password")
+                return
+            self.resume_session()
+            return
+            
+        vault = None
         try:
+            started = time.perf_counter()
             db_path = os.path.join(os.path.dirname(__file__), "vault.db")
-            self.vault = VaultDatabase(db_path)
-            self.vault.initialize(password)
+            vault = VaultDatabase(db_path)
+            vault.initialize(password)
+            # Titles list without the key, so check it before showing the vault
+            if not vault.check_key():
+                vault.lock()
+                messagebox.showerror("Error", "Incorrect master password")
+                return
+            PasswordAnalyzer.set_dictionary(vault.get_dictionary_words())
+            self.vault = vault
+            self.session_verifier = self.make_verifier(password)
             self.is_locked = False
+            self.note_activity()
             self.show_main_ui()
+            if self.vault.rotation_pending():
+                self.start_key_rotation()
+            self.root.after_idle(self.build_quick_index)
+            self.root.after_idle(report_timing, "time-to-first-interactive", started)
         except Exception as e:
+            if vault is not None and self.vault is not vault:
+                # Failed before the session started: don't keep a half-open vault
+                vault.lock()
             messagebox.showerror("Error", f"Failed to unlock vault:\n{str(e)}")
             
+    def make_verifier(self, password):
+        """Cheap in-memory verifier used only for re-unlock within the grace period."""
+        salt = secrets.token_bytes(16)
+        return salt, hmac.new(salt, password.encode(), hashlib.sha256).digest()
+        
+    def verify_session(self, password):
+        salt, digest = self.session_verifier
+        candidate = hmac.new(salt, password.encode(), hashlib.sha256).digest()
+        return hmac.compare_digest(candidate, digest)
+        
+    def resume_session(self):
+        """Restore the hidden main UI after a quick re-unlock."""
+        if self.grace_timer:
+            self.root.after_cancel(self.grace_timer)
+            self.grace_timer = None
+        if self.unlock_frame:
+            self.unlock_frame.destroy()
+            self.unlock_frame = None
+        self.is_locked = False
+        self.note_activity()
+        self.main_frame.pack(fill=tk.BOTH, expand=True, padx=25, pady=20)
+        
+    def end_session(self):
+        """Grace period expired: lock the vault (dropping its keys) and drop the main UI."""
+        if self.grace_timer:
+            self.root.after_cancel(self.grace_timer)
+            self.grace_timer = None
+        self.session_verifier = None
+        self.clipboard.clear()
+        PasswordAnalyzer.set_dictionary(())
+        self.stop_key_rotation()
+        self.stop_maintenance()
+        self.stop_attachment_jobs()
+        self.quick_index = None
+        if self.vault:
+            self.vault.lock()
+            self.vault = None
+        if self.main_frame:
+            self.main_frame.destroy()
+            self.main_frame = None
+            
+    def on_close(self):
+        """Clear any secret still on the clipboard before quitting."""
+        self.stop_key_rotation()
+        self.stop_maintenance()
+        self.stop_attachment_jobs()
+        self.clipboard.shutdown()
+        self.root.destroy()
+        
     def create_new_vault(self):
         """Create a new vault with a master password."""
         # Simple dialog for new password
@@ -517,6 +468,7 @@ class PasswordVault:
                 return
                 
             dialog.destroy()
+            self.end_session()
             self.master_entry.delete(0, tk.END)
             self.master_entry.insert(0, pass1.get())
             self.unlock_vault()
@@ -528,9 +480,11 @@ class PasswordVault:
         """Show the main vault UI."""
         for widget in self.root.winfo_children():
             widget.destroy()
+        self.unlock_frame = None
             
         main = tk.Frame(self.root, bg=Colors.BG_DARK)
         main.pack(fill=tk.BOTH, expand=True, padx=25, pady=20)
+        self.main_frame = main
         
         # Header
         self.create_header(main)
@@ -548,10 +502,29 @@ class PasswordVault:
         self.notebook = ttk.Notebook(main)
         self.notebook.pack(fill=tk.BOTH, expand=True, pady=(20, 0))
         
-        # Tabs
-        self.create_generator_tab()
-        self.create_analyzer_tab()
-        self.create_vault_tab()
+        # Tabs are built on first selection
+        self.vault_tree = None
+        self.vault_sort = ("title", False)
+        self.vault_page_after = None
+        self.gen_profiles = None
+        self.tab_builders = {}
+        self.add_lazy_tab("🔑 Generator", self.create_generator_tab)
+        self.add_lazy_tab("📊 Analyzer", self.create_analyzer_tab)
+        self.add_lazy_tab("🔒 My Vault", self.create_vault_tab)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.on_tab_changed()
+        
+    def add_lazy_tab(self, text, builder):
+        tab = tk.Frame(self.notebook, bg=Colors.BG_DARK)
+        self.notebook.add(tab, text=text)
+        self.tab_builders[str(tab)] = (tab, builder)
+        
+    def on_tab_changed(self, event=None):
+        """Build a tab's contents the first time it is selected."""
+        entry = self.tab_builders.pop(self.notebook.select(), None)
+        if entry:
+            tab, builder = entry
+            builder(tab)
         
     def create_header(self, parent):
         header = tk.Frame(parent, bg=Colors.BG_DARK)
@@ -579,18 +552,42 @@ class PasswordVault:
         lock_btn.pack(side=tk.RIGHT)
         lock_btn.bind("<Button-1>", lambda e: self.lock_vault())
         
+        maintenance_btn = tk.Label(header, text="🧹 Maintenance", font=("Segoe UI", 11),
+                                   fg=Colors.TEXT_SECONDARY, bg=Colors.BG_DARK, cursor="hand2")
+        maintenance_btn.pack(side=tk.RIGHT, padx=(0, 20))
+        maintenance_btn.bind("<Button-1>", lambda e: self.show_maintenance_dialog())
+        
+        password_btn = tk.Label(header, text="🔑 Change Password", font=("Segoe UI", 11),
+                                fg=Colors.TEXT_SECONDARY, bg=Colors.BG_DARK, cursor="hand2")
+        password_btn.pack(side=tk.RIGHT, padx=(0, 20))
+        password_btn.bind("<Button-1>", lambda e: self.show_change_password_dialog())
+        
     def lock_vault(self):
-        """Lock the vault."""
-        if self.vault:
-            self.vault.close()
-            self.vault = None
+        """Lock the vault.
+        
+        The main UI is only hidden; it and the unlocked database are kept for
+        grace_seconds so a re-unlock is instant, then end_session wipes them.
+        """
+        if self.is_locked:
+            return
         self.is_locked = True
+        self.clipboard.clear()
+        for widget in self.root.winfo_children():
+            if isinstance(widget, tk.Toplevel):
+                widget.destroy()
+        # The session may stay open for the grace period, but no plaintext does
+        if self.vault:
+            self.vault.wipe_secrets()
+        if self.main_frame:
+            self.main_frame.pack_forget()
+        if self.grace_seconds:
+            self.grace_timer = self.root.after(self.grace_seconds * 1000, self.end_session)
+        else:
+            self.end_session()
         self.show_unlock_screen()
         
-    def create_generator_tab(self):
+    def create_generator_tab(self, tab):
         """Create password generator tab."""
-        tab = tk.Frame(self.notebook, bg=Colors.BG_DARK)
-        self.notebook.add(tab, text="🔑 Generator")
         
         content = tk.Frame(tab, bg=Colors.BG_DARK)
         content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -607,6 +604,24 @@ class PasswordVault:
                 font=("Segoe UI Semibold", 13), fg=Colors.TEXT_PRIMARY,
                 bg=Colors.BG_CARD).pack(anchor=tk.W, pady=(0, 15))
         
+        # Profile
+        tk.Label(options_card, text="Profile",
+                font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
+                bg=Colors.BG_CARD).pack(anchor=tk.W)
+        
+        self.gen_profile_var = tk.StringVar(value="Default")
+        self.gen_profile_combo = ttk.Combobox(options_card, textvariable=self.gen_profile_var,
+                                              state="readonly", font=("Segoe UI", 10))
+        self.gen_profile_combo.pack(fill=tk.X, pady=(5, 2))
+        self.gen_profile_combo.bind("<<ComboboxSelected>>", self.apply_generator_profile)
+        self.update_generator_profile_list()
+        
+        save_profile = tk.Label(options_card, text="＋ Save current settings as profile",
+                                font=("Segoe UI", 9), fg=Colors.PRIMARY, bg=Colors.BG_CARD,
+                                cursor="hand2")
+        save_profile.pack(anchor=tk.W, pady=(0, 12))
+        save_profile.bind("<Button-1>", lambda e: self.save_generator_profile())
+        
         # Length slider
         tk.Label(options_card, text="Length",
                 font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
@@ -632,6 +647,10 @@ class PasswordVault:
         self.gen_digits = tk.BooleanVar(value=True)
         self.gen_symbols = tk.BooleanVar(value=True)
         self.gen_ambiguous = tk.BooleanVar(value=False)
+        self.gen_option_vars = (("uppercase", self.gen_uppercase), ("lowercase", self.gen_lowercase),
+                                ("digits", self.gen_digits), ("symbols", self.gen_symbols),
+                                ("exclude_ambiguous", self.gen_ambiguous))
+        self.gen_policy = compile_policy()
         
         options = [
             ("Uppercase (A-Z)", self.gen_uppercase),
@@ -647,7 +666,7 @@ class PasswordVault:
                                bg=Colors.BG_CARD, selectcolor=Colors.BG_INPUT,
                                activebackground=Colors.BG_CARD,
                                activeforeground=Colors.TEXT_PRIMARY,
-                               command=self.update_generator_preview)
+                               command=self.update_generator_policy)
             cb.pack(anchor=tk.W, pady=2)
         
         # Passphrase option
@@ -701,8 +720,7 @@ class PasswordVault:
                 font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
                 bg=Colors.BG_CARD).pack(anchor=tk.W)
         
-        self.gen_strength_bar = tk.Canvas(output_card, height=8, 
-                                          bg=Colors.BG_INPUT, highlightthickness=0)
+        self.gen_strength_bar = StrengthBar(output_card, height=8)
         self.gen_strength_bar.pack(fill=tk.X, pady=(5, 10))
         
         self.gen_strength_label = tk.Label(output_card, text="",
@@ -716,15 +734,56 @@ class PasswordVault:
     def update_generator_preview(self, *args):
         self.length_label.config(text=str(self.length_var.get()))
         
+    def generator_profiles(self):
+        """Profiles stored in the vault by name, read once per session."""
+        if self.gen_profiles is None:
+            self.gen_profiles = {p['name']: p for p in self.vault.get_generator_profiles()}
+        return self.gen_profiles
+        
+    def update_generator_profile_list(self):
+        self.gen_profile_combo.config(values=list(self.generator_profiles()))
+        
+    def apply_generator_profile(self, event=None):
+        profile = self.generator_profiles().get(self.gen_profile_var.get())
+        if not profile:
+            return
+        policy = compile_policy(**profile['options'])
+        for name, var in self.gen_option_vars:
+            var.set(getattr(policy, name))
+        self.length_slider.config(from_=policy.min_length or 8, to=policy.max_length or 64)
+        self.length_var.set(policy.clamp(policy.length))
+        self.gen_policy = policy
+        self.update_generator_preview()
+        self.generate_password()
+        
+    def update_generator_policy(self):
+        """Recompile after a checkbox change; the profile's other settings are kept."""
+        options = self.gen_policy.options()
+        options.update((name, var.get()) for name, var in self.gen_option_vars)
+        self.gen_policy = compile_policy(**options)
+        self.update_generator_preview()
+        
+    def save_generator_profile(self):
+        """Store the current generator settings as a named profile in the vault."""
+        current = self.generator_profiles().get(self.gen_profile_var.get())
+        name = simpledialog.askstring("Save Profile", "Profile name:", parent=self.root,
+                                      initialvalue=current['name'] if current else "")
+        if not name or not name.strip():
+            return
+        domains = simpledialog.askstring("Save Profile",
+                                         "Sites it is for, comma separated (optional):",
+                                         parent=self.root,
+                                         initialvalue=", ".join(current['domains']) if current else "")
+        if domains is None:
+            return
+        options = dict(self.gen_policy.options(), length=self.length_var.get())
+        self.vault.save_generator_profile(name.strip(), options, domains.split(","))
+        self.gen_profiles = None
+        self.update_generator_profile_list()
+        self.gen_profile_var.set(name.strip())
+        
     def generate_password(self):
-        password = PasswordGenerator.generate(
-            length=self.length_var.get(),
-            uppercase=self.gen_uppercase.get(),
-            lowercase=self.gen_lowercase.get(),
-            digits=self.gen_digits.get(),
-            symbols=self.gen_symbols.get(),
-            exclude_ambiguous=self.gen_ambiguous.get()
-        )
+        password = self.gen_policy.generate(self.length_var.get())
         self.gen_password_var.set(password)
         self.update_gen_strength(password)
         
@@ -737,46 +796,27 @@ class PasswordVault:
         result = PasswordAnalyzer.analyze(password)
         score = result['score']
         
-        # Update bar
-        self.gen_strength_bar.delete("all")
-        width = self.gen_strength_bar.winfo_width()
-        if width < 10:
-            width = 400
-        fill_width = width * ((score + 1) / 5)
-        
         colors = [Colors.STRENGTH_WEAK, Colors.STRENGTH_WEAK, Colors.STRENGTH_FAIR,
                   Colors.STRENGTH_GOOD, Colors.STRENGTH_STRONG]
         color = colors[score]
         
-        self.gen_strength_bar.create_rectangle(0, 0, fill_width, 8, fill=color, outline="")
+        self.gen_strength_bar.set((score + 1) / 5, color)
         self.gen_strength_label.config(text=f"{result['strength']} • Crack time: {result['crack_time']}",
                                        fg=color)
         
     def copy_generated(self):
         password = self.gen_password_var.get()
-        if password and CLIPBOARD_AVAILABLE:
-            pyperclip.copy(password)
+        if self.clipboard.copy(password, expires=30):
             self.gen_strength_label.config(text="✓ Copied! (Auto-clears in 30s)")
             
-            # Clear clipboard after 30 seconds
-            if self.clipboard_timer:
-                self.root.after_cancel(self.clipboard_timer)
-            self.clipboard_timer = self.root.after(30000, self.clear_clipboard)
-            
-    def clear_clipboard(self):
-        if CLIPBOARD_AVAILABLE:
-            pyperclip.copy("")
-            
     def save_generated_to_vault(self):
         password = self.gen_password_var.get()
         if not password:
             return
         self.show_save_dialog(password)
         
-    def create_analyzer_tab(self):
+    def create_analyzer_tab(self, tab):
         """Create password analyzer tab."""
-        tab = tk.Frame(self.notebook, bg=Colors.BG_DARK)
-        self.notebook.add(tab, text="📊 Analyzer")
         
         content = tk.Frame(tab, bg=Colors.BG_DARK)
         content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -784,9 +824,16 @@ class PasswordVault:
         card = PremiumCard(content, padx=30, pady=30)
         card.pack(fill=tk.BOTH, expand=True)
         
-        tk.Label(card, text="🔍 Password Strength Analyzer",
+        title_row = tk.Frame(card, bg=Colors.BG_CARD)
+        title_row.pack(fill=tk.X, pady=(0, 20))
+        
+        tk.Label(title_row, text="🔍 Password Strength Analyzer",
                 font=("Segoe UI Semibold", 16), fg=Colors.TEXT_PRIMARY,
-                bg=Colors.BG_CARD).pack(anchor=tk.W, pady=(0, 20))
+                bg=Colors.BG_CARD).pack(side=tk.LEFT)
+        
+        PremiumButton(title_row, text="📚 Custom Words",
+                     command=self.show_dictionary_dialog, width=150, height=35,
+                     primary=False).pack(side=tk.RIGHT)
         
         tk.Label(card, text="Enter a password to analyze:",
                 font=("Segoe UI", 11), fg=Colors.TEXT_SECONDARY,
@@ -823,8 +870,7 @@ class PasswordVault:
                 font=("Segoe UI Semibold", 12), fg=Colors.TEXT_PRIMARY,
                 bg=Colors.BG_CARD).pack(anchor=tk.W)
         
-        self.analyze_bar = tk.Canvas(results_frame, height=12, 
-                                     bg=Colors.BG_INPUT, highlightthickness=0)
+        self.analyze_bar = StrengthBar(results_frame, height=12)
         self.analyze_bar.pack(fill=tk.X, pady=(8, 5))
         
         self.analyze_strength_label = tk.Label(results_frame, text="—",
@@ -853,18 +899,11 @@ class PasswordVault:
         
         score = result['score']
         
-        # Update bar
-        self.analyze_bar.delete("all")
-        width = self.analyze_bar.winfo_width()
-        if width < 10:
-            width = 500
-        fill_width = width * ((score + 1) / 5)
-        
         colors = [Colors.STRENGTH_WEAK, Colors.STRENGTH_WEAK, Colors.STRENGTH_FAIR,
                   Colors.STRENGTH_GOOD, Colors.STRENGTH_STRONG]
         color = colors[score] if password else Colors.TEXT_MUTED
         
-        self.analyze_bar.create_rectangle(0, 0, fill_width, 12, fill=color, outline="")
+        self.analyze_bar.set((score + 1) / 5, color)
         self.analyze_strength_label.config(text=result['strength'], fg=color)
         self.analyze_time_label.config(text=f"Crack time: {result['crack_time']}")
         
@@ -873,16 +912,427 @@ class PasswordVault:
         else:
             self.analyze_feedback.config(text="No suggestions - password looks good!" if password else "Enter a password to analyze")
             
+    def show_dictionary_dialog(self):
+        """Edit the vault's custom words (company, products, people)."""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Custom Words")
+        dialog.geometry("420x460")
+        dialog.configure(bg=Colors.BG_DARK)
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        tk.Label(dialog, text="📚 Custom Words",
+                font=("Segoe UI Bold", 18), fg=Colors.TEXT_PRIMARY,
+                bg=Colors.BG_DARK).pack(pady=(25, 5))
+        tk.Label(dialog, text="Passwords containing these words are rated weak.\nOne word per line, most obvious first.",
+                font=("Segoe UI", 10), fg=Colors.TEXT_MUTED,
+                bg=Colors.BG_DARK, justify="center").pack(pady=(0, 15))
+        
+        words_text = tk.Text(dialog, height=12, font=("Segoe UI", 11),
+                             bg=Colors.BG_INPUT, fg=Colors.TEXT_PRIMARY,
+                             insertbackground=Colors.TEXT_PRIMARY, relief='flat')
+        words_text.pack(fill=tk.BOTH, expand=True, padx=30)
+        words_text.insert("1.0", "\n".join(self.vault.get_dictionary_words()))
+        
+        def save():
+            words = [w.strip() for w in words_text.get("1.0", tk.END).splitlines() if w.strip()]
+            self.vault.set_dictionary_words(words)
+            PasswordAnalyzer.set_dictionary(words)
+            if hasattr(self, "analyze_var"):
+                self.on_analyze_change()
+            dialog.destroy()
+        
+        PremiumButton(dialog, text="💾 Save", command=save,
+                     width=150, height=45).pack(pady=20)
+        
     def toggle_analyze_visibility(self):
         if self.show_password_var.get():
             self.analyze_entry.config(show="")
         else:
             self.analyze_entry.config(show="•")
         
-    def create_vault_tab(self):
+    def show_diagnostics(self, event=None):
+        """Hidden diagnostics panel (Ctrl+Shift+D): timing spans, no secrets."""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Diagnostics")
+        dialog.geometry("640x480")
+        dialog.configure(bg=Colors.BG_DARK)
+        dialog.transient(self.root)
+        
+        tk.Label(dialog, text="⏱️ Timing Spans",
+                font=("Segoe UI Bold", 16), fg=Colors.TEXT_PRIMARY,
+                bg=Colors.BG_DARK).pack(anchor="w", padx=20, pady=(20, 10))
+        
+        columns = ("Span", "Calls", "Mean ms", "Max ms", "Total ms")
+        summary_tree = ttk.Treeview(dialog, columns=columns, show="headings", height=8)
+        for col in columns:
+            summary_tree.heading(col, text=col)
+            summary_tree.column(col, width=200 if col == "Span" else 90, anchor="w")
+        summary_tree.pack(fill=tk.X, padx=20)
+        
+        recent_text = tk.Text(dialog, height=10, font=("Consolas", 9),
+                              bg=Colors.BG_INPUT, fg=Colors.TEXT_SECONDARY, relief='flat')
+        recent_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        
+        def refresh():
+            summary_tree.delete(*summary_tree.get_children())
+            for name, s in sorted(tracer.summary().items()):
+                summary_tree.insert("", "end", values=(name, s['calls'], s['mean_ms'],
+                                                       s['max_ms'], s['total_ms']))
+            recent_text.delete("1.0", tk.END)
+            for entry in reversed(tracer.recent(50)):
+                extra = " ".join(f"{k}={v}" for k, v in entry.items()
+                                 if k not in ("name", "time", "ms"))
+                stamp = time.strftime("%H:%M:%S", time.localtime(entry['time']))
+                recent_text.insert(tk.END, f"{stamp}  {entry['name']:28} {entry['ms']:9.2f} ms  {extra}\n")
+                
+        def dump():
+            path = filedialog.asksaveasfilename(parent=dialog, defaultextension=".jsonl",
+                                                filetypes=[("JSON Lines", "*.jsonl")])
+            if path:
+                count = tracer.dump(path)
+                messagebox.showinfo("Diagnostics", f"Wrote {count} spans to\n{path}", parent=dialog)
+        
+        btn_frame = tk.Frame(dialog, bg=Colors.BG_DARK)
+        btn_frame.pack(pady=(0, 15))
+        PremiumButton(btn_frame, text="🔄 Refresh", command=refresh, width=110, height=36,
+                     primary=False).pack(side=tk.LEFT, padx=5)
+        PremiumButton(btn_frame, text="💾 Dump JSONL", command=dump, width=130, height=36,
+                     primary=False).pack(side=tk.LEFT, padx=5)
+        PremiumButton(btn_frame, text="🧹 Clear", command=lambda: (tracer.clear(), refresh()),
+                     width=100, height=36, primary=False).pack(side=tk.LEFT, padx=5)
+        refresh()
+        
+    def show_maintenance_dialog(self):
+        """Run a MaintenanceJob in the background and show its progress."""
+        if not self.vault:
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Vault Maintenance")
+        dialog.geometry("520x400")
+        dialog.configure(bg=Colors.BG_DARK)
+        dialog.transient(self.root)
+        
+        tk.Label(dialog, text="🧹 Vault Maintenance",
+                font=("Segoe UI Bold", 16), fg=Colors.TEXT_PRIMARY,
+                bg=Colors.BG_DARK).pack(anchor="w", padx=20, pady=(20, 5))
+        tk.Label(dialog, text="Integrity check, decrypt-verify of every entry, then compaction.\n"
+                              "You can keep using the vault while this runs.",
+                font=("Segoe UI", 9), fg=Colors.TEXT_MUTED, bg=Colors.BG_DARK,
+                justify=tk.LEFT).pack(anchor="w", padx=20)
+        
+        progress = ttk.Progressbar(dialog, mode="determinate", maximum=1)
+        progress.pack(fill=tk.X, padx=20, pady=(15, 5))
+        status = tk.Label(dialog, text="Starting...", font=("Segoe UI", 10),
+                          fg=Colors.TEXT_SECONDARY, bg=Colors.BG_DARK)
+        status.pack(anchor="w", padx=20)
+        
+        report_text = tk.Text(dialog, height=10, font=("Consolas", 9),
+                              bg=Colors.BG_INPUT, fg=Colors.TEXT_SECONDARY, relief='flat')
+        report_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=15)
+        
+        self.stop_maintenance()
+        job = self.maintenance_job = MaintenanceJob(self.vault).start()
+        dialog.bind("<Destroy>", lambda e: job.cancel() if e.widget is dialog else None)
+        
+        stage_names = {"pending": "Starting", "integrity": "Checking integrity",
+                       "verify": "Verifying entries", "compact": "Compacting", "done": "Done"}
+        
+        def poll():
+            if not dialog.winfo_exists():
+                return
+            stage, done, total = job.progress
+            progress.config(maximum=max(total, 1), value=done)
+            status.config(text=f"{stage_names.get(stage, stage)}... {done}/{total}")
+            if not job.done.is_set():
+                dialog.after(100, poll)
+                return
+            if job.error:
+                status.config(text="Maintenance failed", fg=Colors.ERROR)
+                report_text.insert(tk.END, str(job.error))
+                return
+            report = job.result
+            bad = report['undecryptable']
+            ok = report['integrity'] == "ok" and not bad
+            status.config(text="✓ Vault is healthy" if ok else "⚠ Problems found",
+                          fg=Colors.SUCCESS if ok else Colors.ERROR)
+            if report['integrity'] == "ok":
+                report_text.insert(tk.END, "Integrity: ok\n")
+            else:
+                report_text.insert(tk.END, "Integrity problems:\n")
+                for line in report['integrity']:
+                    report_text.insert(tk.END, f"  {line}\n")
+            report_text.insert(tk.END, f"Entries checked: {report['checked']}\n")
+            report_text.insert(tk.END, f"Undecryptable: {len(bad)}\n")
+            for row in bad:
+                report_text.insert(tk.END, f"  #{row['id']} {row['title']} ({row['field']})\n")
+            if 'freed_pages' in report:
+                report_text.insert(tk.END, f"Freed pages: {report['freed_pages']}\n")
+            if report.get('needs_conversion'):
+                report_text.insert(tk.END, "Compaction skipped: this older vault file needs a one-time\n"
+                                           "rewrite. Close the app and run\n"
+                                           "  python -m elsakr_vault maintenance\n")
+            report_text.insert(tk.END, f"File size: {report['size_before'] // 1024} KB → "
+                                       f"{report['size_after'] // 1024} KB\n")
+            
+        poll()
+        
+    def stop_maintenance(self):
+        """Stop a maintenance run before the keys it decrypts with are wiped."""
+        if self.maintenance_job:
+            self.maintenance_job.cancel()
+            self.maintenance_job.done.wait(5)
+            self.maintenance_job = None
+            
+    def stop_attachment_jobs(self):
+        """Stop attachment adds and extracts before the keys they use are wiped."""
+        jobs = [job for job in self.attachment_jobs if not job.done.is_set()]
+        for job in jobs:
+            job.cancel()
+        for job in jobs:
+            job.done.wait(5)
+        self.attachment_jobs.clear()
+            
+    def start_key_rotation(self):
+        """Re-encrypt rows still on the previous key in the background (resumes an interrupted rotation)."""
+        if self.rotation_job and not self.rotation_job.done.is_set():
+            return self.rotation_job
+        self.rotation_job = KeyRotationJob(self.vault).start()
+        self.root.after(100, self.poll_key_rotation, self.rotation_job)
+        return self.rotation_job
+        
+    def poll_key_rotation(self, job):
+        """Drop the previous key on the Tk thread once the worker is done with it."""
+        if self.rotation_job is not job:
+            return
+        if not job.done.is_set():
+            self.root.after(100, self.poll_key_rotation, job)
+        elif not job.error:
+            job.finish()
+        
+    def stop_key_rotation(self):
+        """Let in-flight batches land before the keys are wiped; the next unlock resumes."""
+        if self.rotation_job:
+            self.rotation_job.cancel()
+            self.rotation_job.done.wait(5)
+            self.rotation_job = None
+            
+    def show_change_password_dialog(self):
+        """Change the master password and re-encrypt the vault under the new key."""
+        if not self.vault:
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Change Master Password")
+        dialog.geometry("420x470")
+        dialog.configure(bg=Colors.BG_DARK)
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        tk.Label(dialog, text="🔑 Change Master Password",
+                font=("Segoe UI Bold", 16), fg=Colors.TEXT_PRIMARY,
+                bg=Colors.BG_DARK).pack(pady=(25, 15))
+        
+        fields = []
+        for label in ("Current Password:", "New Password:", "Confirm New Password:"):
+            tk.Label(dialog, text=label,
+                    font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
+                    bg=Colors.BG_DARK).pack(anchor="w", padx=40)
+            entry = tk.Entry(dialog, font=("Segoe UI", 12), show="•",
+                            bg=Colors.BG_INPUT, fg=Colors.TEXT_PRIMARY,
+                            insertbackground=Colors.TEXT_PRIMARY, relief='flat')
+            entry.pack(fill="x", padx=40, ipady=8, pady=(5, 12))
+            fields.append(entry)
+        current, new, confirm = fields
+        
+        progress = ttk.Progressbar(dialog, mode="determinate", maximum=1)
+        progress.pack(fill=tk.X, padx=40, pady=(5, 5))
+        status = tk.Label(dialog, text="Entries are re-encrypted in the background.",
+                          font=("Segoe UI", 9), fg=Colors.TEXT_MUTED, bg=Colors.BG_DARK)
+        status.pack(anchor="w", padx=40)
+        
+        def poll(job):
+            if not dialog.winfo_exists():
+                return
+            stage, done, total = job.progress
+            progress.config(maximum=max(total, 1), value=done)
+            if stage != "pending":
+                status.config(text=f"Re-encrypting {stage}... {done}/{total}")
+            if not job.done.is_set():
+                dialog.after(100, poll, job)
+            elif job.error:
+                status.config(text="Re-encryption stopped; it resumes on next unlock", fg=Colors.ERROR)
+            elif self.rotation_job is job and job.finish():
+                damaged = len(job.result["unreadable"]) + len(job.result["unreadable_attachments"])
+                if damaged:
+                    status.config(text=f"✓ Master password changed; {damaged} damaged item(s) "
+                                       "could not be read and were left as they were",
+                                  fg=Colors.WARNING)
+                else:
+                    status.config(text="✓ Master password changed", fg=Colors.SUCCESS)
+            else:
+                status.config(text="⚠ Some entries could not be re-encrypted", fg=Colors.WARNING)
+        
+        def change():
+            if not self.verify_session(current.get()):
+                messagebox.showerror("Error", "Incorrect master password", parent=dialog)
+                return
+            if new.get() != confirm.get():
+                messagebox.showerror("Error", "Passwords don't match!", parent=dialog)
+                return
+            if len(new.get()) < 8:
+                messagebox.showerror("Error", "Password must be at least 8 characters!", parent=dialog)
+                return
+            if self.vault.rotation_pending():
+                messagebox.showinfo("Please wait", "The previous password change is still being applied.",
+                                    parent=dialog)
+                return
+            # The old key is kept only to re-encrypt with; if it can't decrypt
+            # the vault, rotating would leave every entry unreadable
+            if not self.vault.check_key():
+                messagebox.showerror("Error", "The vault can't be decrypted with the current key.",
+                                     parent=dialog)
+                return
+            self.vault.begin_key_rotation(new.get())
+            self.session_verifier = self.make_verifier(new.get())
+            for entry in fields:
+                entry.delete(0, tk.END)
+            change_btn.set_enabled(False)
+            poll(self.start_key_rotation())
+        
+        change_btn = PremiumButton(dialog, text="Change Password", command=change,
+                                   width=180, height=40)
+        change_btn.pack(pady=15)
+        
+    def build_quick_index(self):
+        """Index titles, usernames and sites for Ctrl+K on a worker thread (nothing is decrypted)."""
+        vault = self.vault
+        if not vault:
+            return
+        rows = vault.list_search_fields()
+        self.quick_index_stale = False
+        built = {}
+        worker = threading.Thread(target=lambda: built.update(index=QuickOpenIndex.from_rows(rows)),
+                                  name="quick-open-index", daemon=True)
+        worker.start()
+        
+        def poll():
+            if self.vault is not vault:
+                return
+            if worker.is_alive():
+                self.root.after(50, poll)
+            elif self.quick_index_stale:
+                self.build_quick_index()    # entries changed while building
+            else:
+                self.quick_index = built.get('index')
+        
+        poll()
+        
+    def update_quick_index(self, id, entry=None):
+        """Apply an added (entry given) or deleted entry to the Ctrl+K index."""
+        if self.quick_index is None:
+            self.quick_index_stale = True
+        elif entry:
+            self.quick_index.add(id, entry['title'], entry['username'], entry['url'])
+        else:
+            self.quick_index.remove(id)
+            
+    def show_quick_open(self, event=None):
+        """Ctrl+K: type a few letters, Enter copies that entry's password."""
+        if self.is_locked or not self.vault:
+            return "break"
+        for widget in self.root.winfo_children():
+            if isinstance(widget, tk.Toplevel) and widget.title() == "Quick Open":
+                widget.lift()
+                return "break"
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Quick Open")
+        dialog.configure(bg=Colors.BG_CARD)
+        dialog.transient(self.root)
+        width = 560
+        x = self.root.winfo_rootx() + (self.root.winfo_width() - width) // 2
+        dialog.geometry(f"{width}x380+{max(x, 0)}+{self.root.winfo_rooty() + 80}")
+        
+        query_var = tk.StringVar()
+        query_entry = tk.Entry(dialog, textvariable=query_var, font=("Segoe UI", 14),
+                               bg=Colors.BG_INPUT, fg=Colors.TEXT_PRIMARY, relief='flat',
+                               insertbackground=Colors.TEXT_PRIMARY)
+        query_entry.pack(fill=tk.X, padx=15, pady=(15, 10), ipady=8)
+        
+        results_list = tk.Listbox(dialog, font=("Segoe UI", 11), bg=Colors.BG_CARD,
+                                  fg=Colors.TEXT_PRIMARY, selectbackground=Colors.PRIMARY,
+                                  relief='flat', highlightthickness=0, activestyle="none",
+                                  exportselection=False)
+        results_list.pack(fill=tk.BOTH, expand=True, padx=15)
+        
+        hint = "↑↓ select • Enter copy password • Shift+Enter details • Esc close"
+        status = tk.Label(dialog, text=hint, font=("Segoe UI", 9),
+                          fg=Colors.TEXT_MUTED, bg=Colors.BG_CARD)
+        status.pack(anchor="w", padx=15, pady=8)
+        
+        result_ids = []
+        
+        def update_results(*args):
+            if not dialog.winfo_exists():
+                return
+            if self.quick_index is None:
+                status.config(text="Indexing entries...")
+                dialog.after(100, update_results)
+                return
+            status.config(text=hint)
+            results_list.delete(0, tk.END)
+            result_ids[:] = [id for _, id in self.quick_index.search(query_var.get())]
+            for id in result_ids:
+                title, username, url = self.quick_index.entries[id]
+                detail = "  ·  ".join(part for part in (username, url) if part)
+                results_list.insert(tk.END, f"{title}   {detail}" if detail else title)
+            if result_ids:
+                results_list.selection_set(0)
+            
+        def move(step):
+            selection = results_list.curselection()
+            if result_ids:
+                index = min(max((selection[0] if selection else -1) + step, 0), len(result_ids) - 1)
+                results_list.selection_clear(0, tk.END)
+                results_list.selection_set(index)
+                results_list.see(index)
+            return "break"
+            
+        def selected_entry():
+            selection = results_list.curselection()
+            if not selection:
+                return None
+            # Only the chosen entry is decrypted
+            return self.vault.get_entry(result_ids[selection[0]])
+            
+        def copy_selected(event=None):
+            entry = selected_entry()
+            if entry:
+                copied = self.clipboard.copy(entry['password'].reveal(), expires=30, one_shot=True)
+                wipe_entry(entry)
+                if copied:
+                    dialog.destroy()
+            return "break"
+            
+        def open_selected(event=None):
+            entry = selected_entry()
+            if entry:
+                dialog.destroy()
+                self.show_password_details(entry)
+            return "break"
+        
+        query_var.trace_add("write", update_results)
+        query_entry.bind("<Down>", lambda e: move(1))
+        query_entry.bind("<Up>", lambda e: move(-1))
+        dialog.bind("<Return>", copy_selected)
+        dialog.bind("<Shift-Return>", open_selected)
+        dialog.bind("<Escape>", lambda e: dialog.destroy())
+        results_list.bind("<Double-Button-1>", copy_selected)
+        query_entry.focus_set()
+        update_results()
+        return "break"
+        
+    def create_vault_tab(self, tab):
         """Create password vault tab."""
-        tab = tk.Frame(self.notebook, bg=Colors.BG_DARK)
-        self.notebook.add(tab, text="🔒 My Vault")
         
         content = tk.Frame(tab, bg=Colors.BG_DARK)
         content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -915,10 +1365,10 @@ class PasswordVault:
         self.vault_tree = ttk.Treeview(list_card, columns=columns, show="headings",
                                        style="Vault.Treeview")
         
-        self.vault_tree.heading("Title", text="Title")
-        self.vault_tree.heading("Username", text="Username")
-        self.vault_tree.heading("Category", text="Category")
-        self.vault_tree.heading("Created", text="Created")
+        # Click a heading to sort by it (again to reverse); sorting is done by SQL
+        for col in columns:
+            self.vault_tree.heading(col, text=col,
+                                    command=lambda c=col: self.sort_vault_list(c.lower()))
         
         self.vault_tree.column("Title", width=200)
         self.vault_tree.column("Username", width=200)
@@ -926,7 +1376,8 @@ class PasswordVault:
         self.vault_tree.column("Created", width=150)
         
         scrollbar = ttk.Scrollbar(list_card, orient="vertical", command=self.vault_tree.yview)
-        self.vault_tree.configure(yscrollcommand=scrollbar.set)
+        self.vault_tree.configure(yscrollcommand=lambda first, last: self.on_vault_scroll(
+            scrollbar, first, last))
         
         self.vault_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -938,36 +1389,76 @@ class PasswordVault:
         
     def refresh_vault_list(self):
         """Refresh the vault password list."""
+        if self.vault_tree is None:
+            return
         for item in self.vault_tree.get_children():
             self.vault_tree.delete(item)
+        
+        sort, descending = self.vault_sort
+        for col in ("Title", "Username", "Category", "Created"):
+            arrow = (" ▼" if descending else " ▲") if col.lower() == sort else ""
+            self.vault_tree.heading(col, text=col + arrow)
             
+        self.vault_page_after = None
         if self.vault:
-            passwords = self.vault.get_all_passwords()
+            self.load_vault_page()
+            
+    def load_vault_page(self):
+        """Append the next page of the current sort order to the list."""
+        sort, descending = self.vault_sort
+        with span("ui.load_vault_page") as trace:
+            passwords, self.vault_page_after = self.vault.list_page(
+                sort, descending, after=self.vault_page_after)
             for p in passwords:
                 created = p['created_at'][:10] if p['created_at'] else ""
                 self.vault_tree.insert("", "end", iid=p['id'],
                                        values=(p['title'], p['username'], 
                                               p['category'], created))
-                                              
+            trace["count"] = len(passwords)
+            
+    def on_vault_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        # Fetch the next page once the user gets near the end of what's loaded
+        if self.vault and self.vault_page_after is not None and float(last) > 0.9:
+            self.root.after_idle(self.load_more_vault_entries, self.vault_page_after)
+            
+    def load_more_vault_entries(self, after):
+        # Several scroll events can queue the same page; only the first loads it
+        if self.vault and after is not None and after == self.vault_page_after:
+            self.load_vault_page()
+            
+    def sort_vault_list(self, column):
+        sort, descending = self.vault_sort
+        self.vault_sort = (column, not descending if column == sort else False)
+        self.refresh_vault_list()
+        
     def on_vault_double_click(self, event):
         """Handle double-click on vault item."""
         selection = self.vault_tree.selection()
         if selection:
-            item_id = selection[0]
-            passwords = self.vault.get_all_passwords()
-            for p in passwords:
-                if str(p['id']) == str(item_id):
-                    self.show_password_details(p)
-                    break
+            id = int(selection[0])
+            try:
+                entry = self.vault.get_entry(id)
+            except Exception:
+                # A damaged row can't be opened, but it can still go
+                if messagebox.askyesno("Error", "This entry could not be decrypted.\n\n"
+                                       "Delete it from the vault?", icon="error"):
+                    self.vault.delete_password(id)
+                    self.update_quick_index(id)
+                    self.refresh_vault_list()
+                return
+            if entry:
+                self.show_password_details(entry)
                     
     def show_password_details(self, password_data):
-        """Show password details dialog."""
+        """Show password details dialog; its decrypted values are wiped when it closes."""
         dialog = tk.Toplevel(self.root)
         dialog.title("Password Details")
-        dialog.geometry("450x400")
+        dialog.geometry("450x580")
         dialog.configure(bg=Colors.BG_DARK)
         dialog.transient(self.root)
         dialog.grab_set()
+        dialog.bind("<Destroy>", lambda e: wipe_entry(password_data) if e.widget is dialog else None)
         
         tk.Label(dialog, text=password_data['title'],
                 font=("Segoe UI Bold", 18), fg=Colors.TEXT_PRIMARY,
@@ -999,17 +1490,91 @@ class PasswordVault:
                 tk.Label(row, text=value or "—", font=("Segoe UI", 11),
                         fg=Colors.TEXT_PRIMARY, bg=Colors.BG_DARK).pack(side=tk.LEFT)
         
+        if password_data.get('notes'):
+            tk.Label(info_frame, text="Notes:", font=("Segoe UI", 10),
+                    fg=Colors.TEXT_MUTED, bg=Colors.BG_DARK).pack(anchor="w", pady=(5, 0))
+            tk.Label(info_frame, text=password_data['notes'].reveal(), font=("Segoe UI", 10),
+                    fg=Colors.TEXT_PRIMARY, bg=Colors.BG_DARK, justify=tk.LEFT,
+                    wraplength=380).pack(anchor="w")
+        
+        # Attachments (names and sizes only; bodies are streamed on demand)
+        store = AttachmentStore(self.vault)
+        tk.Label(info_frame, text="Attachments:", font=("Segoe UI", 10),
+                fg=Colors.TEXT_MUTED, bg=Colors.BG_DARK).pack(anchor="w", pady=(10, 3))
+        attach_list = tk.Listbox(info_frame, height=4, font=("Segoe UI", 10),
+                                 bg=Colors.BG_INPUT, fg=Colors.TEXT_PRIMARY,
+                                 relief='flat', highlightthickness=0)
+        attach_list.pack(fill=tk.X)
+        attach_status = tk.Label(info_frame, text="", font=("Segoe UI", 9),
+                                 fg=Colors.TEXT_MUTED, bg=Colors.BG_DARK)
+        attach_status.pack(anchor="w")
+        attachments = []
+        
+        def refresh_attachments():
+            attach_list.delete(0, tk.END)
+            attachments[:] = store.list(password_data['id'])
+            for a in attachments:
+                attach_list.insert(tk.END, f"📎 {a['name']}  ({a['size']:,} bytes)")
+                
+        def run_attachment_job(status, failure, method, *args):
+            # Large files take a while to encrypt or decrypt; keep the window responsive
+            attach_status.config(text=status, fg=Colors.TEXT_MUTED)
+            job = AttachmentJob(self.vault, method, *args).start()
+            # Kept until done even if this window closes; locking waits for it
+            self.attachment_jobs.add(job)
+            
+            def poll():
+                if not dialog.winfo_exists():
+                    return
+                if not job.done.is_set():
+                    dialog.after(100, poll)
+                    return
+                self.attachment_jobs.discard(job)
+                attach_status.config(text="")
+                if job.error:
+                    messagebox.showerror("Error", f"{failure}:\n{job.error}", parent=dialog)
+                if method == "add" and self.vault is store.vault:
+                    refresh_attachments()
+            
+            poll()
+                
+        def add_attachment():
+            path = filedialog.askopenfilename(parent=dialog)
+            if path:
+                run_attachment_job("Encrypting...", "Failed to attach file",
+                                   "add", password_data['id'], os.path.basename(path), path)
+                
+        def save_attachment():
+            selection = attach_list.curselection()
+            if not selection:
+                return
+            attachment = attachments[selection[0]]
+            path = filedialog.asksaveasfilename(parent=dialog, initialfile=attachment['name'])
+            if path:
+                run_attachment_job("Decrypting...", "Failed to extract file",
+                                   "extract", attachment['id'], path)
+        
+        attach_btns = tk.Frame(info_frame, bg=Colors.BG_DARK)
+        attach_btns.pack(anchor="w", pady=(5, 0))
+        PremiumButton(attach_btns, text="📎 Attach File", command=add_attachment,
+                     width=120, height=32, primary=False).pack(side=tk.LEFT, padx=(0, 5))
+        PremiumButton(attach_btns, text="💾 Save As", command=save_attachment,
+                     width=100, height=32, primary=False).pack(side=tk.LEFT)
+        refresh_attachments()
+        
         btn_frame = tk.Frame(dialog, bg=Colors.BG_DARK)
-        btn_frame.pack(pady=30)
+        btn_frame.pack(pady=25)
         
         def copy_password():
-            if CLIPBOARD_AVAILABLE:
-                pyperclip.copy(password_data['password'])
-                messagebox.showinfo("Copied", "Password copied to clipboard!")
+            # Withdrawn after the first paste where the platform allows it
+            if self.clipboard.copy(password_data['password'].reveal(), expires=30, one_shot=True):
+                messagebox.showinfo("Copied", "Password copied to clipboard!\n"
+                                    "It will be cleared in 30 seconds.", parent=dialog)
                 
         def delete_password():
             if messagebox.askyesno("Delete", f"Delete '{password_data['title']}'?"):
                 self.vault.delete_password(password_data['id'])
+                self.update_quick_index(password_data['id'])
                 self.refresh_vault_list()
                 dialog.destroy()
         
@@ -1024,7 +1589,7 @@ class PasswordVault:
         """Show dialog to save a new password."""
         dialog = tk.Toplevel(self.root)
         dialog.title("Save Password")
-        dialog.geometry("450x450")
+        dialog.geometry("450x610")
         dialog.configure(bg=Colors.BG_DARK)
         dialog.transient(self.root)
         dialog.grab_set()
@@ -1058,9 +1623,37 @@ class PasswordVault:
         password_entry = tk.Entry(form, font=("Segoe UI", 11), bg=Colors.BG_INPUT,
                                  fg=Colors.TEXT_PRIMARY, relief='flat',
                                  insertbackground=Colors.TEXT_PRIMARY)
-        password_entry.pack(fill=tk.X, ipady=6, pady=(3, 10))
+        password_entry.pack(fill=tk.X, ipady=6, pady=(3, 2))
         password_entry.insert(0, password)
         
+        strength_label = tk.Label(form, text="", font=("Segoe UI", 9),
+                                  fg=Colors.TEXT_MUTED, bg=Colors.BG_DARK)
+        strength_label.pack(anchor="w", pady=(0, 8))
+        
+        # Generate from a profile; picked automatically from the URL until chosen by hand
+        generate_row = tk.Frame(form, bg=Colors.BG_DARK)
+        generate_row.pack(fill=tk.X, pady=(0, 10))
+        profiles = self.generator_profiles() if self.vault else {}
+        profile_var = tk.StringVar(value="Default")
+        profile_combo = ttk.Combobox(generate_row, textvariable=profile_var, values=list(profiles),
+                                     state="readonly", font=("Segoe UI", 10))
+        profile_combo.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
+        profile_chosen = [False]
+        
+        def choose_profile(event=None):
+            profile_chosen[0] = True
+        
+        def generate_from_profile():
+            profile = profiles.get(profile_var.get())
+            policy = compile_policy(**profile['options']) if profile else compile_policy()
+            password_entry.delete(0, tk.END)
+            password_entry.insert(0, policy.generate())
+            update_strength()
+        
+        profile_combo.bind("<<ComboboxSelected>>", choose_profile)
+        PremiumButton(generate_row, text="🔄 Generate", command=generate_from_profile,
+                     width=120, height=32, primary=False).pack(side=tk.RIGHT)
+        
         # URL
         tk.Label(form, text="URL", font=("Segoe UI", 10),
                 fg=Colors.TEXT_SECONDARY, bg=Colors.BG_DARK).pack(anchor="w")
@@ -1069,6 +1662,14 @@ class PasswordVault:
                             insertbackground=Colors.TEXT_PRIMARY)
         url_entry.pack(fill=tk.X, ipady=6, pady=(3, 10))
         
+        # Notes (stored encrypted)
+        tk.Label(form, text="Notes", font=("Segoe UI", 10),
+                fg=Colors.TEXT_SECONDARY, bg=Colors.BG_DARK).pack(anchor="w")
+        notes_text = tk.Text(form, height=3, font=("Segoe UI", 10), bg=Colors.BG_INPUT,
+                             fg=Colors.TEXT_PRIMARY, relief='flat',
+                             insertbackground=Colors.TEXT_PRIMARY)
+        notes_text.pack(fill=tk.X, pady=(3, 10))
+        
         # Category
         tk.Label(form, text="Category", font=("Segoe UI", 10),
                 fg=Colors.TEXT_SECONDARY, bg=Colors.BG_DARK).pack(anchor="w")
@@ -1079,6 +1680,30 @@ class PasswordVault:
                                       font=("Segoe UI", 11))
         category_combo.pack(fill=tk.X, ipady=3, pady=(3, 20))
         
+        def update_strength(event=None):
+            # Title, username and URL words count as known to an attacker
+            pwd = password_entry.get()
+            if not pwd:
+                strength_label.config(text="")
+                return
+            words = entry_words(title_entry.get(), username_entry.get(), url_entry.get())
+            result = PasswordAnalyzer.analyze(pwd, user_inputs=words)
+            colors = [Colors.STRENGTH_WEAK, Colors.STRENGTH_WEAK, Colors.STRENGTH_FAIR,
+                      Colors.STRENGTH_GOOD, Colors.STRENGTH_STRONG]
+            strength_label.config(text=f"{result['strength']} • Crack time: {result['crack_time']}",
+                                  fg=colors[result['score']])
+        
+        def match_profile(event=None):
+            if not profile_chosen[0]:
+                profile = profile_for_url(profiles.values(), url_entry.get())
+                profile_var.set(profile['name'] if profile else "Default")
+            update_strength()
+        
+        for entry in (title_entry, username_entry, password_entry):
+            entry.bind("<KeyRelease>", update_strength)
+        url_entry.bind("<KeyRelease>", match_profile)
+        update_strength()
+        
         def save():
             title = title_entry.get().strip()
             pwd = password_entry.get()
@@ -1087,13 +1712,15 @@ class PasswordVault:
                 messagebox.showwarning("Error", "Title and Password are required!")
                 return
                 
-            self.vault.add_password(
-                title=title,
-                username=username_entry.get().strip(),
+            entry = {'title': title, 'username': username_entry.get().strip(),
+                     'url': url_entry.get().strip()}
+            entry_id = self.vault.add_password(
                 password=pwd,
-                url=url_entry.get().strip(),
-                category=category_var.get()
+                notes=notes_text.get("1.0", tk.END).strip(),
+                category=category_var.get(),
+                **entry
             )
+            self.update_quick_index(entry_id, entry)
             self.refresh_vault_list()
             dialog.destroy()
             messagebox.showinfo("Saved", f"Password '{title}' saved successfully!")
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+from elsakr_vault import VaultDatabase
+from elsakr_vault.attachments import AttachmentError, AttachmentJob, AttachmentStore
+
+
+@pytest.fixture
+def vault(tmp_path):
+    vault = VaultDatabase(str(tmp_path / "vault.db"))
+    vault.initialize("attachment master password")
+    yield vault
+    vault.close()
+
+
+def test_cancelled_jobs_leave_nothing_behind(vault, tmp_path):
+    entry = vault.add_password("Server", "root", "s3cret")
+    source = tmp_path / "id_ed25519"
+    source.write_bytes(b"key" * 100000)
+
+    job = AttachmentJob(vault, "add", entry, source.name, str(source))
+    job.cancel()
+    with pytest.raises(AttachmentError):
+        job.run()
+    store = AttachmentStore(vault)
+    assert store.list(entry) == []
+
+    attachment = store.add(entry, source.name, io.BytesIO(source.read_bytes()), size=300000)
+    dest = tmp_path / "restored"
+    job = AttachmentJob(vault, "extract", attachment, str(dest))
+    job.cancel()
+    with pytest.raises(AttachmentError):
+        job.run()
+    assert not dest.exists()
+
+    assert AttachmentJob(vault, "extract", attachment, str(dest)).run() == 300000
+    assert dest.read_bytes() == source.read_bytes()
@@ -0,0 +1,21 @@
+import json
+
+from elsakr_vault import VaultDatabase
+from elsakr_vault.cli import main
+
+MASTER_PASSWORD = "cli master password"
+
+
+def test_get_falls_back_when_the_agent_is_gone(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "vault.db")
+    vault = VaultDatabase(path)
+    vault.initialize(MASTER_PASSWORD)
+    vault.add_password("GitHub", "dev", "s3cret")
+    vault.close()
+    monkeypatch.setenv("ELSAKR_MASTER_PASSWORD", MASTER_PASSWORD)
+    monkeypatch.setenv("ELSAKR_AGENT_SOCK", str(tmp_path / "agent.sock"))
+
+    assert main(["--db", path, "get", "GitHub"]) == 0
+    out, err = capsys.readouterr()
+    assert json.loads(out)["password"] == "s3cret"
+    assert "agent not running at" in err
@@ -0,0 +1,40 @@
+import sqlite3
+
+from elsakr_vault import VaultDatabase
+from elsakr_vault.maintenance import MaintenanceJob
+
+
+def auto_vacuum(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_full_vacuum_only_when_asked(tmp_path):
+    path = str(tmp_path / "vault.db")
+    vault = VaultDatabase(path)
+    vault.initialize("maintenance master password")
+    for id in [vault.add_password(f"entry {n}", "user", "pw" * 50) for n in range(200)]:
+        vault.delete_password(id)
+    vault.close()
+    # A file from before incremental auto-vacuum
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA auto_vacuum = NONE')
+    conn.execute('VACUUM')
+    conn.close()
+
+    vault = VaultDatabase(path)
+    vault.initialize("maintenance master password")
+    try:
+        report = MaintenanceJob(vault).run()
+        assert report["needs_conversion"] and "freed_pages" not in report
+        assert auto_vacuum(path) == 0
+
+        report = MaintenanceJob(vault, convert=True).run()
+        assert "needs_conversion" not in report
+        assert auto_vacuum(path) == 2
+        assert "needs_conversion" not in MaintenanceJob(vault).run()
+    finally:
+        vault.close()
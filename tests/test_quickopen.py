@@ -0,0 +1,67 @@
+import random
+import string
+
+import pytest
+
+from elsakr_vault.quickopen import QuickOpenIndex
+
+REAL = [
+    ("GitHub", "dev@corp.io", "https://github.com"),
+    ("Netflix", "me@home.net", "https://www.netflix.com"),
+    ("Bank of America", "jdoe", "https://bankofamerica.com"),
+]
+
+
+def random_text(rng, length):
+    return "".join(rng.choice(string.ascii_letters) for _ in range(length))
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = random.Random(1)
+    # The real entries are the oldest, so recency can't be what finds them
+    rows = [(id, *fields) for id, fields in enumerate(REAL, 1)]
+    rows += [(id, f"{random_text(rng, 8)} {id}", f"{random_text(rng, 6).lower()}@example.com",
+              f"https://{random_text(rng, 10).lower()}.example.com")
+             for id in range(len(REAL) + 1, 20001)]
+    return QuickOpenIndex.from_rows(rows)
+
+
+def brute_force_best(index, query):
+    query = "".join(query.lower().split())
+    scores = (index._score(query, id) for id in index.entries)
+    return max((score for score in scores if score is not None), default=None)
+
+
+@pytest.mark.parametrize("query,title", [
+    ("ntflx", "Netflix"), ("bnk amer", "Bank of America"), ("github", "GitHub"),
+])
+def test_old_entries_are_found(index, query, title):
+    assert index.entries[index.search(query)[0][1]][0] == title
+
+
+@pytest.mark.parametrize("query", ["gthb", "bofa"])
+def test_abbreviations_find_real_entries(index, query):
+    assert any(index.entries[id] in REAL for _, id in index.search(query))
+
+
+def test_best_hit_matches_full_scan(index):
+    rng = random.Random(4)
+    titles = [title for title, _, _ in index.entries.values()]
+    queries = ["gthb", "ntflx", "bofa", "bnk amer", "llm", "n", "xq", "zzzz"]
+    for _ in range(30):
+        title = rng.choice(titles).lower()
+        picked = sorted(rng.sample(range(len(title)), min(len(title), rng.randint(2, 5))))
+        queries.append("".join(title[i] for i in picked).strip() or "a")
+        queries.append("".join(rng.choice(string.ascii_lowercase + string.digits)
+                               for _ in range(rng.randint(1, 5))))
+    for query in queries:
+        found = index.search(query, limit=1)
+        assert (found[0][0] if found else None) == brute_force_best(index, query), query
+
+
+def test_edits_are_searchable(index):
+    index.add(2, "Netflix Family", "me@home.net", "https://www.netflix.com")
+    assert index.search("ntflx fam")[0][1] == 2
+    index.remove(2)
+    assert all(id != 2 for _, id in index.search("ntflx"))
@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from elsakr_vault import VaultDatabase
+from elsakr_vault.attachments import AttachmentStore
+from elsakr_vault.rotation import KeyRotationJob
+
+
+@pytest.fixture
+def vault(tmp_path):
+    vault = VaultDatabase(str(tmp_path / "vault.db"))
+    vault.initialize("old master password")
+    yield vault
+    vault.close()
+
+
+def test_damaged_rows_do_not_keep_rotation_pending(vault):
+    good = vault.add_password("GitHub", "dev", "s3cret")
+    damaged = vault.add_password("Netflix", "me", "hunter22")
+    store = AttachmentStore(vault)
+    kept = store.add(good, "recovery.txt", io.BytesIO(b"codes"), size=5)
+    broken = store.add(good, "scan.pdf", io.BytesIO(b"%PDF-1.7"), size=8)
+    with vault.conn:
+        vault.conn.execute("UPDATE passwords SET password_encrypted = 'gAAAAAdamaged' WHERE id = ?",
+                           (damaged,))
+        vault.conn.execute("UPDATE attachment_data SET data = zeroblob(length(data)) "
+                           "WHERE attachment_id = ?", (broken,))
+
+    vault.begin_key_rotation("new master password")
+    job = KeyRotationJob(vault, workers=1)
+    report = job.run()
+    assert report["unreadable"] == [damaged]
+    assert report["unreadable_attachments"] == [broken]
+
+    assert job.finish()
+    assert not vault.rotation_pending()
+    assert list(vault.fernets) == [vault.key_version]
+    assert vault.get_entry(good)["password"].reveal() == "s3cret"
+    assert b"".join(store.iter_chunks(kept)) == b"codes"
+
+    # The damaged entry can still be deleted, and the next rotation isn't refused
+    vault.delete_password(damaged)
+    vault.begin_key_rotation("newer master password")
+    assert KeyRotationJob(vault, workers=1).run()["unreadable"] == []
+
+
+def test_rotation_waits_for_rows_it_has_not_tried(vault):
+    vault.add_password("GitHub", "dev", "s3cret")
+    vault.begin_key_rotation("new master password")
+    job = KeyRotationJob(vault, workers=1)
+    job.cancel()
+    job.run()
+    assert not job.finish()
+    assert not vault.finish_key_rotation(unreadable=[])
+    assert vault.rotation_pending()
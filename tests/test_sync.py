@@ -0,0 +1,82 @@
+import shutil
+import time
+
+import pytest
+
+from elsakr_vault import VaultDatabase
+from elsakr_vault.sync import VaultSync, sync_vaults
+
+MASTER_PASSWORD = "shared master password"
+
+
+@pytest.fixture
+def vaults(tmp_path):
+    """Two files of one vault, as on two machines after the first copy."""
+    laptop = VaultDatabase(str(tmp_path / "laptop.db"))
+    laptop.initialize(MASTER_PASSWORD)
+    laptop.add_password("GitHub", "dev", "s3cret", url="https://github.com")
+    laptop.add_password("Netflix", "me", "hunter22")
+    shutil.copy(tmp_path / "laptop.db", tmp_path / "desktop.db")
+    desktop = VaultDatabase(str(tmp_path / "desktop.db"))
+    desktop.initialize(MASTER_PASSWORD)
+    VaultSync(desktop).new_replica_id()
+    yield laptop, desktop
+    laptop.close()
+    desktop.close()
+
+
+def entry(vault, title):
+    for row in vault.list_entries():
+        if row['title'] == title:
+            return vault.get_entry(row['id'])
+    return None
+
+
+def later():
+    # Stamps are wall-clock milliseconds; keep edits on the two files apart
+    time.sleep(0.01)
+
+
+def test_two_files_converge_without_echo(vaults):
+    laptop, desktop = vaults
+    sync_vaults(laptop, desktop)
+
+    # Edit/edit: different fields of one entry both survive, the same field
+    # goes to the later edit
+    laptop.update_password(entry(laptop, "GitHub")['id'], username="dev@corp.io", password="laptop")
+    later()
+    desktop.update_password(entry(desktop, "GitHub")['id'], url="https://github.com/login",
+                            password="desktop")
+
+    # Delete vs edit: an edit made after the delete brings the entry back
+    laptop.delete_password(entry(laptop, "Netflix")['id'])
+    later()
+    desktop.update_password(entry(desktop, "Netflix")['id'], notes="family plan")
+
+    first = sync_vaults(laptop, desktop)
+    assert first['a_to_b']['applied'] == 1 and first['a_to_b']['unchanged'] == 1
+    assert first['b_to_a']['applied'] == 2
+
+    for vault in (laptop, desktop):
+        github = entry(vault, "GitHub")
+        assert (github['username'], github['url']) == ("dev@corp.io", "https://github.com/login")
+        assert github['password'].reveal() == "desktop"
+        assert entry(vault, "Netflix")['notes'].reveal() == "family plan"
+
+    # Neither side has anything the other lacks, so nothing travels back
+    second = sync_vaults(laptop, desktop)
+    assert second == {'a_to_b': {'applied': 0, 'unchanged': 0, 'deleted': 0},
+                      'b_to_a': {'applied': 0, 'unchanged': 0, 'deleted': 0}}
+
+
+def test_delete_after_edit_wins(vaults):
+    laptop, desktop = vaults
+    sync_vaults(laptop, desktop)
+    desktop.update_password(entry(desktop, "Netflix")['id'], notes="family plan")
+    later()
+    laptop.delete_password(entry(laptop, "Netflix")['id'])
+
+    result = sync_vaults(laptop, desktop)
+    assert result['a_to_b']['deleted'] == 1
+    assert entry(laptop, "Netflix") is None and entry(desktop, "Netflix") is None
+    assert sync_vaults(laptop, desktop)['a_to_b']['deleted'] == 0